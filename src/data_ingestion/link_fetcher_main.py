@@ -3,6 +3,7 @@ from src.data_ingestion.image_processor import process_images
 from src.data_ingestion.video_processor import process_video
 from volcenginesdkarkruntime import Ark
 from src.config import config
+from src.knowledge_management.raw_text_parser import write_article, get_record_path, empty_structured_data
 import os
 import re
 from loguru import logger
@@ -349,7 +350,7 @@ def process_links(links, db_name="default", callback=None):
     """
     处理多个链接，保存与防汛相关的结构化数据到指定知识库目录
     
-    批量处理链接并将提取的信息存储为文本文件
+    批量处理链接并将提取的信息存储为文本文件，以及同名的JSON记录文件
     
     Args:
         links (list): 待处理的链接列表
@@ -405,16 +406,12 @@ def process_links(links, db_name="default", callback=None):
                 safe_filename = f"{file_prefix}_{url_hash}.txt"
                 file_path = os.path.join(target_dir, safe_filename)
                 
-                # 安全地写入文件内容
+                # 安全地写入文件内容，同时写入同名的JSON记录文件供索引构建和内容列表直接读取
                 try:
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write(f"URL: {data['url']}\n")
-                        f.write(f"标题: {data['title']}\n")
-                        f.write(f"提取时间: {data['extracted_time']}\n\n")
-                        f.write(f"结构化数据:\n{str(data['structured_data'])}\n\n")
-                        f.write(f"原始内容摘要:\n{data['content'][:500]}...\n")
+                    write_article(file_path, data['url'], data['title'], data['extracted_time'],
+                                  data['structured_data'], summary=f"{data['content'][:500]}...")
                     
-                    logger.info(f"保存提取的内容到: {file_path}")
+                    logger.info(f"保存提取的内容到: {file_path}，记录文件: {get_record_path(file_path)}")
                     
                     # 如果有回调函数，更新进度为成功
                     if callback:
@@ -437,12 +434,8 @@ def process_links(links, db_name="default", callback=None):
                 safe_filename = f"错误_{url_hash}.txt"
                 file_path = os.path.join(target_dir, safe_filename)
                 
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(f"URL: {clean_url}\n")
-                    f.write(f"标题: 提取失败\n")
-                    f.write(f"提取时间: {datetime.now().isoformat()}\n\n")
-                    f.write(f"提取错误: {str(e)}\n\n")
-                    f.write("结构化数据:\n{'rainfall': [], 'water_condition': [], 'disaster_impact': [], 'measures': [], 'raw_text': ''}\n")
+                write_article(file_path, clean_url, "提取失败", datetime.now().isoformat(),
+                              empty_structured_data(), error=str(e))
                 
                 logger.info(f"已保存错误记录到: {file_path}")
             except Exception as write_error:
@@ -0,0 +1,298 @@
+"""
+文本嵌入后端
+
+由 config/rag_config.yaml 中的 model.embedding.provider 选择生成向量的方式，
+TextEmbedder 负责缓存、分批、并发和重试，后端只负责对一批文本生成向量。
+支持的后端：
+1. aliyun / dashscope: 调用DashScope文本嵌入接口（需要网络和API密钥）
+2. local: 使用sentence-transformers在本地CPU/GPU上推理，适用于离线或内网部署
+3. onnx: 使用ONNX Runtime在本地推理导出的模型，不依赖PyTorch
+4. hashing: 确定性的特征哈希向量，不依赖模型和网络，用于测试和基准测试
+
+本地后端的依赖按需导入，未使用时不需要安装。
+"""
+
+import os
+import hashlib
+from http import HTTPStatus
+import numpy as np
+from loguru import logger
+
+# 可以重试的接口状态码：限流和服务端错误
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+EMBEDDING_PROVIDERS = ["aliyun", "dashscope", "local", "onnx", "hashing"]
+
+# 支持指定输出维度的DashScope模型及可选维度（第一项为默认维度），维度越低索引内存和检索耗时越少
+DASHSCOPE_DIMENSIONS = {
+    "text-embedding-v3": [1024, 768, 512, 256, 128, 64],
+}
+
+
+class DashScopeBackend:
+    """DashScope文本嵌入接口后端"""
+
+    # 远程接口受账号速率限制，需要限流；批次之间可以并发
+    remote = True
+
+    def __init__(self, embedding_config, dimension=None):
+        """
+        Args:
+            embedding_config (dict): model.embedding 配置
+            dimension (int, optional): 请求的向量维度，None表示使用模型默认维度
+
+        Raises:
+            ValueError: 如果未设置必要的API密钥环境变量，或模型不支持请求的维度
+        """
+        import dashscope
+
+        # 从配置中获取API密钥环境变量名并读取值
+        api_key = os.environ.get(embedding_config['api_key_env'])
+        if not api_key:
+            raise ValueError(f"未设置环境变量 {embedding_config['api_key_env']}")
+        # 设置DashScope全局API密钥
+        dashscope.api_key = api_key
+        self._dashscope = dashscope
+
+        self.model_name = embedding_config['model_name']  # text-embedding-v3
+        # 单次接口调用的最大文本数（text-embedding-v3 每次最多10条）
+        self.batch_size = embedding_config.get('batch_size', 10)
+        self.max_concurrency = embedding_config.get('max_concurrency', 4)
+
+        if dimension and dimension not in DASHSCOPE_DIMENSIONS.get(self.model_name, [dimension]):
+            raise ValueError(f"嵌入模型 {self.model_name} 不支持 {dimension} 维向量，"
+                             f"可选值: {', '.join(map(str, DASHSCOPE_DIMENSIONS[self.model_name]))}")
+        # 已知模型未指定维度时使用默认维度（列表第一项），相同向量总是对应相同的维度值
+        self.dimension = dimension or DASHSCOPE_DIMENSIONS.get(self.model_name, [None])[0]
+
+    def embed(self, texts):
+        """
+        调用DashScope文本嵌入接口
+
+        Args:
+            texts (List[str]): 已截断的文本列表
+
+        Returns:
+            Tuple[List[List[float]] or None, bool]: 嵌入向量列表（调用失败时为None）以及失败是否可以重试
+        """
+        try:
+            # 调用DashScope文本嵌入API，指定维度时由接口直接返回低维向量
+            kwargs = {"dimension": self.dimension} if self.dimension else {}
+            response = self._dashscope.TextEmbedding.call(
+                model=self.model_name,  # text-embedding-v3
+                input=texts,
+                **kwargs
+            )
+
+            # 处理API返回结果
+            if response.status_code == HTTPStatus.OK:
+                # 提取嵌入向量
+                embeddings = [item['embedding'] for item in response.output['embeddings']]
+                logger.info(f"生成 {len(embeddings)} 个向量")
+                return embeddings, False
+            else:
+                # API调用成功但返回错误
+                logger.error(f"嵌入模型调用失败: {response.message}")
+                return None, response.status_code in RETRYABLE_STATUS_CODES
+        except Exception as e:
+            # API调用异常（网络错误等），可以重试
+            logger.error(f"嵌入模型调用异常: {e}")
+            return None, True
+
+
+class SentenceTransformerBackend:
+    """sentence-transformers本地模型后端"""
+
+    # 本地推理不限流；模型内部已经多线程，批次串行执行
+    remote = False
+    max_concurrency = 1
+
+    def __init__(self, local_config, dimension=None):
+        """
+        Args:
+            local_config (dict): model.embedding.local 配置（model_name、device、num_threads、batch_size、normalize）
+            dimension (int, optional): 请求的向量维度，必须与模型的输出维度一致
+
+        Raises:
+            ValueError: 如果请求的维度与模型输出维度不一致
+        """
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("local 嵌入后端需要安装 sentence-transformers") from e
+
+        num_threads = local_config.get('num_threads', 0)
+        if num_threads:
+            import torch
+            torch.set_num_threads(num_threads)
+
+        self.model_name = local_config.get('model_name', 'BAAI/bge-small-zh-v1.5')
+        self.batch_size = local_config.get('batch_size', 32)
+        self.normalize = local_config.get('normalize', True)
+        logger.info(f"加载本地嵌入模型: {self.model_name}")
+        self.model = SentenceTransformer(self.model_name, device=local_config.get('device', 'cpu'))
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        if dimension and dimension != self.dimension:
+            raise ValueError(f"本地嵌入模型 {self.model_name} 的输出维度为 {self.dimension}，不支持 {dimension} 维向量")
+
+    def embed(self, texts):
+        """
+        本地批量推理
+
+        Args:
+            texts (List[str]): 文本列表
+
+        Returns:
+            Tuple[List[List[float]] or None, bool]: 嵌入向量列表（失败时为None）以及失败是否可以重试（本地推理不重试）
+        """
+        try:
+            embeddings = self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                                           normalize_embeddings=self.normalize, show_progress_bar=False)
+            return embeddings.astype(np.float32).tolist(), False
+        except Exception as e:
+            logger.error(f"本地嵌入模型推理失败: {e}")
+            return None, False
+
+
+class OnnxBackend:
+    """ONNX Runtime本地模型后端，对最后一层隐状态做平均池化"""
+
+    remote = False
+    max_concurrency = 1
+
+    def __init__(self, onnx_config, dimension=None):
+        """
+        Args:
+            onnx_config (dict): model.embedding.onnx 配置
+                （model_path、num_threads、batch_size、max_length、normalize），
+                model_path 目录下需要有 model.onnx 和分词器文件
+            dimension (int, optional): 请求的向量维度，必须与模型的输出维度一致
+        """
+        try:
+            import onnxruntime
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError("onnx 嵌入后端需要安装 onnxruntime 和 transformers") from e
+
+        model_path = onnx_config['model_path']
+        if not os.path.isabs(model_path):
+            project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            model_path = os.path.join(project_root, model_path)
+
+        options = onnxruntime.SessionOptions()
+        num_threads = onnx_config.get('num_threads', 0)
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        logger.info(f"加载ONNX嵌入模型: {model_path}")
+        self.session = onnxruntime.InferenceSession(os.path.join(model_path, "model.onnx"), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.model_name = onnx_config.get('model_name') or os.path.basename(os.path.normpath(model_path))
+        self.batch_size = onnx_config.get('batch_size', 32)
+        self.max_length = onnx_config.get('max_length', 512)
+        self.normalize = onnx_config.get('normalize', True)
+        # 输出维度在首次推理时确定
+        self.dimension = dimension or None
+
+    def embed(self, texts):
+        """
+        本地批量推理
+
+        Args:
+            texts (List[str]): 文本列表
+
+        Returns:
+            Tuple[List[List[float]] or None, bool]: 嵌入向量列表（失败时为None）以及失败是否可以重试（本地推理不重试）
+        """
+        try:
+            encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                                     return_tensors="np")
+            inputs = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+            hidden = self.session.run(None, inputs)[0]
+            if self.dimension and hidden.shape[-1] != self.dimension:
+                logger.error(f"ONNX嵌入模型的输出维度为 {hidden.shape[-1]}，与请求的 {self.dimension} 维不一致")
+                return None, False
+            self.dimension = hidden.shape[-1]
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            embeddings = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if self.normalize:
+                embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+            return embeddings.astype(np.float32).tolist(), False
+        except Exception as e:
+            logger.error(f"ONNX嵌入模型推理失败: {e}")
+            return None, False
+
+
+class HashingBackend:
+    """
+    确定性的特征哈希嵌入后端
+
+    将分词结果和字符二元组哈希到固定维度并归一化，相同文本在任何进程中得到相同的向量，
+    共享词语越多的文本向量越接近。不需要模型文件和网络，用于测试、基准测试和离线演示。
+    """
+
+    remote = False
+    max_concurrency = 1
+
+    def __init__(self, hashing_config, dimension=None):
+        """
+        Args:
+            hashing_config (dict): model.embedding.hashing 配置（batch_size）
+            dimension (int, optional): 向量维度，默认256
+        """
+        self.dimension = dimension or 256
+        self.batch_size = hashing_config.get('batch_size', 256)
+        self.model_name = "hashing"
+
+    def _features(self, text):
+        """文本特征：分词结果和字符二元组"""
+        from src.knowledge_management.lexical_index import tokenize
+        compact = "".join(text.split())
+        return tokenize(text) + [compact[i:i + 2] for i in range(len(compact) - 1)]
+
+    def embed_one(self, text):
+        """生成单条文本的哈希向量"""
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature in self._features(text):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dimension] += 1.0 if (digest >> 63) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, texts):
+        """
+        Args:
+            texts (List[str]): 文本列表
+
+        Returns:
+            Tuple[List[List[float]], bool]: 嵌入向量列表，以及失败是否可以重试（总是成功）
+        """
+        return [self.embed_one(text).tolist() for text in texts], False
+
+
+def create_embedding_backend(embedding_config, dimension=None):
+    """
+    按配置创建嵌入后端
+
+    Args:
+        embedding_config (dict): model.embedding 配置
+        dimension (int, optional): 请求的向量维度，None表示使用模型默认维度
+
+    Returns:
+        嵌入后端实例
+
+    Raises:
+        ValueError: 如果provider不受支持，或后端不支持请求的维度
+    """
+    provider = (embedding_config.get('provider') or 'aliyun').lower()
+    if provider in ("aliyun", "dashscope"):
+        return DashScopeBackend(embedding_config, dimension)
+    if provider == "local":
+        return SentenceTransformerBackend(embedding_config.get('local') or {}, dimension)
+    if provider == "onnx":
+        return OnnxBackend(embedding_config.get('onnx') or {}, dimension)
+    if provider == "hashing":
+        return HashingBackend(embedding_config.get('hashing') or {}, dimension)
+    raise ValueError(f"不支持的嵌入后端: {provider}，可选值: {', '.join(EMBEDDING_PROVIDERS)}")
@@ -0,0 +1,262 @@
+"""
+文本嵌入向量的磁盘缓存
+
+相同的事件文本在重建索引、创建命名索引和删除内容后重建时会被反复嵌入，
+缓存以 (模型名称, 向量维度, 文本内容) 的哈希为键保存向量，所有知识库共用，
+重复的文本不再调用嵌入接口。
+主要功能：
+1. 追加写入的二进制数据文件保存向量，索引文件记录每个键在数据文件中的位置，不使用pickle
+2. 读取时校验数据记录中的键，索引与数据不一致（例如被其他进程压缩）时视为未命中
+3. 数据文件超过配置的大小上限时按最近使用顺序淘汰，压缩后整体替换文件
+
+文件格式：
+- vectors.bin: 连续的记录，每条为 20字节SHA1键 + dimension个float32
+- index.bin:   连续的定长条目，每条为 20字节SHA1键 + uint32维度 + int64数据偏移
+"""
+
+import os
+import struct
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+from loguru import logger
+from src.config import config
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl，只保证进程内的线程安全
+    fcntl = None
+
+KEY_SIZE = 20
+INDEX_ENTRY = struct.Struct("<20sIq")
+
+DEFAULT_CACHE_SETTINGS = {
+    "enabled": True,
+    "path": "data/embedding_cache",
+    "max_size_mb": 512,
+}
+
+# 超过大小上限时压缩到上限的该比例，避免每次写入都触发压缩
+EVICTION_TARGET_RATIO = 0.8
+
+
+def make_cache_key(model_name, dimension, text):
+    """
+    计算缓存键
+
+    Args:
+        model_name (str): 嵌入模型名称
+        dimension (int or None): 请求的向量维度，未指定时为None
+        text (str): 实际发送给嵌入接口的文本
+
+    Returns:
+        bytes: 20字节的SHA1摘要
+    """
+    return hashlib.sha1(f"{model_name}|{dimension}|{text}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    嵌入向量磁盘缓存类
+
+    索引在首次使用时整体读入内存（每条32字节），查找为字典操作；
+    未命中时会读取索引文件新增的部分，以发现其他进程写入的向量。
+    """
+
+    def __init__(self, directory, max_bytes):
+        """
+        初始化缓存
+
+        Args:
+            directory (str): 缓存目录
+            max_bytes (int): 数据文件大小上限（字节）
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.data_path = os.path.join(directory, "vectors.bin")
+        self.index_path = os.path.join(directory, "index.bin")
+        self.lock_path = os.path.join(directory, "cache.lock")
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        # 键 -> (维度, 数据偏移)
+        self._entries = {}
+        # 键 -> 最近一次使用的序号，用于淘汰
+        self._last_used = {}
+        self._clock = 0
+        # 已读入内存的索引文件长度和索引文件的inode，文件被压缩替换后需要完整重读
+        self._index_offset = 0
+        self._index_identity = None
+
+    @contextmanager
+    def _file_lock(self):
+        """进程内线程锁，支持时同时持有跨进程的文件锁"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """读取索引文件中尚未读入内存的条目"""
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            self._entries, self._index_offset, self._index_identity = {}, 0, None
+            return
+        # 追加写入不改变inode，压缩后替换的文件是新的inode
+        identity = st.st_ino
+        if identity != self._index_identity or st.st_size < self._index_offset:
+            # 索引文件被压缩替换，重新读取
+            self._entries, self._index_offset, self._index_identity = {}, 0, identity
+        if st.st_size - self._index_offset < INDEX_ENTRY.size:
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        # 忽略写入中断留下的不完整条目
+        count = len(data) // INDEX_ENTRY.size
+        for key, dimension, offset in INDEX_ENTRY.iter_unpack(data[:count * INDEX_ENTRY.size]):
+            self._entries[key] = (dimension, offset)
+        self._index_offset += count * INDEX_ENTRY.size
+
+    def _read_vectors(self, keys):
+        """按键读取向量，读取不到或校验失败的位置为None"""
+        found = [None] * len(keys)
+        located = sorted((self._entries[key][1], i) for i, key in enumerate(keys) if key in self._entries)
+        if not located:
+            return found
+        with open(self.data_path, "rb") as f:
+            for offset, i in located:
+                dimension = self._entries[keys[i]][0]
+                f.seek(offset)
+                record = f.read(KEY_SIZE + dimension * 4)
+                if len(record) != KEY_SIZE + dimension * 4 or record[:KEY_SIZE] != keys[i]:
+                    continue
+                found[i] = np.frombuffer(record, dtype=np.float32, offset=KEY_SIZE)
+                self._clock += 1
+                self._last_used[keys[i]] = self._clock
+        return found
+
+    def get_many(self, keys):
+        """
+        批量查找缓存的向量
+
+        Args:
+            keys (List[bytes]): 缓存键
+
+        Returns:
+            List[np.ndarray or None]: 与keys顺序一致的向量，未命中为None
+        """
+        with self._lock:
+            try:
+                found = self._read_vectors(keys)
+                if any(vector is None for vector in found):
+                    self._refresh()
+                    missing = [i for i, vector in enumerate(found) if vector is None]
+                    for i, vector in zip(missing, self._read_vectors([keys[i] for i in missing])):
+                        found[i] = vector
+                return found
+            except OSError as e:
+                logger.warning(f"读取嵌入缓存失败: {str(e)}")
+                return [None] * len(keys)
+
+    def put_many(self, keys, vectors):
+        """
+        批量写入向量
+
+        Args:
+            keys (List[bytes]): 缓存键
+            vectors (List[List[float]]): 与keys顺序一致的向量
+        """
+        try:
+            with self._file_lock():
+                self._refresh()
+                records, entries = [], []
+                offset = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+                for key, vector in zip(keys, vectors):
+                    if key in self._entries:
+                        continue
+                    data = np.asarray(vector, dtype=np.float32).tobytes()
+                    records.append(key + data)
+                    entries.append(INDEX_ENTRY.pack(key, len(data) // 4, offset))
+                    offset += KEY_SIZE + len(data)
+                if not records:
+                    return
+                # 先写数据再写索引，索引中的条目总是指向已完整写入的数据
+                with open(self.data_path, "ab") as f:
+                    f.write(b"".join(records))
+                with open(self.index_path, "ab") as f:
+                    f.write(b"".join(entries))
+                self._refresh()
+                for key in keys:
+                    self._clock += 1
+                    self._last_used[key] = self._clock
+                if offset > self.max_bytes:
+                    self._evict()
+        except OSError as e:
+            logger.warning(f"写入嵌入缓存失败: {str(e)}")
+
+    def _evict(self):
+        """按最近使用顺序保留向量，压缩数据文件和索引文件（调用方需持有文件锁）"""
+        budget = int(self.max_bytes * EVICTION_TARGET_RATIO)
+        # 最近使用的优先保留，从未使用过的按写入顺序（偏移越大越新）保留
+        order = sorted(self._entries, key=lambda key: (self._last_used.get(key, 0), self._entries[key][1]),
+                       reverse=True)
+        kept, size = [], 0
+        for key in order:
+            record_size = KEY_SIZE + self._entries[key][0] * 4
+            if size + record_size > budget:
+                break
+            kept.append(key)
+            size += record_size
+
+        kept.sort(key=lambda key: self._entries[key][1])
+        data_tmp, index_tmp = self.data_path + ".tmp", self.index_path + ".tmp"
+        with open(self.data_path, "rb") as src, open(data_tmp, "wb") as data_out, open(index_tmp, "wb") as index_out:
+            offset = 0
+            for key in kept:
+                dimension, old_offset = self._entries[key]
+                src.seek(old_offset)
+                data_out.write(src.read(KEY_SIZE + dimension * 4))
+                index_out.write(INDEX_ENTRY.pack(key, dimension, offset))
+                offset += KEY_SIZE + dimension * 4
+        # 先替换数据文件：其他进程用旧索引读取时键校验失败，会重新读取新索引
+        os.replace(data_tmp, self.data_path)
+        os.replace(index_tmp, self.index_path)
+        logger.info(f"嵌入缓存超过 {self.max_bytes / 1024 / 1024:.1f} MB，淘汰 {len(self._entries) - len(kept)} 个向量，"
+                    f"保留 {len(kept)} 个")
+        self._last_used = {key: self._last_used[key] for key in kept if key in self._last_used}
+        self._entries, self._index_offset, self._index_identity = {}, 0, None
+        self._refresh()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """
+    获取进程内共享的嵌入缓存
+
+    配置项 model.embedding.cache 控制是否启用、缓存目录（相对项目根目录）和大小上限。
+
+    Returns:
+        EmbeddingCache or None: 缓存实例，未启用时返回None
+    """
+    global _shared_cache
+    settings = {**DEFAULT_CACHE_SETTINGS, **(config["model"]["embedding"].get("cache") or {})}
+    if not settings["enabled"]:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            directory = os.path.join(project_root, settings["path"])
+            _shared_cache = EmbeddingCache(directory, int(settings["max_size_mb"] * 1024 * 1024))
+        return _shared_cache
@@ -0,0 +1,238 @@
+"""
+事件元数据的列式存储
+
+向量索引旁的事件数据（事件内容、向量化文本、类别、来源文件和向量ID）按列保存在一个紧凑数组文件中：
+定长数组保存每行的向量ID、类别编码、类别内位置和来源文件编码，事件文本和事件内容（JSON）
+分别拼接为字节块并以偏移数组索引。加载时整个文件以只读方式内存映射，不解码任何事件，
+搜索时只有实际返回的结果才会解码。
+主要功能：
+1. 将按行排列的事件写入列式元数据文件
+2. 以惰性序列的形式读取事件文本、按类别组织的事件列表和行元数据
+3. 将旧版pickle元数据转换为按行排列的事件，供加载旧索引和批量转换使用
+"""
+
+import json
+from collections.abc import Sequence
+import numpy as np
+from src.knowledge_management.packed_arrays import write_packed, read_packed, read_packed_header
+
+# 列式元数据文件格式版本
+EVENT_COLUMNS_VERSION = 1
+
+
+def _pack_blob(items):
+    """将字节串列表拼接为字节块和偏移数组"""
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    if items:
+        offsets[1:] = np.cumsum([len(item) for item in items])
+    return np.frombuffer(b"".join(items), dtype=np.uint8), offsets
+
+
+class PackedStrings(Sequence):
+    """只读的UTF-8字符串序列，按需从字节块中解码"""
+
+    def __init__(self, blob, offsets):
+        """
+        Args:
+            blob (np.ndarray): uint8字节块
+            offsets (np.ndarray): 长度为 n+1 的偏移数组
+        """
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _decode(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._decode(j) for j in range(*i.indices(len(self)))]
+        i = range(len(self))[i]
+        return self._decode(i)
+
+
+class PackedRecords(Sequence):
+    """
+    只读的事件序列，按需将JSON解码为字典
+
+    rows 给出序列中每个位置对应的行号，用于按类别查看全部事件中的一部分。
+    """
+
+    def __init__(self, blob, offsets, rows=None):
+        """
+        Args:
+            blob (np.ndarray): uint8字节块，每行一个JSON对象
+            offsets (np.ndarray): 长度为 行数+1 的偏移数组
+            rows (np.ndarray, optional): 序列位置 -> 行号，默认为全部行
+        """
+        self.strings = PackedStrings(blob, offsets)
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.strings) if self.rows is None else len(self.rows)
+
+    def _decode(self, i):
+        row = i if self.rows is None else int(self.rows[i])
+        return json.loads(self.strings[row])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._decode(j) for j in range(*i.indices(len(self)))]
+        i = range(len(self))[i]
+        return self._decode(i)
+
+
+class RowMetadata(Sequence):
+    """只读的行元数据序列，每项为 {category, index, position[, source]} 字典"""
+
+    def __init__(self, categories, category_codes, positions, source_codes, sources):
+        self.categories = categories
+        self.category_codes = category_codes
+        self.positions = positions
+        self.source_codes = source_codes
+        self.sources = sources
+
+    def __len__(self):
+        return len(self.category_codes)
+
+    def _decode(self, i):
+        metadata = {"category": self.categories[self.category_codes[i]], "index": i,
+                    "position": int(self.positions[i])}
+        if self.source_codes[i] >= 0:
+            metadata["source"] = self.sources[self.source_codes[i]]
+        return metadata
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._decode(j) for j in range(*i.indices(len(self)))]
+        i = range(len(self))[i]
+        return self._decode(i)
+
+
+class EventColumns:
+    """从列式元数据文件加载的事件数据，数组均为只读内存映射"""
+
+    def __init__(self, categories, event_ids, category_codes, positions, source_codes, sources,
+                 texts, events, next_id):
+        self.categories = categories
+        self.event_ids = event_ids
+        self.category_codes = category_codes
+        self.positions = positions
+        self.next_id = next_id
+        # 向量化文本，按行号访问
+        self.texts = texts
+        # 类别 -> 该类别事件序列，按类别内位置访问
+        self.events = events
+        # 行元数据，兼容原有的 event_metadata 列表
+        self.metadata = RowMetadata(categories, category_codes, positions, source_codes, sources)
+
+
+def write_event_columns(path, rows, event_ids, next_id, categories):
+    """
+    写入列式元数据文件
+
+    Args:
+        path (str): 文件路径
+        rows (Iterable[tuple]): 按行排列的 (类别, 类别内位置, 事件, 向量化文本, 来源文件名或None)
+        event_ids (np.ndarray): 行号 -> 向量ID
+        next_id (int): 下一个可分配的向量ID
+        categories (List[str]): 事件类别列表，类别编码为其下标
+    """
+    category_codes = {category: code for code, category in enumerate(categories)}
+    source_codes = {}
+    codes, positions, sources, texts, events = [], [], [], [], []
+    for category, position, event, text, source in rows:
+        codes.append(category_codes[category])
+        positions.append(position)
+        sources.append(-1 if source is None else source_codes.setdefault(source, len(source_codes)))
+        texts.append(text.encode("utf-8"))
+        events.append(json.dumps(event, ensure_ascii=False, default=str).encode("utf-8"))
+
+    text_blob, text_offsets = _pack_blob(texts)
+    event_blob, event_offsets = _pack_blob(events)
+    write_packed(path, {
+        "event_ids": np.asarray(event_ids, dtype=np.int64),
+        "category_codes": np.asarray(codes, dtype=np.int8),
+        "positions": np.asarray(positions, dtype=np.int32),
+        "source_codes": np.asarray(sources, dtype=np.int32),
+        "text_blob": text_blob,
+        "text_offsets": text_offsets,
+        "event_blob": event_blob,
+        "event_offsets": event_offsets,
+    }, meta={"version": EVENT_COLUMNS_VERSION, "num_events": len(codes), "next_id": int(next_id),
+             "categories": list(categories), "sources": list(source_codes)})
+
+
+def read_event_columns(path):
+    """
+    以内存映射方式加载列式元数据文件
+
+    Args:
+        path (str): 文件路径
+
+    Returns:
+        EventColumns: 事件数据，事件文本和内容在访问时才解码
+    """
+    arrays, meta = read_packed(path, mmap=True)
+    categories = meta["categories"]
+    category_codes = arrays["category_codes"]
+    positions = arrays["positions"]
+
+    events = {}
+    for code, category in enumerate(categories):
+        rows = np.flatnonzero(category_codes == code)
+        # 类别内位置 -> 行号
+        rows_by_position = np.empty(len(rows), dtype=np.int64)
+        rows_by_position[positions[rows]] = rows
+        events[category] = PackedRecords(arrays["event_blob"], arrays["event_offsets"], rows_by_position)
+
+    return EventColumns(categories, arrays["event_ids"], category_codes, positions, arrays["source_codes"],
+                        meta["sources"], PackedStrings(arrays["text_blob"], arrays["text_offsets"]), events,
+                        meta["next_id"])
+
+
+def read_event_count(path):
+    """
+    只读取文件头部获取事件数量
+
+    Args:
+        path (str): 文件路径
+
+    Returns:
+        int: 事件数量
+    """
+    return read_packed_header(path)["meta"]["num_events"]
+
+
+def rows_from_pickle(data, categories):
+    """
+    将旧版pickle元数据转换为按行排列的事件
+
+    兼容没有记录类别内位置或向量ID的更早版本：位置按行号顺序统计，向量ID等于行号。
+
+    Args:
+        data (dict): pickle中保存的 events、event_texts、event_metadata 等字段
+        categories (List[str]): 事件类别列表
+
+    Returns:
+        Tuple[list, np.ndarray, int]: 按行排列的 (类别, 类别内位置, 事件, 向量化文本, 来源文件名或None)，
+            行号 -> 向量ID，下一个可分配的向量ID
+    """
+    rows = []
+    next_positions = dict.fromkeys(categories, 0)
+    for i, metadata in enumerate(data["event_metadata"]):
+        category = metadata["category"]
+        position = metadata.get("position")
+        if position is None:
+            position = next_positions[category]
+        next_positions[category] = position + 1
+        rows.append((category, position, data["events"][category][position], data["event_texts"][i],
+                     metadata.get("source")))
+
+    event_ids = np.asarray(data.get("event_ids", []), dtype=np.int64)
+    if len(event_ids) != len(rows):
+        event_ids = np.arange(len(rows), dtype=np.int64)
+    next_id = max(int(data.get("next_id", 0)), int(event_ids.max()) + 1 if len(rows) else 0)
+    return rows, event_ids, next_id
@@ -0,0 +1,93 @@
+"""
+索引构建协调器
+
+在进程内协调同一知识库的索引构建和修改任务。
+主要功能：
+1. 单飞合并：同一知识库的相同构建请求在排队期间只运行一次，后到的请求附加到排队中的任务并获得同一结果；
+   任务开始执行后到达的请求会排在其后重新执行，读取到最新的文本
+2. 串行执行：同一知识库的构建、创建和删除内容等写任务依次执行，不会并发读写同一组索引文件
+3. 在独立的线程池中执行，不占用事件循环的默认执行器
+
+索引文件写入暂存目录后整体发布（见 VectorStore.save_index），读取方在构建期间继续使用旧版本。
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from loguru import logger
+
+# 构建线程数：不同知识库的构建可以并行，同一知识库的构建始终串行
+MAX_BUILD_WORKERS = 4
+
+
+class IndexBuildCoordinator:
+    """
+    索引构建协调器类
+
+    以 (知识库ID, 任务键) 记录排队中的任务。提交带任务键的任务时，如果相同任务尚未开始执行，
+    直接返回该任务的Future；任务开始执行时移除记录，执行期间到达的请求会提交新的任务，
+    避免附加到已经读取了旧文本的构建。任务键为None的任务从不合并。同一知识库的任务持有知识库锁依次执行。
+    """
+
+    def __init__(self, max_workers=MAX_BUILD_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="index-build")
+        self._lock = threading.Lock()
+        # (db_name, key) -> Future，排队中尚未开始执行的可合并任务
+        self._inflight = {}
+        # db_name -> 知识库锁
+        self._db_locks = {}
+
+    def _get_db_lock(self, db_name):
+        with self._lock:
+            lock = self._db_locks.get(db_name)
+            if lock is None:
+                lock = self._db_locks[db_name] = threading.Lock()
+            return lock
+
+    def submit(self, db_name, fn, key=None):
+        """
+        提交知识库的构建任务
+
+        Args:
+            db_name (str): 数据库名称或知识库ID
+            fn (callable): 无参数的任务函数，在构建线程中执行
+            key (hashable, optional): 任务键，相同键的排队中任务会被合并；为None时不合并
+
+        Returns:
+            Tuple[Future, bool]: 任务的Future，以及是否附加到了排队中的任务
+        """
+        with self._lock:
+            if key is not None:
+                future = self._inflight.get((db_name, key))
+                if future is not None:
+                    logger.info(f"知识库 {db_name} 的构建任务 {key} 正在排队，等待其结果")
+                    return future, True
+            future = Future()
+            if key is not None:
+                self._inflight[(db_name, key)] = future
+        self._executor.submit(self._run, db_name, key, fn, future)
+        return future, False
+
+    def _run(self, db_name, key, fn, future):
+        """持有知识库锁执行任务，并将结果或异常写入Future"""
+        result, error = None, None
+        with self._get_db_lock(db_name):
+            # 开始执行前移除排队记录，执行期间到达的请求会提交新的任务，在本任务之后读取最新的文本
+            if key is not None:
+                with self._lock:
+                    if self._inflight.get((db_name, key)) is future:
+                        del self._inflight[(db_name, key)]
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn()
+                except BaseException as e:
+                    error = e
+        if future.cancelled():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+# 进程内共享的构建协调器实例
+index_build_coordinator = IndexBuildCoordinator()
@@ -0,0 +1,522 @@
+"""
+FAISS索引类型选择与构建
+
+根据 config/rag_config.yaml 中 vector_store 部分的配置创建不同类型的FAISS索引，
+使大规模知识库不必总是使用暴力搜索的 IndexFlatL2。
+主要功能：
+1. 支持 flat / ivf_flat / ivf_pq / hnsw 四种索引类型，以及按向量数量自动选择（auto）
+2. 支持以float16或8位标量量化（SQ8）存储向量，降低索引占用的内存
+3. 负责IVF类索引的训练参数（nlist）和PQ编码参数的确定
+4. 为每个向量指定稳定ID（IndexIDMap2 / IVF哈希直接映射），支持按ID删除和重建向量
+5. 生成每次检索使用的搜索参数（nprobe / efSearch / ID选择器），不修改共享的索引对象
+6. 以只读内存映射方式加载索引，多个工作进程共享操作系统页缓存中的同一份向量数据
+"""
+
+import math
+import faiss
+import numpy as np
+from loguru import logger
+from src.config import config
+
+INDEX_TYPES = ["flat", "ivf_flat", "ivf_pq", "hnsw"]
+
+# 向量存储编码：none为原始float32，fp16为半精度浮点，sq8为8位标量量化
+QUANTIZATIONS = ["none", "fp16", "sq8"]
+SQ_FACTORY_CODES = {"fp16": "SQfp16", "sq8": "SQ8"}
+
+# FAISS建议每个聚类中心至少有39个训练样本
+MIN_POINTS_PER_CENTROID = 39
+
+# 分批构建sq8编码的索引时用于训练编码范围的样本数量
+SQ_TRAIN_SIZE = 16384
+
+DEFAULT_INDEX_SETTINGS = {
+    "index_type": "auto",
+    "quantization": "none",
+    # 自动选择时，向量数量不超过该值使用flat，不超过 auto_pq_min 使用ivf_flat，否则使用ivf_pq
+    "auto_flat_max": 20000,
+    "auto_pq_min": 1000000,
+    "ivf": {"nlist": 0, "nprobe": 16, "train_size": 0},
+    "pq": {"m": 64, "nbits": 8},
+    "hnsw": {"m": 32, "ef_construction": 200, "ef_search": 64},
+    # 以只读内存映射方式加载索引文件
+    "mmap": False,
+}
+
+
+def get_index_settings():
+    """
+    读取向量索引配置，缺失的字段使用默认值
+
+    Returns:
+        dict: 索引配置
+    """
+    vector_store_config = config.get("vector_store", {}) or {}
+    settings = {}
+    for key, default in DEFAULT_INDEX_SETTINGS.items():
+        value = vector_store_config.get(key)
+        if isinstance(default, dict):
+            settings[key] = {**default, **(value or {})}
+        else:
+            settings[key] = default if value is None else value
+    return settings
+
+
+def resolve_index_type(index_type, num_vectors, settings=None):
+    """
+    确定实际使用的索引类型
+
+    Args:
+        index_type (str): 配置的索引类型，auto表示按向量数量自动选择
+        num_vectors (int): 向量数量
+        settings (dict, optional): 索引配置
+
+    Returns:
+        str: flat / ivf_flat / ivf_pq / hnsw 之一
+    """
+    settings = settings or get_index_settings()
+    index_type = (index_type or "auto").lower()
+    if index_type == "auto":
+        if num_vectors <= settings["auto_flat_max"]:
+            return "flat"
+        if num_vectors < settings["auto_pq_min"]:
+            return "ivf_flat"
+        return "ivf_pq"
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"不支持的索引类型: {index_type}，可选值: {', '.join(INDEX_TYPES + ['auto'])}")
+    return index_type
+
+
+def resolve_quantization(quantization):
+    """
+    校验向量存储编码
+
+    Args:
+        quantization (str): none / fp16 / sq8，为空时视为none
+
+    Returns:
+        str: 规范化后的编码名称
+    """
+    quantization = (quantization or "none").lower()
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"不支持的向量编码: {quantization}，可选值: {', '.join(QUANTIZATIONS)}")
+    return quantization
+
+
+def _choose_nlist(num_vectors, configured):
+    """按向量数量确定IVF聚类中心数，保证每个中心有足够的训练样本"""
+    nlist = configured or int(4 * math.sqrt(num_vectors))
+    return max(1, min(nlist, num_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def _choose_pq_m(dimension, configured):
+    """选择不超过配置值且能整除向量维度的PQ子空间数"""
+    for m in range(min(configured, dimension), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def create_faiss_index(dimension, num_vectors, index_type=None, settings=None, quantization=None, num_train=None):
+    """
+    创建尚未训练、不含向量的FAISS索引
+
+    训练样本不足以支撑所选类型时自动降级（ivf_pq -> ivf_flat -> flat），并记录警告。
+    flat、ivf_flat和hnsw索引可以用fp16或sq8编码存储向量；ivf_pq本身已经是压缩编码，忽略该选项。
+
+    Args:
+        dimension (int): 向量维度
+        num_vectors (int): 索引的（预计）向量数量，用于自动选择索引类型和确定IVF聚类中心数
+        index_type (str, optional): 索引类型，默认使用配置中的 index_type
+        settings (dict, optional): 索引配置，默认从配置文件读取
+        quantization (str, optional): 向量编码（none / fp16 / sq8），默认使用配置中的 quantization
+        num_train (int, optional): 可用的训练样本数量，默认等于 num_vectors
+
+    Returns:
+        Tuple[faiss.Index, str, str]: 索引、实际使用的索引类型和FAISS索引描述
+    """
+    settings = settings or get_index_settings()
+    num_train = num_vectors if num_train is None else num_train
+    index_type = resolve_index_type(index_type or settings["index_type"], num_vectors, settings)
+    quantization = resolve_quantization(quantization or settings["quantization"])
+
+    if index_type == "ivf_pq" and num_train < (1 << settings["pq"]["nbits"]) * MIN_POINTS_PER_CENTROID:
+        logger.warning(f"训练样本数量 {num_train} 不足以训练PQ编码，改用 ivf_flat")
+        index_type = "ivf_flat"
+    if index_type in ("ivf_flat", "ivf_pq") and num_train < 2 * MIN_POINTS_PER_CENTROID:
+        logger.warning(f"训练样本数量 {num_train} 不足以训练IVF聚类，改用 flat")
+        index_type = "flat"
+    if index_type == "ivf_pq" and quantization != "none":
+        logger.warning(f"ivf_pq 索引已使用PQ编码，忽略向量编码选项 {quantization}")
+        quantization = "none"
+
+    sq_code = SQ_FACTORY_CODES.get(quantization)
+    if index_type == "flat":
+        description = sq_code or "Flat"
+    elif index_type == "hnsw":
+        description = f"HNSW{settings['hnsw']['m']}" + (f"_{sq_code}" if sq_code else "")
+    else:
+        # 聚类中心数按全部向量确定，同时保证每个中心有足够的训练样本
+        nlist = min(_choose_nlist(num_vectors, settings["ivf"]["nlist"]), num_train // MIN_POINTS_PER_CENTROID)
+        if index_type == "ivf_flat":
+            description = f"IVF{nlist},{sq_code or 'Flat'}"
+        else:
+            description = f"IVF{nlist},PQ{_choose_pq_m(dimension, settings['pq']['m'])}x{settings['pq']['nbits']}"
+
+    index = faiss.index_factory(dimension, description, faiss.METRIC_L2)
+    return index, index_type, description
+
+
+def _prepare_index(index, index_type, description, training_vectors, settings):
+    """训练索引并设置检索参数，需要时包装为IndexIDMap2，返回可以按ID添加向量的索引"""
+    if not index.is_trained:
+        logger.info(f"训练索引 {description}，训练样本 {len(training_vectors)} 个")
+        index.train(training_vectors)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = settings["hnsw"]["ef_construction"]
+        index.hnsw.efSearch = settings["hnsw"]["ef_search"]
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        index.nprobe = min(settings["ivf"]["nprobe"], index.nlist)
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    if index_type not in ("ivf_flat", "ivf_pq"):
+        index = faiss.IndexIDMap2(index)
+    return index
+
+
+def build_faiss_index(embeddings, index_type=None, settings=None, quantization=None, ids=None):
+    """
+    创建、训练FAISS索引并添加向量
+
+    训练样本不足以支撑所选类型时自动降级（ivf_pq -> ivf_flat -> flat），并记录警告。
+    向量以稳定ID添加：IVF类索引使用哈希直接映射，其余索引包装为IndexIDMap2，
+    因此都可以按ID重建向量，增量更新时也可以按ID删除向量（hnsw除外）。
+    flat、ivf_flat和hnsw索引可以用fp16或sq8编码存储向量；ivf_pq本身已经是压缩编码，忽略该选项。
+
+    Args:
+        embeddings (np.ndarray): 形状为 (n, d) 的float32向量矩阵
+        index_type (str, optional): 索引类型，默认使用配置中的 index_type
+        settings (dict, optional): 索引配置，默认从配置文件读取
+        quantization (str, optional): 向量编码（none / fp16 / sq8），默认使用配置中的 quantization
+        ids (np.ndarray, optional): 每个向量的ID，默认为 0..n-1
+
+    Returns:
+        Tuple[faiss.Index, str]: 构建好的索引和实际使用的索引类型
+    """
+    settings = settings or get_index_settings()
+    num_vectors, dimension = embeddings.shape
+    index, index_type, description = create_faiss_index(dimension, num_vectors, index_type, settings, quantization)
+    index = _prepare_index(index, index_type, description, embeddings, settings)
+
+    if ids is None:
+        ids = np.arange(num_vectors, dtype=np.int64)
+    index.add_with_ids(embeddings, np.asarray(ids, dtype=np.int64))
+    logger.info(f"{index_type} 索引（{description}）构建完成，包含 {index.ntotal} 个向量")
+    return index, index_type
+
+
+class IndexBuilder:
+    """
+    分批构建FAISS索引
+
+    向量按ID顺序分批到达时，先缓冲到足以确定索引类型并完成训练的数量，用缓冲的前若干个向量训练后
+    添加全部缓冲的向量，之后的批次直接添加，不需要同时在内存中保存全部向量。
+    - 指定flat或hnsw且不需要训练编码时，第一批到达即创建索引
+    - sq8编码的flat和hnsw索引用前 SQ_TRAIN_SIZE 个向量训练编码范围
+    - IVF类索引和auto的类型、聚类中心数取决于向量总数，总数确定（set_expected_count）之前到达的向量只缓冲；
+      之后用前若干个向量训练，数量取 ivf.train_size 与聚类中心（及PQ编码）所需最少样本数中的较大值
+    训练样本只由向量顺序、向量总数和配置决定，与批次大小和向量总数何时提供无关。
+    不需要训练的索引与一次性调用 build_faiss_index 的结果相同；需要训练的索引只用部分向量训练，
+    与 build_faiss_index 用全部向量训练的结果略有差异。
+    所有方法都应在同一个线程中调用。
+    """
+
+    def __init__(self, index_type=None, settings=None, quantization=None, expected_count=None):
+        """
+        Args:
+            index_type (str, optional): 索引类型，默认使用配置中的 index_type
+            settings (dict, optional): 索引配置，默认从配置文件读取
+            quantization (str, optional): 向量编码，默认使用配置中的 quantization
+            expected_count (int, optional): 向量总数，未知时为None，可以之后通过 set_expected_count 提供
+        """
+        self.settings = settings or get_index_settings()
+        self.index_type = (index_type or self.settings["index_type"]).lower()
+        self.quantization = resolve_quantization(quantization or self.settings["quantization"])
+        self.expected_count = expected_count
+        self.index = None
+        self.description = None
+        self._buffer, self._buffer_ids, self._buffered = [], [], 0
+
+    def set_expected_count(self, count):
+        """提供向量总数（例如全部文件解析完成后），用于确定索引类型和聚类中心数"""
+        self.expected_count = count
+        self._try_create()
+
+    def _train_count(self):
+        """
+        创建索引所需的训练样本数量
+
+        Returns:
+            int or None: 训练样本数量，0表示不需要训练；向量总数未知而无法确定时返回None
+        """
+        index_type = self.index_type
+        if index_type in ("auto", "ivf_flat", "ivf_pq"):
+            if self.expected_count is None:
+                return None
+            index_type = resolve_index_type(index_type, self.expected_count, self.settings)
+        if index_type in ("ivf_flat", "ivf_pq"):
+            return self._ivf_train_size(self.expected_count, index_type)
+        if self.quantization == "sq8":
+            return SQ_TRAIN_SIZE
+        return 0
+
+    def _ivf_train_size(self, num_vectors, index_type="ivf_flat"):
+        """IVF索引的训练样本数量"""
+        configured = self.settings["ivf"]["nlist"] or int(4 * math.sqrt(max(num_vectors, 1)))
+        required = configured * MIN_POINTS_PER_CENTROID
+        if index_type == "ivf_pq":
+            required = max(required, (1 << self.settings["pq"]["nbits"]) * MIN_POINTS_PER_CENTROID)
+        return max(self.settings["ivf"].get("train_size") or 0, required)
+
+    def _try_create(self):
+        """缓冲的向量足够训练或已经是全部向量时创建索引"""
+        if self.index is not None or not self._buffered:
+            return
+        train_count = self._train_count()
+        if train_count is None:
+            return
+        if self._buffered >= train_count or (self.expected_count is not None
+                                              and self._buffered >= self.expected_count):
+            self._create(train_count)
+
+    def _create(self, train_count):
+        """用缓冲的前 train_count 个向量训练并创建索引，随后添加全部缓冲的向量"""
+        vectors = np.concatenate(self._buffer) if len(self._buffer) > 1 else self._buffer[0]
+        ids = np.concatenate(self._buffer_ids)
+        training_vectors = vectors[:train_count] if train_count else vectors
+        index, self.index_type, description = create_faiss_index(vectors.shape[1], self.expected_count,
+                                                                 self.index_type, self.settings, self.quantization,
+                                                                 num_train=len(training_vectors))
+        self.description = description
+        self.index = _prepare_index(index, self.index_type, description, training_vectors, self.settings)
+        self.index.add_with_ids(vectors, ids)
+        self._buffer, self._buffer_ids, self._buffered = [], [], 0
+
+    def add(self, embeddings, ids):
+        """
+        添加一批向量
+
+        Args:
+            embeddings (np.ndarray): 形状为 (n, d) 的float32向量矩阵
+            ids (np.ndarray): 每个向量的ID
+        """
+        if not len(embeddings):
+            return
+        ids = np.asarray(ids, dtype=np.int64)
+        if self.index is not None:
+            self.index.add_with_ids(embeddings, ids)
+            return
+        self._buffer.append(np.array(embeddings, dtype=np.float32))
+        self._buffer_ids.append(ids)
+        self._buffered += len(embeddings)
+        self._try_create()
+
+    def finish(self):
+        """
+        结束构建，没有提供向量总数时以实际添加的数量为准
+
+        Returns:
+            Tuple[faiss.Index or None, str]: 构建好的索引（没有任何向量时为None）和实际使用的索引类型
+        """
+        if self.index is None and self._buffer:
+            if self.expected_count is None:
+                self.expected_count = self._buffered
+            self._create(self._train_count())
+        if self.index is not None:
+            logger.info(f"{self.index_type} 索引（{self.description}）构建完成，包含 {self.index.ntotal} 个向量")
+        return self.index, self.index_type
+
+
+def detect_index_type(index):
+    """
+    根据索引对象推断索引类型，用于没有记录索引类型的旧版索引
+
+    Args:
+        index (faiss.Index): FAISS索引
+
+    Returns:
+        str: 索引类型
+    """
+    base = unwrap_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def detect_quantization(index):
+    """
+    根据索引对象推断向量存储编码
+
+    Args:
+        index (faiss.Index): FAISS索引
+
+    Returns:
+        str: none / fp16 / sq8 / pq，其他标量量化类型返回 sq
+    """
+    base = unwrap_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base = faiss.downcast_index(base.storage)
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "pq"
+    if isinstance(base, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return {faiss.ScalarQuantizer.QT_fp16: "fp16", faiss.ScalarQuantizer.QT_8bit: "sq8"}.get(base.sq.qtype, "sq")
+    return "none"
+
+
+def supports_ids(index):
+    """
+    判断索引是否以稳定ID保存向量（可以按ID添加、删除和重建向量）
+
+    旧版索引直接使用IndexFlatL2或数组直接映射，向量ID等于添加顺序，不支持增量更新。
+
+    Args:
+        index (faiss.Index): FAISS索引
+
+    Returns:
+        bool: 是否支持按ID增量更新
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap2):
+        return True
+    return isinstance(index, faiss.IndexIVF) and index.direct_map.type == faiss.DirectMap.Hashtable
+
+
+def get_mmap_flags():
+    """
+    获取只读内存映射加载索引的FAISS IO标志
+
+    较新版本的FAISS（IO_FLAG_MMAP_IFC）可以映射flat / SQ / HNSW的向量存储和IVF的倒排列表；
+    旧版本只有IO_FLAG_MMAP，只能映射IVF的倒排列表，其余索引类型仍读入堆内存。
+
+    Returns:
+        int: IO标志
+    """
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def is_mmap_supported(index):
+    """
+    判断按 get_mmap_flags 读取的索引是否实际映射了向量数据
+
+    Args:
+        index (faiss.Index): 以内存映射标志读取的索引
+
+    Returns:
+        bool: 支持IO_FLAG_MMAP_IFC的FAISS映射全部类型；旧版本只映射IVF的倒排列表
+    """
+    return hasattr(faiss, "IO_FLAG_MMAP_IFC") or isinstance(unwrap_index(index), faiss.IndexIVF)
+
+
+def read_faiss_index(path, mmap=False):
+    """
+    读取FAISS索引文件
+
+    内存映射加载的索引是只读的：向量数据保留在文件中由操作系统按需换入，
+    多个进程加载同一文件时共享页缓存，不再各自持有一份堆内存副本。
+    不支持内存映射的索引格式会退回普通加载；FAISS版本不能映射该索引类型时
+    （没有IO_FLAG_MMAP_IFC的版本中的flat / SQ / HNSW），索引读入堆内存，视为普通加载。
+
+    Args:
+        path (str): 索引文件路径
+        mmap (bool): 是否以只读内存映射方式加载
+
+    Returns:
+        Tuple[faiss.Index, bool]: 索引对象，以及是否实际以内存映射方式加载
+    """
+    if mmap:
+        try:
+            index = faiss.read_index(path, get_mmap_flags())
+            if is_mmap_supported(index):
+                return index, True
+            logger.info(f"当前FAISS版本不能以内存映射方式加载索引 {path} 的类型，已读入内存")
+            return index, False
+        except RuntimeError as e:
+            logger.warning(f"索引 {path} 不支持内存映射加载，改为读入内存: {str(e)}")
+    return faiss.read_index(path), False
+
+
+def supports_remove(index):
+    """判断索引是否支持按ID删除向量（HNSW图结构不支持删除）"""
+    return not isinstance(unwrap_index(index), faiss.IndexHNSW)
+
+
+def remove_vectors(index, ids):
+    """
+    按ID删除向量
+
+    Args:
+        index (faiss.Index): 支持稳定ID的FAISS索引
+        ids (np.ndarray): 待删除的向量ID
+
+    Returns:
+        int: 实际删除的向量数量
+
+    Raises:
+        RuntimeError: 索引类型不支持删除（例如hnsw）
+    """
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    if len(ids) == 0:
+        return 0
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        # 哈希直接映射只支持以ID数组形式删除
+        return base.remove_ids(faiss.IDSelectorArray(len(ids), faiss.swig_ptr(ids)))
+    return index.remove_ids(faiss.IDSelectorBatch(ids))
+
+
+def unwrap_index(index):
+    """去掉ID映射等包装层，返回实际执行检索的索引对象"""
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def make_search_params(index, selector=None, nprobe=None, ef_search=None, k=0):
+    """
+    创建单次检索使用的搜索参数
+
+    nprobe/efSearch 按请求传入，不修改被多个请求共享的索引对象；未指定时沿用索引当前的设置
+    （参数对象中的默认值会覆盖索引上的设置，因此必须显式填写）。
+
+    Args:
+        index (faiss.Index): FAISS索引
+        selector (faiss.IDSelector, optional): ID选择器，用于按类别过滤
+        nprobe (int, optional): IVF索引检索的聚类数
+        ef_search (int, optional): HNSW索引检索时的候选队列长度
+        k (int): 本次检索的结果数量
+
+    Returns:
+        faiss.SearchParameters or None: 不需要任何参数时返回None
+    """
+    base = unwrap_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        if selector is None and nprobe is None:
+            return None
+        params = faiss.SearchParametersIVF(nprobe=min(nprobe or base.nprobe, base.nlist))
+    elif isinstance(base, faiss.IndexHNSW):
+        if selector is None and ef_search is None:
+            return None
+        # 过滤后可达的邻居变少，efSearch不小于结果数量才能返回足够的结果
+        params = faiss.SearchParametersHNSW(efSearch=max(ef_search or base.hnsw.efSearch, k))
+    else:
+        if selector is None:
+            return None
+        params = faiss.SearchParameters()
+    if selector is not None:
+        params.sel = selector
+    return params
+
@@ -0,0 +1,530 @@
+"""
+关键词检索数据结构
+
+在构建索引时一次性完成分词，将每个文档的词频向量以稀疏数组形式保存在FAISS索引旁，
+查询时只需对查询文本分词，候选文档的关键词匹配得分通过向量化计算得到。
+主要功能：
+1. 统一的jieba分词与停用词过滤
+2. 大批量文本的多进程并行分词，以及流水线构建时的持久分词进程池
+3. 文档-词频稀疏矩阵（CSR）的构建、持久化和关键词得分计算
+4. 基于BM25的倒排索引，支持在全部语料上进行词法检索
+"""
+
+import os
+import multiprocessing
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Dict
+import jieba
+import numpy as np
+from loguru import logger
+from src.knowledge_management.packed_arrays import write_packed, read_packed
+
+# 停用词是在搜索中不具有区分性的常用词
+STOPWORDS = frozenset(['的', '了', '在', '是', '我', '有', '和', '就',
+                       '不', '人', '都', '一', '一个', '上', '也', '很',
+                       '到', '说', '要', '去', '你', '会', '着', '没有',
+                       '看', '好', '自己', '这'])
+
+# 文本数量达到该阈值时才启用多进程分词，避免小批量时进程启动开销大于收益
+PARALLEL_TOKENIZE_THRESHOLD = 2000
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    文本分词处理
+
+    将输入文本切分为词语，并移除停用词和单字词。
+
+    Args:
+        text (str): 输入文本
+
+    Returns:
+        List[str]: 分词结果列表
+    """
+    return [w for w in jieba.cut(text) if w not in STOPWORDS and len(w.strip()) > 1]
+
+
+def _tokenize_chunk(texts):
+    return [tokenize(text) for text in texts]
+
+
+def tokenize_corpus(texts: List[str], workers: int = None) -> List[List[str]]:
+    """
+    批量分词
+
+    文本数量较多时按CPU核心数拆分为多个分块，在进程池中并行分词。
+    使用spawn方式创建子进程，避免在多线程的API服务进程中fork带来的死锁风险。
+
+    Args:
+        texts (List[str]): 文本列表
+        workers (int, optional): 进程数，默认为CPU核心数
+
+    Returns:
+        List[List[str]]: 与输入顺序一致的分词结果
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(texts) < PARALLEL_TOKENIZE_THRESHOLD:
+        return _tokenize_chunk(texts)
+
+    chunk_size = (len(texts) + workers * 4 - 1) // (workers * 4)
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    logger.info(f"使用 {workers} 个进程并行分词 {len(texts)} 条文本")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results = []
+            for chunk_tokens in executor.map(_tokenize_chunk, chunks):
+                results.extend(chunk_tokens)
+            return results
+    except Exception as e:
+        logger.warning(f"并行分词失败，改为单进程分词: {str(e)}")
+        return _tokenize_chunk(texts)
+
+
+class TokenizerPool:
+    """
+    持久的分词进程池
+
+    流水线构建索引时文本分批到达，每批通常达不到 tokenize_corpus 的并行阈值，每批重新启动进程池的开销也过大。
+    进程池在整个构建期间保持，每批文本拆分为分块提交后立即返回，由调用方在需要时收集结果，
+    分词在多个CPU核心上并行，并与文件解析和向量生成重叠执行。
+    累计提交的文本达到 PARALLEL_TOKENIZE_THRESHOLD 之前直接在提交线程中分词，小规模构建不启动进程池。
+    """
+
+    def __init__(self, workers: int = None):
+        """
+        Args:
+            workers (int, optional): 进程数，默认为CPU核心数
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+        self._submitted = 0
+        self._failed = False
+
+    def submit(self, texts: List[str]):
+        """
+        提交一批文本分词
+
+        Args:
+            texts (List[str]): 文本列表
+
+        Returns:
+            tuple: 分词任务，交给 gather 收集结果
+        """
+        self._submitted += len(texts)
+        if self.workers <= 1 or self._failed or (self._executor is None
+                                                 and self._submitted < PARALLEL_TOKENIZE_THRESHOLD):
+            return texts, [_completed(_tokenize_chunk(texts))]
+        try:
+            if self._executor is None:
+                logger.info(f"使用 {self.workers} 个进程并行分词")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            chunk_size = max(1, (len(texts) + self.workers - 1) // self.workers)
+            return texts, [self._executor.submit(_tokenize_chunk, texts[i:i + chunk_size])
+                           for i in range(0, len(texts), chunk_size)]
+        except Exception as e:
+            logger.warning(f"并行分词失败，改为单进程分词: {str(e)}")
+            self._failed = True
+            return texts, [_completed(_tokenize_chunk(texts))]
+
+    def gather(self, task) -> List[List[str]]:
+        """
+        收集分词任务的结果，进程池异常时改为在当前线程中分词
+
+        Args:
+            task (tuple): submit 返回的分词任务
+
+        Returns:
+            List[List[str]]: 与提交顺序一致的分词结果
+        """
+        texts, futures = task
+        try:
+            results = []
+            for future in futures:
+                results.extend(future.result())
+            return results
+        except Exception as e:
+            logger.warning(f"并行分词失败，改为单进程分词: {str(e)}")
+            self._failed = True
+            return _tokenize_chunk(texts)
+
+    def close(self):
+        """关闭进程池，取消尚未开始的分块"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _completed(result):
+    """生成已完成的Future"""
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class TermMatrix:
+    """
+    文档-词频稀疏矩阵
+
+    以CSR格式保存每个文档的词频：文档 i 的词项ID为 term_ids[indptr[i]:indptr[i+1]]，
+    对应词频为 counts 的同一区间，每行内词项ID升序排列。
+    词表以UTF-8字节块加偏移数组的形式保存，整体写入紧凑数组文件，不使用pickle。
+    """
+
+    def __init__(self, vocabulary: List[str] = None, indptr=None, term_ids=None, counts=None):
+        self.vocabulary = list(vocabulary or [])
+        self.term_to_id: Dict[str, int] = {term: i for i, term in enumerate(self.vocabulary)}
+        self.indptr = indptr if indptr is not None else np.zeros(1, dtype=np.int64)
+        self.term_ids = term_ids if term_ids is not None else np.zeros(0, dtype=np.int32)
+        self.counts = counts if counts is not None else np.zeros(0, dtype=np.int32)
+
+    @property
+    def num_docs(self):
+        return len(self.indptr) - 1
+
+    @classmethod
+    def from_texts(cls, texts: List[str], workers: int = None):
+        """
+        对文本分词并构建词频矩阵
+
+        Args:
+            texts (List[str]): 文档文本列表
+            workers (int, optional): 分词进程数
+
+        Returns:
+            TermMatrix: 词频矩阵
+        """
+        matrix = cls()
+        matrix.append_tokens(tokenize_corpus(texts, workers))
+        return matrix
+
+    def append_tokens(self, token_lists: List[List[str]]):
+        """
+        追加文档的分词结果
+
+        Args:
+            token_lists (List[List[str]]): 每个新文档的分词结果
+        """
+        indptr = [int(self.indptr[-1])]
+        term_ids = []
+        counts = []
+        for tokens in token_lists:
+            row = {}
+            for term, count in Counter(tokens).items():
+                term_id = self.term_to_id.get(term)
+                if term_id is None:
+                    term_id = self.term_to_id[term] = len(self.vocabulary)
+                    self.vocabulary.append(term)
+                row[term_id] = count
+            for term_id in sorted(row):
+                term_ids.append(term_id)
+                counts.append(row[term_id])
+            indptr.append(indptr[0] + len(term_ids))
+
+        self.indptr = np.concatenate([self.indptr, np.array(indptr[1:], dtype=np.int64)])
+        self.term_ids = np.concatenate([self.term_ids, np.array(term_ids, dtype=np.int32)])
+        self.counts = np.concatenate([self.counts, np.array(counts, dtype=np.int32)])
+
+    def select_rows(self, rows) -> "TermMatrix":
+        """
+        按文档ID选取若干行，生成新的词频矩阵（用于删除文档后压缩矩阵）
+
+        词表保持不变，被删除文档独有的词项文档频率变为0，不影响BM25打分。
+
+        Args:
+            rows: 保留的文档ID，按新矩阵中的顺序排列
+
+        Returns:
+            TermMatrix: 只包含所选文档的词频矩阵
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        # 每个保留元素在原数组中的位置：所在行的起点 + 行内偏移
+        positions = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return TermMatrix(self.vocabulary, indptr, self.term_ids[positions], self.counts[positions])
+
+    def lookup(self, tokens: List[str]) -> List[int]:
+        """
+        将分词结果转换为词项ID，忽略词表中不存在的词
+
+        Args:
+            tokens (List[str]): 分词结果
+
+        Returns:
+            List[int]: 词项ID列表
+        """
+        return [self.term_to_id[t] for t in tokens if t in self.term_to_id]
+
+    def keyword_scores(self, query_tokens: List[str], doc_ids) -> np.ndarray:
+        """
+        计算查询与一组文档的关键词匹配得分
+
+        得分定义与逐文档计算一致：匹配词数（按词频取较小值）除以查询词总数。
+
+        Args:
+            query_tokens (List[str]): 查询文本的分词结果
+            doc_ids: 候选文档ID数组
+
+        Returns:
+            np.ndarray: 与doc_ids顺序一致的得分（0-1之间）
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        return self.keyword_scores_batch([query_tokens], np.zeros(len(doc_ids), dtype=np.int64), doc_ids)
+
+    def keyword_scores_batch(self, query_token_lists: List[List[str]], pair_queries, pair_docs) -> np.ndarray:
+        """
+        批量计算多组 (查询, 文档) 的关键词匹配得分
+
+        所有候选文档的词频区间一次性拼接，以 (查询序号, 词项ID) 组合键在排好序的
+        查询词表中查找，再通过bincount汇总，整个批次只需一次向量化计算。
+
+        Args:
+            query_token_lists (List[List[str]]): 每个查询的分词结果
+            pair_queries: 每个待计算组合的查询序号
+            pair_docs: 每个待计算组合的文档ID
+
+        Returns:
+            np.ndarray: 与组合顺序一致的得分（0-1之间）
+        """
+        pair_queries = np.asarray(pair_queries, dtype=np.int64)
+        pair_docs = np.asarray(pair_docs, dtype=np.int64)
+        scores = np.zeros(len(pair_docs), dtype=np.float64)
+        if len(pair_docs) == 0:
+            return scores
+
+        # 以 查询序号*词表大小+词项ID 作为组合键，构建所有查询的有序词表
+        vocab_size = max(len(self.vocabulary), 1)
+        query_keys, query_counts = [], []
+        total_query_terms = np.zeros(len(query_token_lists), dtype=np.float64)
+        for q, tokens in enumerate(query_token_lists):
+            query_counter = Counter(tokens)
+            total_query_terms[q] = sum(query_counter.values())
+            for term, count in query_counter.items():
+                term_id = self.term_to_id.get(term)
+                if term_id is not None:
+                    query_keys.append(q * vocab_size + term_id)
+                    query_counts.append(count)
+        if not query_keys:
+            return scores
+        order = np.argsort(query_keys)
+        query_keys = np.array(query_keys, dtype=np.int64)[order]
+        query_counts = np.array(query_counts, dtype=np.int64)[order]
+
+        # 拼接所有候选文档的非零项
+        starts = self.indptr[pair_docs]
+        lengths = self.indptr[pair_docs + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return scores
+        rows = np.repeat(np.arange(len(pair_docs)), lengths)
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+        keys = pair_queries[rows] * vocab_size + self.term_ids[offsets]
+
+        # 在排好序的查询组合键中查找文档词项
+        positions = np.minimum(np.searchsorted(query_keys, keys), len(query_keys) - 1)
+        matched = query_keys[positions] == keys
+        overlap = np.minimum(self.counts[offsets][matched], query_counts[positions[matched]])
+        # 没有任何匹配词项时bincount返回整数数组，统一转为浮点数再相除
+        scores = np.bincount(rows[matched], weights=overlap, minlength=len(pair_docs)).astype(np.float64)
+        denominators = total_query_terms[pair_queries]
+        return np.divide(scores, denominators, out=np.zeros_like(scores), where=denominators > 0)
+
+    def save(self, path):
+        """
+        保存词频矩阵到紧凑数组文件
+
+        Args:
+            path (str): 文件路径
+        """
+        encoded = [term.encode("utf-8") for term in self.vocabulary]
+        vocab_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            vocab_offsets[1:] = np.cumsum([len(term) for term in encoded])
+        write_packed(path, {
+            "indptr": self.indptr,
+            "term_ids": self.term_ids,
+            "counts": self.counts,
+            "vocab_blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            "vocab_offsets": vocab_offsets,
+        }, meta={"num_docs": self.num_docs, "num_terms": len(self.vocabulary)})
+
+    @classmethod
+    def load(cls, path):
+        """
+        从紧凑数组文件加载词频矩阵
+
+        Args:
+            path (str): 文件路径
+
+        Returns:
+            TermMatrix: 词频矩阵
+        """
+        arrays, _ = read_packed(path, mmap=False)
+        blob = arrays["vocab_blob"].tobytes()
+        offsets = arrays["vocab_offsets"]
+        vocabulary = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+        return cls(vocabulary, arrays["indptr"], arrays["term_ids"], arrays["counts"])
+
+
+class BM25Index:
+    """
+    基于BM25的倒排索引
+
+    由文档-词频矩阵转置得到：词项 t 的倒排列表为 doc_ids[term_indptr[t]:term_indptr[t+1]]，
+    构建时即按BM25公式预先计算每个倒排项的得分贡献（impacts），查询时只需按查询词
+    取出倒排区间并累加，可以在全部语料上完成词法检索。
+    词项ID与TermMatrix的词表一致，持久化时不重复保存词表；加载时以内存映射方式读取。
+    """
+
+    def __init__(self, term_indptr=None, doc_ids=None, impacts=None, num_docs=0,
+                 k1: float = 1.5, b: float = 0.75, avgdl: float = 0.0):
+        self.term_indptr = term_indptr if term_indptr is not None else np.zeros(1, dtype=np.int64)
+        self.doc_ids = doc_ids if doc_ids is not None else np.zeros(0, dtype=np.int32)
+        self.impacts = impacts if impacts is not None else np.zeros(0, dtype=np.float32)
+        self.num_docs = int(num_docs)
+        self.k1 = float(k1)
+        self.b = float(b)
+        self.avgdl = float(avgdl)
+
+    @property
+    def num_terms(self):
+        return len(self.term_indptr) - 1
+
+    @classmethod
+    def from_term_matrix(cls, term_matrix: TermMatrix, k1: float = 1.5, b: float = 0.75):
+        """
+        由文档-词频矩阵构建倒排索引
+
+        Args:
+            term_matrix (TermMatrix): 文档-词频矩阵
+            k1 (float): 词频饱和参数
+            b (float): 文档长度归一化参数
+
+        Returns:
+            BM25Index: 倒排索引
+        """
+        num_docs = term_matrix.num_docs
+        num_terms = len(term_matrix.vocabulary)
+        lengths = np.diff(term_matrix.indptr)
+        rows = np.repeat(np.arange(num_docs, dtype=np.int32), lengths)
+        counts = np.asarray(term_matrix.counts, dtype=np.float64)
+        doc_lengths = np.bincount(rows, weights=counts, minlength=num_docs)
+        avgdl = float(doc_lengths.mean()) if num_docs else 0.0
+
+        # 按词项ID稳定排序，使每个倒排列表内的文档ID保持升序
+        order = np.argsort(term_matrix.term_ids, kind="stable")
+        terms = np.asarray(term_matrix.term_ids)[order]
+        doc_ids = rows[order]
+        tf = counts[order]
+        df = np.bincount(terms, minlength=num_terms)
+        term_indptr = np.zeros(num_terms + 1, dtype=np.int64)
+        term_indptr[1:] = np.cumsum(df)
+
+        idf = np.log(1.0 + (num_docs - df + 0.5) / (df + 0.5))
+        norm = k1 * (1.0 - b + b * doc_lengths[doc_ids] / avgdl) if avgdl > 0 else k1
+        impacts = (idf[terms] * tf * (k1 + 1.0) / (tf + norm)).astype(np.float32)
+        return cls(term_indptr, doc_ids.astype(np.int32), impacts, num_docs, k1, b, avgdl)
+
+    def score(self, query_term_ids: List[int]) -> np.ndarray:
+        """
+        计算查询对全部文档的BM25得分
+
+        Args:
+            query_term_ids (List[int]): 查询词的词项ID（可重复，重复的词按次数加权）
+
+        Returns:
+            np.ndarray: 长度为文档数的得分数组，未命中任何查询词的文档得分为0
+        """
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term_id, count in Counter(query_term_ids).items():
+            if not 0 <= term_id < self.num_terms:
+                continue
+            start, end = self.term_indptr[term_id], self.term_indptr[term_id + 1]
+            # 同一倒排列表内文档ID唯一，可以直接按下标累加
+            scores[self.doc_ids[start:end]] += count * self.impacts[start:end]
+        return scores
+
+    @staticmethod
+    def top(scores: np.ndarray, top_n: int, doc_mask=None):
+        """
+        从得分数组中选出得分最高的文档
+
+        Args:
+            scores (np.ndarray): score() 返回的得分数组
+            top_n (int): 返回的文档数量
+            doc_mask (np.ndarray, optional): 布尔数组，只在为True的文档中选择
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 按得分降序排列的文档ID和BM25得分
+        """
+        hits = np.flatnonzero(scores if doc_mask is None else scores * doc_mask)
+        if top_n <= 0 or len(hits) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if len(hits) > top_n:
+            hits = hits[np.argpartition(-scores[hits], top_n - 1)[:top_n]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return hits, scores[hits]
+
+    def search(self, query_term_ids: List[int], top_n: int, doc_mask=None):
+        """
+        在全部文档上执行BM25检索
+
+        Args:
+            query_term_ids (List[int]): 查询词的词项ID（可重复，重复的词按次数加权）
+            top_n (int): 返回的文档数量
+            doc_mask (np.ndarray, optional): 布尔数组，只在为True的文档中检索
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 按得分降序排列的文档ID和BM25得分
+        """
+        return self.top(self.score(query_term_ids), top_n, doc_mask)
+
+    def save(self, path):
+        """
+        保存倒排索引到紧凑数组文件
+
+        Args:
+            path (str): 文件路径
+        """
+        write_packed(path, {
+            "term_indptr": self.term_indptr,
+            "doc_ids": self.doc_ids,
+            "impacts": self.impacts,
+        }, meta={"num_docs": self.num_docs, "num_terms": self.num_terms,
+                 "k1": self.k1, "b": self.b, "avgdl": self.avgdl})
+
+    @classmethod
+    def load(cls, path):
+        """
+        以内存映射方式加载倒排索引
+
+        Args:
+            path (str): 文件路径
+
+        Returns:
+            BM25Index: 倒排索引，倒排数组为只读内存映射
+        """
+        arrays, meta = read_packed(path, mmap=True)
+        return cls(arrays["term_indptr"], arrays["doc_ids"], arrays["impacts"],
+                   meta["num_docs"], meta["k1"], meta["b"], meta["avgdl"])
+
+
+# 模块测试代码
+if __name__ == "__main__":
+    matrix = TermMatrix.from_texts(["长江 水位 上涨", "暴雨 洪水"], workers=1)
+    # 查询词与候选文档没有任何重叠时得分为0
+    scores = matrix.keyword_scores(["长沙"], [0, 1])
+    assert scores.dtype == np.float64 and not scores.any(), scores
+    scores = matrix.keyword_scores(["水位", "长沙"], [0, 1])
+    assert np.allclose(scores, [0.5, 0.0]), scores
+    print("关键词得分检查通过")
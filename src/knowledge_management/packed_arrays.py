@@ -0,0 +1,107 @@
+"""
+紧凑数组文件格式
+
+将多个NumPy数组连同一段JSON元信息写入单个二进制文件，读取时可以直接内存映射，
+用于持久化与FAISS索引配套的词频矩阵、倒排索引等数据，避免使用pickle。
+
+文件布局：
+    8字节魔数 | 8字节头部长度(小端) | JSON头部 | 按64字节对齐的各数组原始数据
+JSON头部记录每个数组的dtype、shape和数据偏移，以及调用方传入的元信息。
+"""
+
+import os
+import json
+import numpy as np
+
+MAGIC = b"FRPACK01"
+ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_packed(path, arrays, meta=None):
+    """
+    将多个数组写入紧凑数组文件
+
+    先写入临时文件再原子替换，读取方不会看到写了一半的文件。
+
+    Args:
+        path (str): 目标文件路径
+        arrays (Dict[str, np.ndarray]): 数组名到数组的映射
+        meta (dict, optional): 需要一并保存的元信息，必须可以JSON序列化
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    # 先计算头部长度，再据此确定各数组的数据偏移
+    entries = {name: {"dtype": array.dtype.str, "shape": list(array.shape), "offset": 0}
+               for name, array in arrays.items()}
+    header = {"meta": meta or {}, "arrays": entries}
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    # 偏移量写入后头部会变长，预留足够的空间
+    header_size = len(header_bytes) + 32 * len(arrays) + 64
+
+    offset = _align(16 + header_size)
+    for name, array in arrays.items():
+        entries[name]["offset"] = offset
+        offset = _align(offset + array.nbytes)
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    if len(header_bytes) > header_size:
+        raise ValueError("紧凑数组文件头部超出预留空间")
+    header_bytes = header_bytes.ljust(header_size, b" ")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.write(b"\0" * (entries[name]["offset"] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_packed_header(path):
+    """
+    只读取紧凑数组文件的头部
+
+    Args:
+        path (str): 文件路径
+
+    Returns:
+        dict: 包含 meta 和 arrays 两个字段的头部信息
+    """
+    with open(path, "rb") as f:
+        if f.read(8) != MAGIC:
+            raise ValueError(f"不是有效的紧凑数组文件: {path}")
+        header_size = int.from_bytes(f.read(8), "little")
+        return json.loads(f.read(header_size).decode("utf-8"))
+
+
+def read_packed(path, mmap=True):
+    """
+    读取紧凑数组文件
+
+    Args:
+        path (str): 文件路径
+        mmap (bool): 是否以只读内存映射方式加载，默认为True
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], dict]: 数组映射和元信息。返回的数组是只读的
+    """
+    header = read_packed_header(path)
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    else:
+        buffer = np.fromfile(path, dtype=np.uint8)
+        buffer.flags.writeable = False
+
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        count = int(np.prod(shape)) if shape else 1
+        start = entry["offset"]
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(shape)
+    return arrays, header["meta"]
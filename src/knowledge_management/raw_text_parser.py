@@ -0,0 +1,568 @@
+"""
+原始文本文件解析
+
+解析知识库 raw_texts 目录中由链接抓取模块写入的文章，提取结构化数据中的事件并生成向量化文本。
+每篇文章保存为两个文件：供人阅读的文本文件（.txt）和同名的JSON记录文件（.json），
+记录文件包含URL、标题、提取时间和结构化数据，读取时一次解析即可，不再需要从文本中查找标记。
+记录文件保存了对应文本文件内容的哈希，文本文件被修改或没有记录文件（旧数据）时改为解析文本。
+构建索引时文件数量可能很多，解析会在进程池中并行执行，
+解析结果按 (文件路径, 文件大小, 修改时间) 缓存在磁盘上，未变化的文件不再读取和解析。
+主要功能：
+1. 写入文章的文本文件和JSON记录文件
+2. 优先读取JSON记录，旧数据使用JSON或Python字面量解析文本中的结构化数据，不执行任意代码
+3. 文件较多时使用多进程并行读取、计算文件签名和解析
+4. 每个文本目录一个缓存文件，记录文件签名和解析出的事件
+"""
+
+import os
+import re
+import ast
+import json
+import hashlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+from src.config import config
+
+# 事件类别，结构化数据中以类别名为键保存事件列表
+EVENT_CATEGORIES = ["rainfall", "water_condition", "disaster_impact", "measures"]
+
+# 结构化数据的起始标记和可能的结束标记
+STRUCTURED_DATA_MARKER = "结构化数据:"
+SECTION_END_MARKERS = ["原始内容摘要:", "原始标题:"]
+
+# 文本文件头部字段：记录字段 -> 匹配文本中该字段的正则
+HEADER_PATTERNS = {
+    "url": re.compile(r"URL:\s*(https?://[^\r\n]+)"),
+    "title": re.compile(r"标题:\s*([^\r\n]+)"),
+    "extracted_time": re.compile(r"提取时间:\s*([^\r\n]+)"),
+    "error": re.compile(r"提取错误:\s*([^\r\n]+)"),
+}
+
+# 文章记录文件格式版本和扩展名
+ARTICLE_RECORD_VERSION = 1
+RECORD_SUFFIX = ".json"
+
+# 需要解析的文件数量达到该阈值时才启用多进程解析，避免小批量时进程启动开销大于收益
+PARALLEL_PARSE_THRESHOLD = 100
+# 进程池中每个任务最多解析的文件数，流式读取时限制已解析但尚未处理的结果数量
+PARALLEL_PARSE_CHUNK_MAX = 50
+
+DEFAULT_PARSE_CACHE_SETTINGS = {
+    "enabled": True,
+    "path": "data/parse_cache",
+}
+
+
+def make_event_text(event):
+    """
+    生成事件用于向量化的文本描述
+
+    Args:
+        event (dict): 事件数据
+
+    Returns:
+        str: 由时间、地点、描述和其他字段拼接的文本
+    """
+    event_text = f"{event.get('time', '未知')} {event.get('location', '未知')} {event.get('description', '')}"
+    for key in event:
+        if key not in ["time", "location", "description"]:
+            event_text += f" {key}: {event[key]}"
+    return event_text
+
+
+def extract_structured_data_text(content):
+    """
+    截取文件内容中的结构化数据部分
+
+    Args:
+        content (str): 文件内容
+
+    Returns:
+        str or None: 结构化数据文本，没有结构化数据标记时返回None
+    """
+    if STRUCTURED_DATA_MARKER not in content:
+        return None
+    section = content.split(STRUCTURED_DATA_MARKER)[1]
+    for marker in SECTION_END_MARKERS:
+        if marker in section:
+            return section.split(marker)[0].strip()
+    return section.strip()
+
+
+def parse_structured_data(text):
+    """
+    安全地解析结构化数据文本
+
+    先按JSON解析，失败时按Python字面量解析（抓取模块以 str(dict) 的形式写入），都不会执行代码。
+
+    Args:
+        text (str): 结构化数据文本
+
+    Returns:
+        Any: 解析结果
+
+    Raises:
+        ValueError: 如果文本既不是JSON也不是Python字面量
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError) as e:
+        raise ValueError(str(e)) from e
+
+
+def empty_structured_data():
+    """返回没有任何事件的结构化数据"""
+    data = {category: [] for category in EVENT_CATEGORIES}
+    data["raw_text"] = ""
+    return data
+
+
+def get_record_path(text_path):
+    """
+    获取文本文件对应的JSON记录文件路径
+
+    Args:
+        text_path (str): 文本文件路径
+
+    Returns:
+        str: 同目录下同名的 .json 文件路径
+    """
+    return os.path.splitext(text_path)[0] + RECORD_SUFFIX
+
+
+def format_article_text(article, summary=None):
+    """
+    生成供人阅读的文章文本
+
+    Args:
+        article (dict): 文章记录，包含 url、title、extracted_time、structured_data，可选 error
+        summary (str, optional): 原始内容摘要
+
+    Returns:
+        str: 文本文件内容
+    """
+    text = f"URL: {article['url']}\n标题: {article['title']}\n提取时间: {article['extracted_time']}\n\n"
+    if article.get("error"):
+        text += f"提取错误: {article['error']}\n\n"
+    text += f"{STRUCTURED_DATA_MARKER}\n"
+    text += json.dumps(article["structured_data"], ensure_ascii=False, default=str) + "\n"
+    if summary is not None:
+        text += f"\n原始内容摘要:\n{summary}\n"
+    return text
+
+
+def write_record(text_path, article, text_bytes):
+    """
+    写入文本文件对应的JSON记录文件，先写临时文件再替换
+
+    Args:
+        text_path (str): 文本文件路径
+        article (dict): 文章记录
+        text_bytes (bytes): 文本文件内容，记录中保存其哈希用于判断记录是否过期
+    """
+    record = {"version": ARTICLE_RECORD_VERSION, **article, "text_sha1": hashlib.sha1(text_bytes).hexdigest()}
+    record_path = get_record_path(text_path)
+    with open(record_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False, default=str)
+    os.replace(record_path + ".tmp", record_path)
+
+
+def write_article(text_path, url, title, extracted_time, structured_data, summary=None, error=None):
+    """
+    保存一篇文章的文本文件和JSON记录文件
+
+    Args:
+        text_path (str): 文本文件路径，记录文件写在同目录下
+        url (str): 文章链接
+        title (str): 标题
+        extracted_time (str): 提取时间（ISO格式）
+        structured_data (dict): 按类别组织的结构化数据
+        summary (str, optional): 原始内容摘要，只写入文本文件
+        error (str, optional): 提取失败时的错误信息
+
+    Returns:
+        dict: 写入的文章记录
+    """
+    article = {"url": url, "title": title, "extracted_time": extracted_time, "structured_data": structured_data}
+    if error:
+        article["error"] = error
+    text_bytes = format_article_text(article, summary).encode('utf-8')
+    with open(text_path, 'wb') as f:
+        f.write(text_bytes)
+    write_record(text_path, article, text_bytes)
+    return article
+
+
+def parse_article_text(content):
+    """
+    从文本文件内容中解析文章记录，用于没有JSON记录的旧数据
+
+    Args:
+        content (str): 文本文件内容
+
+    Returns:
+        Tuple[dict, List[str]]: 文章记录和解析过程中的警告信息。
+            缺少的头部字段为空字符串，结构化数据缺失或无法解析时为None
+    """
+    header = content.split(STRUCTURED_DATA_MARKER)[0]
+    article = {}
+    for field, pattern in HEADER_PATTERNS.items():
+        match = pattern.search(header)
+        if match:
+            article[field] = match.group(1).strip()
+        elif field != "error":
+            article[field] = ""
+    article["structured_data"] = None
+
+    if not content.strip():
+        return article, ["文件为空，跳过"]
+    structured_data_str = extract_structured_data_text(content)
+    if not structured_data_str:
+        return article, ["结构化数据为空或格式异常，跳过"]
+    try:
+        structured_data = parse_structured_data(structured_data_str)
+    except ValueError as e:
+        return article, [f"无法解析结构化数据: {str(e)}"]
+    if not isinstance(structured_data, dict):
+        return article, [f"结构化数据格式错误，期望字典，得到: {type(structured_data)}"]
+    article["structured_data"] = structured_data
+    return article, []
+
+
+def load_record(text_path, text_bytes):
+    """
+    读取文本文件对应的JSON记录
+
+    Args:
+        text_path (str): 文本文件路径
+        text_bytes (bytes): 文本文件内容
+
+    Returns:
+        Tuple[dict or None, List[str]]: 记录（不存在、无法读取或与文本内容不一致时为None）和警告信息
+    """
+    record_path = get_record_path(text_path)
+    if not os.path.exists(record_path):
+        return None, []
+    try:
+        with open(record_path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+    except (OSError, ValueError) as e:
+        return None, [f"无法读取记录文件，改为解析文本: {str(e)}"]
+    if not isinstance(record, dict) or not isinstance(record.get("structured_data"), dict):
+        return None, ["记录文件格式错误，改为解析文本"]
+    if record.get("text_sha1") != hashlib.sha1(text_bytes).hexdigest():
+        return None, ["文本文件在记录写入后被修改，改为解析文本"]
+    return record, []
+
+
+def read_article(text_path):
+    """
+    读取一篇文章，优先使用JSON记录
+
+    Args:
+        text_path (str): 文本文件路径
+
+    Returns:
+        Tuple[dict, bytes, List[str]]: 文章记录（结构化数据无法获取时为None）、文本文件内容和警告信息
+
+    Raises:
+        OSError: 如果文本文件无法读取
+    """
+    with open(text_path, 'rb') as f:
+        text_bytes = f.read()
+    article, warnings = load_record(text_path, text_bytes)
+    if article is None:
+        article, parse_warnings = parse_article_text(text_bytes.decode('utf-8'))
+        warnings += parse_warnings
+    return article, text_bytes, warnings
+
+
+def extract_events(structured_data):
+    """
+    将结构化数据展开为事件列表
+
+    Args:
+        structured_data (dict): 按类别组织的结构化数据
+
+    Returns:
+        Tuple[List[tuple], List[str]]: (类别, 事件, 向量化文本) 列表，以及警告信息
+    """
+    records, warnings = [], []
+    # 将原始文本作为灾害影响事件存储
+    if 'raw_text' in structured_data:
+        raw_text = structured_data['raw_text']
+        event = {
+            'time': '未知',
+            'location': '未知',
+            'description': raw_text
+        }
+        records.append(('disaster_impact', event, raw_text))
+
+    # 按类别处理事件数据
+    for category in EVENT_CATEGORIES:
+        if category not in structured_data:
+            continue
+        events = structured_data[category]
+        if not isinstance(events, list):
+            warnings.append(f"{category} 不是列表类型，跳过")
+            continue
+        for event in events:
+            if not isinstance(event, dict):
+                warnings.append(f"{category} 的事件不是字典类型，跳过")
+                continue
+            records.append((category, event, make_event_text(event)))
+    return records, warnings
+
+
+def read_text_file(path):
+    """
+    读取并解析原始文本文件，同时计算文件签名
+
+    Args:
+        path (str): 文件路径
+
+    Returns:
+        Tuple[dict, List[tuple], List[str]]: 文件签名（sha1、size、mtime）、解析出的事件列表和警告信息
+
+    Raises:
+        OSError: 如果文件无法读取
+    """
+    st = os.stat(path)
+    try:
+        article, text_bytes, warnings = read_article(path)
+    except UnicodeDecodeError as e:
+        with open(path, 'rb') as f:
+            text_bytes = f.read()
+        article, warnings = None, [f"解析失败: {str(e)}"]
+    signature = {"sha1": hashlib.sha1(text_bytes).hexdigest(), "size": st.st_size, "mtime": st.st_mtime_ns}
+    records = []
+    if article is not None and article["structured_data"] is not None:
+        records, event_warnings = extract_events(article["structured_data"])
+        warnings += event_warnings
+    return signature, records, warnings
+
+
+def _read_chunk(paths):
+    """读取一组文件，无法读取的文件返回异常信息"""
+    results = []
+    for path in paths:
+        try:
+            results.append(read_text_file(path))
+        except OSError as e:
+            results.append(e)
+    return results
+
+
+def _iter_read_files(paths, workers=None):
+    """
+    按输入顺序逐个产出文件的读取和解析结果，文件较多时使用进程池
+
+    进程池中同时提交的文件块数量有上限，已完成的结果被消费后才继续提交，内存占用与文件总数无关。
+    """
+    workers = min(workers or os.cpu_count() or 1, len(paths) // PARALLEL_PARSE_THRESHOLD + 1)
+    if workers <= 1:
+        for path in paths:
+            yield from _read_chunk([path])
+        return
+
+    chunk_size = min((len(paths) + workers * 4 - 1) // (workers * 4), PARALLEL_PARSE_CHUNK_MAX)
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    logger.info(f"使用 {workers} 个进程并行解析 {len(paths)} 个文本文件")
+    done = 0
+    try:
+        # 使用spawn方式创建子进程，避免在多线程的API服务进程中fork带来的死锁风险
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    except Exception as e:
+        logger.warning(f"无法创建解析进程池，改为单进程解析: {str(e)}")
+        executor = None
+    try:
+        if executor is not None:
+            next_chunk = min(len(chunks), workers * 2)
+            futures = deque(executor.submit(_read_chunk, chunk) for chunk in chunks[:next_chunk])
+            while futures:
+                chunk_results = futures.popleft().result()
+                if next_chunk < len(chunks):
+                    futures.append(executor.submit(_read_chunk, chunks[next_chunk]))
+                    next_chunk += 1
+                done += 1
+                yield from chunk_results
+    except Exception as e:
+        logger.warning(f"并行解析失败，改为单进程解析: {str(e)}")
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+    for chunk in chunks[done:]:
+        yield from _read_chunk(chunk)
+
+
+class ParseCache:
+    """
+    单个文本目录的解析结果缓存
+
+    缓存文件以JSON保存每个文件的大小、修改时间（纳秒）、内容哈希和解析出的事件，
+    文件大小和修改时间都未变化时直接使用缓存的结果。
+    """
+
+    def __init__(self, cache_dir, directory):
+        """
+        Args:
+            cache_dir (str): 缓存目录
+            directory (str): 文本数据目录，缓存文件名由其绝对路径的哈希确定
+        """
+        directory = os.path.abspath(directory)
+        name = hashlib.sha1(directory.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(cache_dir, f"{name}.json")
+        self.directory = directory
+        self.entries = {}
+        self.dirty = False
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("directory") == directory:
+                    self.entries = data.get("files", {})
+            except Exception as e:
+                logger.warning(f"读取解析缓存 {self.path} 失败: {str(e)}")
+
+    def get(self, filename, st):
+        """
+        查找文件的缓存结果
+
+        Args:
+            filename (str): 文件名
+            st (os.stat_result): 文件当前状态
+
+        Returns:
+            Tuple[dict, List[tuple]] or None: 文件签名和事件列表，未命中时返回None
+        """
+        entry = self.entries.get(filename)
+        if not entry or entry["size"] != st.st_size or entry["mtime"] != st.st_mtime_ns:
+            return None
+        signature = {"sha1": entry["sha1"], "size": entry["size"], "mtime": entry["mtime"]}
+        return signature, [tuple(record) for record in entry["records"]]
+
+    def put(self, filename, signature, records):
+        """记录文件的解析结果"""
+        self.entries[filename] = {**signature, "records": [list(record) for record in records]}
+        self.dirty = True
+
+    def retain(self, filenames):
+        """只保留仍然存在的文件的缓存"""
+        filenames = set(filenames)
+        stale = [filename for filename in self.entries if filename not in filenames]
+        for filename in stale:
+            del self.entries[filename]
+        self.dirty = self.dirty or bool(stale)
+
+    def save(self):
+        """有变化时写入缓存文件，先写临时文件再替换"""
+        if not self.dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump({"directory": self.directory, "files": self.entries}, f, ensure_ascii=False, default=str)
+            os.replace(self.path + ".tmp", self.path)
+            self.dirty = False
+        except OSError as e:
+            logger.warning(f"写入解析缓存 {self.path} 失败: {str(e)}")
+
+
+def get_parse_cache(directory):
+    """
+    获取文本目录的解析缓存
+
+    配置项 vector_store.parse_cache 控制是否启用和缓存目录（相对项目根目录）。
+
+    Args:
+        directory (str): 文本数据目录
+
+    Returns:
+        ParseCache or None: 缓存实例，未启用时返回None
+    """
+    settings = {**DEFAULT_PARSE_CACHE_SETTINGS, **(config.get("vector_store", {}).get("parse_cache") or {})}
+    if not settings["enabled"]:
+        return None
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return ParseCache(os.path.join(project_root, settings["path"]), directory)
+
+
+def iter_text_files(directory, filenames, workers=None, all_files=None):
+    """
+    按文件顺序逐个读取并解析一组原始文本文件
+
+    大小和修改时间未变化的文件直接使用缓存的结果，其余文件在进程池中并行读取和解析后写入缓存。
+    结果逐个产出，调用方可以在后续文件解析的同时处理已产出的文件。
+
+    Args:
+        directory (str): 文本数据目录
+        filenames (List[str]): 需要读取的文件名
+        workers (int, optional): 进程数，默认为CPU核心数
+        all_files (List[str], optional): 目录中的全部文件名，提供时清理已删除文件的缓存
+
+    Yields:
+        Tuple[str, dict, List[tuple]]: (文件名, 文件签名, 事件列表)，无法读取的文件被跳过
+    """
+    cache = get_parse_cache(directory)
+    entries, pending = [], []
+    for filename in filenames:
+        path = os.path.join(directory, filename)
+        try:
+            cached = cache.get(filename, os.stat(path)) if cache is not None else None
+        except OSError as e:
+            logger.error(f"读取文件 {filename} 失败: {str(e)}")
+            continue
+        entries.append((filename, cached))
+        if cached is None:
+            pending.append(filename)
+
+    if cache is not None and len(pending) < len(filenames):
+        logger.info(f"解析缓存命中 {len(filenames) - len(pending)} 个文件，需要解析 {len(pending)} 个")
+
+    parsed = _iter_read_files([os.path.join(directory, filename) for filename in pending], workers)
+    try:
+        for filename, cached in entries:
+            if cached is not None:
+                yield (filename, *cached)
+                continue
+            result = next(parsed)
+            if isinstance(result, OSError):
+                logger.error(f"读取文件 {filename} 失败: {str(result)}")
+                continue
+            signature, records, warnings = result
+            for warning in warnings:
+                logger.warning(f"文件 {filename}: {warning}")
+            if cache is not None:
+                cache.put(filename, signature, records)
+            yield filename, signature, records
+    finally:
+        parsed.close()
+        if cache is not None:
+            if all_files is not None:
+                cache.retain(all_files)
+            cache.save()
+
+
+def load_text_files(directory, filenames, workers=None, all_files=None):
+    """
+    读取并解析一组原始文本文件
+
+    大小和修改时间未变化的文件直接使用缓存的结果，其余文件在进程池中并行读取和解析后写入缓存。
+
+    Args:
+        directory (str): 文本数据目录
+        filenames (List[str]): 需要读取的文件名
+        workers (int, optional): 进程数，默认为CPU核心数
+        all_files (List[str], optional): 目录中的全部文件名，提供时清理已删除文件的缓存
+
+    Returns:
+        Dict[str, Tuple[dict, List[tuple]]]: 文件名 -> (文件签名, 事件列表)，无法读取的文件不包含在内
+    """
+    return {filename: (signature, records)
+            for filename, signature, records in iter_text_files(directory, filenames, workers, all_files)}
@@ -1,50 +1,262 @@
-import dashscope
-from http import HTTPStatus
-import os
+import time
+import queue
+import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from loguru import logger
 from src.config import config
+from src.knowledge_management.embedding_cache import get_embedding_cache, make_cache_key
+from src.knowledge_management.embedding_backends import create_embedding_backend
 
 # 配置日志记录
 logger.add("logs/rag_process.log", rotation="1 MB", format="{time} {level} {message}")
 
+# 等待查询向量的默认最长时间（秒），需要覆盖接口调用的重试和退避
+DEFAULT_QUERY_TIMEOUT = 60
+
+class TokenBucket:
+    """
+    令牌桶限流器
+
+    每秒补充 rate 个令牌，最多积累 capacity 个；每次接口调用消耗一个令牌，
+    令牌不足时阻塞等待。多个线程共用同一个限流器。
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): 每秒允许的请求数，不大于0表示不限流
+            capacity (float, optional): 令牌桶容量（允许的突发请求数），默认与rate相同
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """获取一个令牌，必要时等待"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    获取进程内共享的嵌入接口限流器
+
+    接口的速率限制按账号计算，同一进程内的所有嵌入器共用一个令牌桶。
+
+    Returns:
+        TokenBucket: 按 model.embedding.requests_per_second 配置的限流器
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(float(config['model']['embedding'].get('requests_per_second', 0)))
+        return _rate_limiter
+
+
+class QueryBatcher:
+    """
+    查询向量微批处理器
+
+    并发的搜索/聊天请求各自只嵌入一条查询文本。调用方把查询放入队列后等待Future，
+    后台调度线程收到第一条查询后最多再等待 max_wait 秒（或凑满一个批次），
+    将这一批查询合并为一次嵌入接口调用，再把向量分发给各个调用方。
+    同一批次中相同的查询只嵌入一次；多个批次可以同时在途，互不阻塞。
+    """
+
+    def __init__(self, embed_batch, batch_size, max_wait, max_concurrency):
+        """
+        Args:
+            embed_batch (callable): 批量嵌入函数，参数为文本列表，返回向量列表或None
+            batch_size (int): 每批最多合并的查询数
+            max_wait (float): 收到第一条查询后最多等待的秒数
+            max_concurrency (int): 同时在途的批次数
+        """
+        self._embed_batch = embed_batch
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="query-embed")
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, text):
+        """
+        提交一条查询文本
+
+        Args:
+            text (str): 查询文本
+
+        Returns:
+            Future: 结果为向量（浮点数列表），生成失败时为None
+        """
+        future = Future()
+        self._queue.put((text, future))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+                self._thread.start()
+        return future
+
+    def _run(self):
+        """调度线程：收集一批查询后交给线程池执行"""
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(pending) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._pool.submit(self._dispatch, pending)
+            except Exception as e:
+                logger.error(f"提交查询嵌入批次失败: {e}")
+                self._resolve(pending, {})
+
+    def _dispatch(self, pending):
+        """嵌入一批查询并把结果分发给等待的调用方，任何异常都不会使调用方的Future悬而未决"""
+        by_text = {}
+        try:
+            invalid = [text for text, _ in pending if not isinstance(text, str)]
+            if invalid:
+                # 非字符串的查询（例如误传列表）得到None，不影响同一批次中的其他查询
+                logger.error(f"查询文本必须是字符串，收到 {type(invalid[0]).__name__}")
+            texts = list(dict.fromkeys(text for text, _ in pending if isinstance(text, str)))
+            embeddings = self._embed_batch(texts)
+            if embeddings and len(embeddings) == len(texts):
+                by_text = dict(zip(texts, embeddings))
+            if len(pending) > 1:
+                logger.debug(f"合并 {len(pending)} 条查询为一次嵌入调用（去重后 {len(texts)} 条）")
+        except Exception as e:
+            logger.error(f"批量生成查询向量异常: {e}")
+        finally:
+            self._resolve(pending, by_text)
+
+    @staticmethod
+    def _resolve(pending, by_text):
+        """把结果分发给尚未完成的Future，没有结果的查询得到None"""
+        for text, future in pending:
+            if not future.done():
+                future.set_result(by_text.get(text) if isinstance(text, str) else None)
+
+
+_query_batchers = {}
+_query_batchers_lock = threading.Lock()
+
+
 class TextEmbedder:
     """
     文本嵌入器类
     
     负责将文本转换为向量表示，是RAG系统中连接语义理解与向量检索的关键组件。
-    使用火山引擎DashScope提供的文本嵌入服务，将文本映射到高维向量空间，
-    使得语义相似的文本在向量空间中距离较近，从而支持后续的相似度搜索。
+    将文本映射到高维向量空间，使得语义相似的文本在向量空间中距离较近，从而支持后续的相似度搜索。
+    生成向量的后端由 model.embedding.provider 选择（DashScope接口、本地模型或哈希向量），
+    缓存、分批、并发、重试和查询微批处理对所有后端通用。
     """
-    def __init__(self):
+    def __init__(self, dimension=None):
         """
         初始化文本嵌入器
         
-        从配置文件和环境变量中获取API密钥和模型名称，
-        设置DashScope API以便后续调用文本嵌入服务。
+        按配置创建嵌入后端，并读取批大小、并发、重试和缓存等设置。
+
+        Args:
+            dimension (int, optional): 向量维度，默认使用配置文件 model.embedding.dimension，
+                加载已有索引时由向量存储传入索引的维度
         
         Raises:
-            ValueError: 如果未设置必要的API密钥环境变量
+            ValueError: 如果provider不受支持、后端不支持请求的维度，或使用DashScope时未设置必要的API密钥环境变量
+            ImportError: 如果本地模型后端需要的依赖未安装
         """
-        # 从配置中获取API密钥环境变量名并读取值
-        self.api_key = os.environ.get(config['model']['embedding']['api_key_env'])
-        if not self.api_key:
-            raise ValueError(f"未设置环境变量 {config['model']['embedding']['api_key_env']}")
-        
-        # 设置DashScope全局API密钥
-        dashscope.api_key = self.api_key
-        
-        # 获取嵌入模型名称
-        self.model_name = config['model']['embedding']['model_name']  # text-embedding-v3
+        embedding_config = config['model']['embedding']
+        # 配置为0表示使用模型默认维度
+        dimension = dimension or embedding_config.get('dimension') or None
+        self.backend = create_embedding_backend(embedding_config, dimension)
 
-    def embed_text(self, texts):
+        # 嵌入模型名称、输出维度（None表示模型默认维度）和单次调用的最大文本数由后端决定
+        self.model_name = self.backend.model_name
+        self.dimension = self.backend.dimension
+        self.batch_size = self.backend.batch_size
+
+        # 并发调用数、失败重试次数和指数退避的初始等待时间（秒）
+        self.max_concurrency = max(1, self.backend.max_concurrency)
+        self.max_retries = embedding_config.get('max_retries', 3)
+        self.retry_backoff = embedding_config.get('retry_backoff', 1.0)
+        # 只有远程接口需要限流，本地推理不限流
+        self.rate_limiter = get_rate_limiter() if self.backend.remote else TokenBucket(0)
+
+        # 所有知识库共用的嵌入向量磁盘缓存，未启用时为None
+        self.cache = get_embedding_cache()
+
+        # 查询向量微批处理：合并并发请求的查询文本，等待时间以毫秒配置
+        batching_config = config['model']['embedding'].get('query_batching') or {}
+        self.query_batching = batching_config.get('enabled', True)
+        self.query_batch_wait = batching_config.get('max_wait_ms', 5) / 1000.0
+        # 等待查询向量的最长时间（秒），超时视为生成失败
+        self.query_timeout = batching_config.get('timeout', DEFAULT_QUERY_TIMEOUT)
+
+    def _get_query_batcher(self):
+        """获取进程内同一模型和维度共用的查询微批处理器"""
+        with _query_batchers_lock:
+            batcher = _query_batchers.get((self.model_name, self.dimension))
+            if batcher is None:
+                batcher = _query_batchers[(self.model_name, self.dimension)] = QueryBatcher(
+                    self.embed_text, self.batch_size, self.query_batch_wait, self.max_concurrency)
+            return batcher
+
+    def embed_query(self, text):
+        """
+        生成单条查询文本的向量
+
+        启用查询微批处理时，与同时到达的其他查询合并为一次接口调用。
+
+        Args:
+            text (str): 查询文本
+
+        Returns:
+            List[float] or None: 查询向量，生成失败时返回None
+        """
+        if not self.query_batching:
+            embeddings = self.embed_text([text])
+            return embeddings[0] if embeddings else None
+        try:
+            return self._get_query_batcher().submit(text).result(timeout=self.query_timeout)
+        except FutureTimeoutError:
+            logger.error(f"等待查询向量超时（{self.query_timeout} 秒）")
+            return None
+
+    def embed_text(self, texts, progress_callback=None):
         """
         生成文本的向量表示
         
         将一个或多个文本转换为其在高维空间中的向量表示，
         这些向量捕获了文本的语义信息，为后续的相似度搜索提供基础。
+        启用嵌入缓存时先查找缓存，只有未命中的文本才调用嵌入接口。
+        未命中的文本按接口的批大小拆分，以不超过 max_concurrency 的并发数调用接口，
+        结果按输入顺序返回。
         
         Args:
             texts (str or List[str]): 单个文本或文本列表
+            progress_callback (callable, optional): 进度回调，参数为 (已完成文本数, 需要调用接口的文本总数)
             
         Returns:
             List[List[float]] or None: 嵌入向量列表，每个向量是一个浮点数列表；
@@ -63,27 +275,107 @@ class TextEmbedder:
                 logger.warning(f"文本长度超过 2048，截断: {text[:50]}...")
                 texts[i] = text[:2048]
 
-        try:
-            # 调用DashScope文本嵌入API
-            response = dashscope.TextEmbedding.call(
-                model=self.model_name,  # text-embedding-v3
-                input=texts
-            )
-            
-            # 处理API返回结果
-            if response.status_code == HTTPStatus.OK:
-                # 提取嵌入向量
-                embeddings = [item['embedding'] for item in response.output['embeddings']]
-                logger.info(f"生成 {len(embeddings)} 个向量")
-                return embeddings
-            else:
-                # API调用成功但返回错误
-                logger.error(f"嵌入模型调用失败: {response.message}")
+        if self.cache is None:
+            return self._embed_batches(texts, None, progress_callback)
+
+        # 缓存键包含模型名称和请求的维度，更换模型或维度后不会命中旧向量
+        keys = [make_cache_key(self.model_name, self.dimension, text) for text in texts]
+        embeddings = self.cache.get_many(keys)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            generated = self._embed_batches([texts[i] for i in missing], [keys[i] for i in missing],
+                                            progress_callback)
+            if generated is None:
                 return None
-        except Exception as e:
-            # API调用异常
-            logger.error(f"嵌入模型调用异常: {e}")
+            for i, embedding in zip(missing, generated):
+                embeddings[i] = embedding
+        if len(missing) < len(texts):
+            logger.info(f"嵌入缓存命中 {len(texts) - len(missing)} 个，调用接口生成 {len(missing)} 个")
+        return [embedding if isinstance(embedding, list) else embedding.tolist() for embedding in embeddings]
+
+    def _embed_batches(self, texts, keys=None, progress_callback=None):
+        """
+        按批大小拆分文本并发调用嵌入接口
+
+        每个批次成功后立即写入缓存，部分批次失败时已成功的结果在下次构建时可以直接复用。
+
+        Args:
+            texts (List[str]): 需要调用接口的文本
+            keys (List[bytes], optional): 与texts对应的缓存键，为None时不写入缓存
+            progress_callback (callable, optional): 进度回调
+
+        Returns:
+            List[List[float]] or None: 与texts顺序一致的向量，任一批次最终失败时返回None
+        """
+        batch_size = max(1, self.batch_size)
+        batches = [range(start, min(start + batch_size, len(texts))) for start in range(0, len(texts), batch_size)]
+        results = [None] * len(texts)
+        progress_lock = threading.Lock()
+        progress = {"done": 0, "logged": 0}
+
+        def run(batch):
+            embeddings = self._call_with_retry([texts[i] for i in batch])
+            if embeddings is None:
+                return False
+            if keys is not None and self.cache is not None:
+                self.cache.put_many([keys[i] for i in batch], embeddings)
+            for i, embedding in zip(batch, embeddings):
+                results[i] = embedding
+            with progress_lock:
+                progress["done"] += len(batch)
+                done = progress["done"]
+                # 多批次时大约每完成10%记录一次进度
+                if len(batches) > 1 and (done - progress["logged"] >= len(texts) / 10 or done == len(texts)):
+                    progress["logged"] = done
+                    logger.info(f"嵌入进度 {done}/{len(texts)}")
+                if progress_callback:
+                    progress_callback(done, len(texts))
+            return True
+
+        if len(batches) <= 1:
+            succeeded = [run(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                succeeded = list(pool.map(run, batches))
+        if not all(succeeded):
+            logger.error(f"{succeeded.count(False)}/{len(batches)} 个批次嵌入失败")
             return None
+        return results
+
+    def _call_with_retry(self, texts):
+        """
+        调用嵌入接口，限流或服务端错误时按指数退避重试
+
+        Args:
+            texts (List[str]): 一个批次的文本
+
+        Returns:
+            List[List[float]] or None: 嵌入向量列表，重试后仍失败时返回None
+        """
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            embeddings, retryable = self._call_api(texts)
+            if embeddings is not None:
+                return embeddings
+            if not retryable or attempt == self.max_retries:
+                return None
+            # 加入随机抖动，避免并发的批次同时重试
+            delay = self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.0)
+            logger.warning(f"嵌入接口调用失败，{delay:.1f} 秒后重试（第 {attempt + 1}/{self.max_retries} 次）")
+            time.sleep(delay)
+        return None
+
+    def _call_api(self, texts):
+        """
+        调用嵌入后端生成一个批次的向量
+
+        Args:
+            texts (List[str]): 已截断的文本列表
+
+        Returns:
+            Tuple[List[List[float]] or None, bool]: 嵌入向量列表（调用失败时为None）以及失败是否可以重试
+        """
+        return self.backend.embed(texts)
 
 
 # 模块测试代码
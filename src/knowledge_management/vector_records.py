@@ -0,0 +1,177 @@
+"""
+知识库向量记录库
+
+按原始文本文件保存嵌入接口返回的原始float32向量，作为知识库向量的记录来源。
+FAISS索引中的向量可能经过量化（fp16 / sq8 / pq）而无法还原，记录库保存未经编码的向量，
+完整重建、更换索引类型或向量编码、按文件子集创建索引时直接由记录库组装向量，不再调用嵌入接口。
+主要功能：
+1. 每个原始文本文件一个记录文件，以文件内容哈希和事件文本摘要校验，文件内容或解析结果变化后记录自动失效
+2. 按嵌入模型和向量维度分目录保存，更换模型或维度时互不影响
+3. 记录文件先写入临时文件再替换，不使用pickle
+
+文件格式（<索引目录>/records/<嵌入模型>_<向量维度>/<文件名SHA1前16位>.npz）：
+- vectors: (n, d) float32 向量矩阵，行顺序与文件中的事件顺序一致
+- meta:    UTF-8 JSON，包含 filename、sha1（文本文件内容哈希）、texts_sha1（事件文本摘要）
+"""
+
+import os
+import re
+import json
+import hashlib
+import tempfile
+import numpy as np
+from loguru import logger
+from src.config import config
+
+RECORDS_DIR = "records"
+
+DEFAULT_RECORD_SETTINGS = {
+    "enabled": True,
+}
+
+
+def make_texts_digest(texts):
+    """
+    计算事件文本摘要
+
+    Args:
+        texts (Iterable[str]): 按顺序排列的事件文本
+
+    Returns:
+        str: SHA1十六进制摘要
+    """
+    digest = hashlib.sha1()
+    for text in texts:
+        encoded = text.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "little"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def get_record_name(filename):
+    """获取原始文本文件对应的记录文件名，文件名的哈希避免了中文和特殊字符"""
+    return hashlib.sha1(filename.encode("utf-8")).hexdigest()[:16] + ".npz"
+
+
+class VectorRecordStore:
+    """
+    向量记录库类
+
+    记录以原始文本文件名为键，读取时校验文本文件内容哈希和事件文本摘要，
+    任何一项不一致都视为没有记录，由调用方重新嵌入后写入新记录。
+    """
+
+    def __init__(self, vectors_dir, model_name, dimension=None):
+        """
+        初始化向量记录库
+
+        Args:
+            vectors_dir (str): 知识库的索引目录
+            model_name (str): 嵌入模型名称
+            dimension (int, optional): 请求的向量维度，未指定时使用模型默认维度
+        """
+        self.model_name = model_name
+        self.dimension = dimension
+        space = re.sub(r"[^\w.-]", "_", f"{model_name}_{dimension or 'default'}")
+        self.directory = os.path.join(vectors_dir, RECORDS_DIR, space)
+
+    def _get_path(self, filename):
+        """获取原始文本文件对应的记录文件路径"""
+        return os.path.join(self.directory, get_record_name(filename))
+
+    def get(self, filename, sha1, texts):
+        """
+        读取原始文本文件的向量
+
+        Args:
+            filename (str): 原始文本文件名
+            sha1 (str): 文本文件内容哈希
+            texts (List[str]): 文件中按顺序排列的事件文本
+
+        Returns:
+            np.ndarray or None: 形状为 (n, d) 的float32向量矩阵，没有有效记录时返回None
+        """
+        path = self._get_path(filename)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+                vectors = data["vectors"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"无法读取向量记录 {path}: {str(e)}")
+            return None
+        if (meta.get("filename") != filename or meta.get("sha1") != sha1 or len(vectors) != len(texts)
+                or meta.get("texts_sha1") != make_texts_digest(texts)):
+            return None
+        if vectors.dtype != np.float32 or vectors.ndim != 2 or (self.dimension and vectors.shape[1] != self.dimension):
+            logger.warning(f"向量记录 {path} 格式错误")
+            return None
+        return vectors
+
+    def put(self, filename, sha1, texts, vectors):
+        """
+        写入原始文本文件的向量
+
+        Args:
+            filename (str): 原始文本文件名
+            sha1 (str): 文本文件内容哈希
+            texts (List[str]): 文件中按顺序排列的事件文本
+            vectors (np.ndarray): 与事件文本一一对应的向量矩阵
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        meta = {"filename": filename, "sha1": sha1, "texts_sha1": make_texts_digest(texts)}
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, vectors=np.ascontiguousarray(vectors, dtype=np.float32),
+                         meta=np.frombuffer(json.dumps(meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8))
+            os.replace(temp_path, self._get_path(filename))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+def remove_vector_records(vectors_dir, filenames):
+    """
+    删除原始文本文件在全部嵌入模型和维度下的向量记录
+
+    Args:
+        vectors_dir (str): 知识库的索引目录
+        filenames (Iterable[str]): 原始文本文件名
+
+    Returns:
+        int: 删除的记录数量
+    """
+    records_dir = os.path.join(vectors_dir, RECORDS_DIR)
+    spaces = os.listdir(records_dir) if os.path.isdir(records_dir) else []
+    count = 0
+    for filename in filenames:
+        name = get_record_name(filename)
+        for space in spaces:
+            path = os.path.join(records_dir, space, name)
+            if os.path.exists(path):
+                os.remove(path)
+                count += 1
+    return count
+
+
+def get_vector_records(vectors_dir, model_name, dimension=None):
+    """
+    获取知识库的向量记录库
+
+    配置项 vector_store.vector_records 控制是否启用。
+
+    Args:
+        vectors_dir (str): 知识库的索引目录
+        model_name (str): 嵌入模型名称
+        dimension (int, optional): 请求的向量维度
+
+    Returns:
+        VectorRecordStore or None: 记录库实例，未启用时返回None
+    """
+    settings = {**DEFAULT_RECORD_SETTINGS, **(config.get("vector_store", {}).get("vector_records") or {})}
+    if not settings["enabled"]:
+        return None
+    return VectorRecordStore(vectors_dir, model_name, dimension)
@@ -5,24 +5,564 @@
 主要功能：
 1. 文本数据的加载和解析
 2. 向量索引的构建和管理 
-3. 混合搜索策略（向量相似度 + 关键词匹配）
+3. 混合搜索策略（向量检索 + BM25全文检索，倒数排名融合）
+4. 按原始文本文件增量更新索引（只解析、嵌入新增或修改的文件）
+5. 索引完整写入暂存目录后以版本目录原子发布，并发读取方不会加载到写了一半的索引
+6. 流水线构建索引：文件解析、分批嵌入和索引插入并发执行，向量内存占用由批大小决定
 """
 
 import sys
 import os
+import json
 import faiss
 import numpy as np
 from loguru import logger
 from src.config import config
 from src.knowledge_management.text_embedder import TextEmbedder
-import jieba
+from src.knowledge_management.lexical_index import STOPWORDS, TermMatrix, BM25Index, TokenizerPool, tokenize
+from src.knowledge_management.event_columns import write_event_columns, read_event_columns, rows_from_pickle
+from src.knowledge_management.raw_text_parser import EVENT_CATEGORIES, iter_text_files, load_text_files, make_event_text
+from src.knowledge_management.vector_records import get_vector_records, remove_vector_records
+from src.knowledge_management.index_factory import (IndexBuilder, build_faiss_index, detect_index_type, detect_quantization,
+                                                    get_index_settings, make_search_params, read_faiss_index,
+                                                    remove_vectors, supports_ids, supports_remove, unwrap_index)
+import re
+import glob
+import contextlib
+import itertools
+import queue
+import threading
+import shutil
+import tempfile
 from typing import List, Dict, Any
 from collections import Counter
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl，只保证进程内的线程安全
+    fcntl = None
 
 # 配置日志记录
 logger.add("logs/rag_process.log", rotation="1 MB", format="{time} {level} {message}")
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
+# 流水线构建索引的默认设置：每批事件数量和阶段之间的队列长度（批次数）
+DEFAULT_PIPELINE_SETTINGS = {
+    "batch_size": 512,
+    "queue_size": 2,
+}
+
+# 流水线阶段结束标记
+PIPELINE_END = object()
+
+# 事件类别编码，用于紧凑的事件行号 -> (类别, 类别内位置) 查找表
+CATEGORY_CODES = {category: code for code, category in enumerate(EVENT_CATEGORIES)}
+
+# 常用嵌入模型的默认向量维度
+# 没有索引信息可用时优先查表，只有未知模型才需要调用嵌入接口探测维度
+KNOWN_EMBEDDING_DIMENSIONS = {
+    "text-embedding-v1": 1536,
+    "text-embedding-v2": 1536,
+    "text-embedding-v3": 1024,
+}
+
+# 活跃索引指针文件名，保存在索引目录下
+ACTIVE_INDEX_POINTER = "active_index.json"
+
+# 索引目录下的子目录：保存时先完整写入暂存目录，再整体重命名为发布版本目录
+INDEX_STAGING_DIR = "staging"
+INDEX_BUILDS_DIR = "builds"
+
+# 索引目录锁文件名：发布版本、删除索引和切换活跃索引指针时持有，保证位置文件和指针的读-改-写不被并发进程打断
+INDEX_LOCK_FILE = "index.lock"
+
+# 进程内的索引目录锁，没有fcntl时只保证进程内的线程安全
+_index_dir_lock = threading.RLock()
+
+# 倒数排名融合（RRF）的平滑常数，取值越大，排名靠后的结果与靠前结果的得分差距越小
+RRF_K = 60
+
+
+def get_vectors_dir(db_name):
+    """
+    获取指定数据库的索引目录
+
+    Args:
+        db_name (str): 数据库名称或知识库ID
+
+    Returns:
+        str: 知识库为 data/knowledge_bases/<kb_id>/vectors，旧版数据库为 <vector_store.path>/<db_name>
+    """
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    # 根据数据库名称确定存储路径
+    if db_name.startswith("kb_"):
+        # 知识库索引存储在知识库目录下
+        target_dir = os.path.join(project_root, "data", "knowledge_bases", db_name, "vectors")
+    else:
+        # 兼容旧代码的存储路径
+        target_dir = os.path.join(project_root, config['vector_store']['path'], db_name)
+
+    # 确保目录存在
+    os.makedirs(target_dir, exist_ok=True)
+    return target_dir
+
+
+def get_default_index_id(db_name):
+    """
+    获取数据库默认索引的ID
+
+    默认索引由知识库的全部原始文本构建，构建和增量更新都写入该索引。
+
+    Args:
+        db_name (str): 数据库名称或知识库ID
+
+    Returns:
+        str: 默认索引ID（vector_index_<db_name>）
+    """
+    return f"vector_index_{db_name}"
+
+
+def get_active_pointer_path(db_name):
+    """
+    获取活跃索引指针文件路径
+
+    Args:
+        db_name (str): 数据库名称或知识库ID
+
+    Returns:
+        str: 索引目录下的 active_index.json 文件路径
+    """
+    return os.path.join(get_vectors_dir(db_name), ACTIVE_INDEX_POINTER)
+
+
+@contextlib.contextmanager
+def index_dir_lock(db_name):
+    """
+    持有数据库索引目录的锁
+
+    进程内线程锁，支持时同时持有跨进程的文件锁。不可嵌套获取同一数据库的锁。
+
+    Args:
+        db_name (str): 数据库名称或知识库ID
+    """
+    with _index_dir_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(get_vectors_dir(db_name), INDEX_LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def get_active_index_id(db_name):
+    """
+    读取当前活跃索引的ID
+
+    活跃索引指针记录搜索、聊天和报告生成默认使用的索引。没有指针文件时（旧版数据）
+    默认索引存在即为活跃索引。
+
+    Args:
+        db_name (str): 数据库名称或知识库ID
+
+    Returns:
+        str or None: 活跃索引ID，没有活跃索引（未构建或已禁用）时返回None
+    """
+    pointer_path = get_active_pointer_path(db_name)
+    try:
+        with open(pointer_path, 'r', encoding='utf-8') as f:
+            pointer = json.load(f)
+        if isinstance(pointer, dict):
+            return pointer.get("index_id")
+        logger.warning(f"活跃索引指针 {pointer_path} 格式错误")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"无法读取活跃索引指针 {pointer_path}: {str(e)}")
+
+    default_id = get_default_index_id(db_name)
+    return default_id if os.path.exists(get_index_path(db_name, default_id)) else None
+
+
+def write_json_atomic(path, data):
+    """
+    原子地写入JSON文件
+
+    先写入同目录下的唯一临时文件再替换，读取方只会看到替换前或替换后的完整内容，
+    并发写入也不会互相覆盖临时文件。
+
+    Args:
+        path (str): 文件路径
+        data: 可JSON序列化的数据
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def set_active_index(db_name, index_id):
+    """
+    更新活跃索引指针
+
+    指针原子替换，激活索引不需要复制或替换任何索引文件。
+
+    Args:
+        db_name (str): 数据库名称或知识库ID
+        index_id (str or None): 要激活的索引ID，为None时禁用活跃索引
+    """
+    with index_dir_lock(db_name):
+        write_json_atomic(get_active_pointer_path(db_name),
+                          {"index_id": index_id, "activated_at": datetime.now().isoformat()})
+    logger.info(f"数据库 {db_name} 的活跃索引已切换为: {index_id}")
+
+
+def get_location_path(db_name, index_id):
+    """
+    获取索引位置文件路径
+
+    以版本目录发布的索引由位置文件记录当前版本和上一版本的索引文件路径（相对索引目录）。
+
+    Args:
+        db_name (str): 数据库名称或知识库ID
+        index_id (str): 索引ID
+
+    Returns:
+        str: 索引目录下的 <index_id>_location.json 文件路径
+    """
+    return os.path.join(get_vectors_dir(db_name), f"{index_id}_location.json")
+
+
+def read_index_location(db_name, index_id):
+    """
+    读取索引位置
+
+    Args:
+        db_name (str): 数据库名称或知识库ID
+        index_id (str): 索引ID
+
+    Returns:
+        dict or None: 位置信息（path、previous），索引未以版本目录发布时返回None
+    """
+    location_path = get_location_path(db_name, index_id)
+    try:
+        with open(location_path, 'r', encoding='utf-8') as f:
+            location = json.load(f)
+        if isinstance(location, dict) and location.get("path"):
+            return location
+        logger.warning(f"索引位置文件 {location_path} 格式错误")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"无法读取索引位置文件 {location_path}: {str(e)}")
+    return None
+
+
+def get_index_path(db_name, index_id=None):
+    """
+    获取指定数据库的索引文件路径
+
+    根据数据库名称和系统配置确定索引文件的存储位置，
+    不需要实例化VectorStore即可使用（例如向量存储注册表判断索引是否变化）
+
+    Args:
+        db_name (str): 数据库名称或知识库ID
+        index_id (str, optional): 索引ID，默认为活跃索引，没有活跃索引时为默认索引
+
+    Returns:
+        str: 索引文件的完整路径
+    """
+    index_id = index_id or get_active_index_id(db_name) or get_default_index_id(db_name)
+    vectors_dir = get_vectors_dir(db_name)
+    location = read_index_location(db_name, index_id)
+    if location:
+        return os.path.join(vectors_dir, location["path"])
+    return os.path.join(vectors_dir, f"{index_id}.faiss")
+
+
+def list_index_paths(db_name):
+    """
+    列出数据库的全部索引
+
+    Args:
+        db_name (str): 数据库名称或知识库ID
+
+    Returns:
+        Dict[str, str]: 索引ID -> 当前索引文件路径
+    """
+    vectors_dir = get_vectors_dir(db_name)
+    index_ids = {os.path.basename(path)[:-len(".faiss")] for path in glob.glob(os.path.join(vectors_dir, "*.faiss"))}
+    index_ids.update(os.path.basename(path)[:-len("_location.json")]
+                     for path in glob.glob(os.path.join(vectors_dir, "*_location.json")))
+    paths = {index_id: get_index_path(db_name, index_id) for index_id in sorted(index_ids)}
+    return {index_id: path for index_id, path in paths.items() if os.path.exists(path)}
+
+
+def _remove_index_version(vectors_dir, relative_path):
+    """删除一个索引版本：版本目录整体删除，索引目录下的旧版文件逐个删除，返回删除的文件数"""
+    index_path = os.path.join(vectors_dir, relative_path)
+    version_dir = os.path.dirname(index_path)
+    if os.path.abspath(version_dir) != os.path.abspath(vectors_dir):
+        count = len(os.listdir(version_dir)) if os.path.isdir(version_dir) else 0
+        shutil.rmtree(version_dir, ignore_errors=True)
+        return count
+    count = 0
+    for path in get_index_files(index_path):
+        if os.path.exists(path):
+            os.remove(path)
+            count += 1
+    return count
+
+
+def _list_index_versions(vectors_dir, index_id):
+    """列出版本目录中属于索引的全部版本，返回相对索引目录的索引文件路径"""
+    builds_dir = os.path.join(vectors_dir, INDEX_BUILDS_DIR)
+    if not os.path.isdir(builds_dir):
+        return []
+    pattern = re.compile(re.escape(index_id) + r"_\d{20}")
+    return [os.path.join(INDEX_BUILDS_DIR, name, f"{index_id}.faiss")
+            for name in sorted(os.listdir(builds_dir)) if pattern.fullmatch(name)]
+
+
+def delete_index_files(db_name, index_id):
+    """
+    删除索引的全部文件，包括已发布的各个版本和位置文件
+
+    Args:
+        db_name (str): 数据库名称或知识库ID
+        index_id (str): 索引ID
+
+    Returns:
+        int: 删除的文件数量
+    """
+    vectors_dir = get_vectors_dir(db_name)
+    with index_dir_lock(db_name):
+        location = read_index_location(db_name, index_id)
+        versions = [f"{index_id}.faiss"] + _list_index_versions(vectors_dir, index_id)
+        if location:
+            versions += [location["path"], location.get("previous")]
+        count = sum(_remove_index_version(vectors_dir, version) for version in dict.fromkeys(versions) if version)
+        if location:
+            os.remove(get_location_path(db_name, index_id))
+            count += 1
+    return count
+
+
+def publish_index_version(db_name, index_id, staging_dir):
+    """
+    将暂存目录中完整写好的索引发布为新版本
+
+    暂存目录整体重命名为版本目录后原子替换位置文件，读取方只会加载到完整的旧版本或新版本，
+    不会读到新旧混合的索引文件和元数据。上一版本保留给正在加载它的读取方，更早的版本被删除。
+    发布过程持有索引目录锁，并按版本目录的实际内容清理旧版本，并发发布的进程不会遗留无人引用的版本目录。
+
+    Args:
+        db_name (str): 数据库名称或知识库ID
+        index_id (str): 索引ID
+        staging_dir (str): 暂存目录，其中的文件以 <index_id>.faiss 及其附属文件命名
+
+    Returns:
+        str: 发布后的索引文件路径
+    """
+    vectors_dir = get_vectors_dir(db_name)
+    builds_dir = os.path.join(vectors_dir, INDEX_BUILDS_DIR)
+    os.makedirs(builds_dir, exist_ok=True)
+    with index_dir_lock(db_name):
+        version = f"{index_id}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+        os.replace(staging_dir, os.path.join(builds_dir, version))
+
+        current_path = os.path.relpath(get_index_path(db_name, index_id), vectors_dir)
+        new_path = os.path.join(INDEX_BUILDS_DIR, version, f"{index_id}.faiss")
+        has_current = os.path.exists(os.path.join(vectors_dir, current_path))
+        write_json_atomic(get_location_path(db_name, index_id), {
+            "path": new_path,
+            "previous": current_path if has_current else None,
+            "published_at": datetime.now().isoformat(),
+        })
+
+        # 删除当前版本和上一版本之外的全部版本（包括索引目录下的旧版文件）
+        for stale in [f"{index_id}.faiss"] + _list_index_versions(vectors_dir, index_id):
+            if stale not in (current_path, new_path):
+                try:
+                    _remove_index_version(vectors_dir, stale)
+                except OSError as e:
+                    logger.warning(f"删除索引 {index_id} 的旧版本失败: {str(e)}")
+    return os.path.join(vectors_dir, new_path)
+
+
+# 与FAISS索引文件同名的附属文件后缀：列式元数据、旧版pickle元数据、预分词词频矩阵、BM25倒排索引、
+# 索引信息、原始文本清单
+INDEX_SIDECAR_SUFFIXES = ["_meta.bin", "_metadata.pkl", "_terms.bin", "_bm25.bin", "_info.json", "_manifest.json"]
+
+
+def get_index_files(index_path):
+    """
+    获取索引文件及其全部附属文件的路径
+
+    Args:
+        index_path (str): FAISS索引文件路径
+
+    Returns:
+        List[str]: 索引文件路径和各附属文件路径（不检查是否存在）
+    """
+    base_path = index_path[:-len(".faiss")]
+    return [index_path] + [base_path + suffix for suffix in INDEX_SIDECAR_SUFFIXES]
+
+
+def get_metadata_path(index_path):
+    """
+    获取列式元数据文件路径
+
+    Args:
+        index_path (str): FAISS索引文件路径
+
+    Returns:
+        str: 与索引文件同名的 _meta.bin 文件路径
+    """
+    return index_path.replace(".faiss", "_meta.bin")
+
+
+def get_legacy_metadata_path(index_path):
+    """
+    获取旧版pickle元数据文件路径
+
+    Args:
+        index_path (str): FAISS索引文件路径
+
+    Returns:
+        str: 与索引文件同名的 _metadata.pkl 文件路径
+    """
+    return index_path.replace(".faiss", "_metadata.pkl")
+
+
+def find_metadata_path(index_path):
+    """
+    查找索引的元数据文件，优先使用列式元数据
+
+    Args:
+        index_path (str): FAISS索引文件路径
+
+    Returns:
+        str or None: 存在的元数据文件路径，都不存在时返回None
+    """
+    for path in (get_metadata_path(index_path), get_legacy_metadata_path(index_path)):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def get_terms_path(index_path):
+    """
+    获取预分词词频矩阵文件路径
+
+    Args:
+        index_path (str): FAISS索引文件路径
+
+    Returns:
+        str: 与索引文件同名的 _terms.bin 文件路径
+    """
+    return index_path.replace(".faiss", "_terms.bin")
+
+
+def get_bm25_path(index_path):
+    """
+    获取BM25倒排索引文件路径
+
+    Args:
+        index_path (str): FAISS索引文件路径
+
+    Returns:
+        str: 与索引文件同名的 _bm25.bin 文件路径
+    """
+    return index_path.replace(".faiss", "_bm25.bin")
+
+
+def get_info_path(index_path):
+    """
+    获取索引信息文件路径
+
+    Args:
+        index_path (str): FAISS索引文件路径
+
+    Returns:
+        str: 与索引文件同名的 _info.json 文件路径
+    """
+    return index_path.replace(".faiss", "_info.json")
+
+
+def read_index_info(index_path):
+    """
+    读取索引信息文件
+
+    索引信息文件记录索引名称、描述、向量维度和嵌入模型等信息，
+    读取失败时返回空字典，不影响索引本身的加载。
+
+    Args:
+        index_path (str): FAISS索引文件路径
+
+    Returns:
+        dict: 索引信息
+    """
+    info_path = get_info_path(index_path)
+    if not os.path.exists(info_path):
+        return {}
+    try:
+        with open(info_path, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        return info if isinstance(info, dict) else {}
+    except Exception as e:
+        logger.warning(f"无法读取索引信息文件 {info_path}: {str(e)}")
+        return {}
+
+
+def get_manifest_path(index_path):
+    """
+    获取原始文本清单文件路径
+
+    清单记录构建索引时每个原始文本文件的内容哈希、大小、修改时间和对应的向量ID区间，
+    增量更新时据此判断哪些文件需要重新解析和嵌入。
+
+    Args:
+        index_path (str): FAISS索引文件路径
+
+    Returns:
+        str: 与索引文件同名的 _manifest.json 文件路径
+    """
+    return index_path.replace(".faiss", "_manifest.json")
+
+
+def read_manifest(index_path):
+    """
+    读取原始文本清单
+
+    Args:
+        index_path (str): FAISS索引文件路径
+
+    Returns:
+        dict or None: 清单内容（files、next_id），文件不存在或无法读取时返回None
+    """
+    manifest_path = get_manifest_path(index_path)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict) and isinstance(manifest.get("files"), dict):
+            return manifest
+        logger.warning(f"原始文本清单 {manifest_path} 格式错误")
+    except Exception as e:
+        logger.warning(f"无法读取原始文本清单 {manifest_path}: {str(e)}")
+    return None
+
 
 class VectorStore:
     """
@@ -36,33 +576,58 @@ class VectorStore:
     1. 从文本文件加载事件数据
     2. 将文本转换为向量并构建索引
     3. 保存和加载向量索引
-    4. 提供混合搜索功能（向量相似度+关键词匹配）
+    4. 提供混合搜索功能（向量检索+BM25全文检索）
     """
     
-    def __init__(self, db_name="default"):
+    def __init__(self, db_name="default", embedder=None, dimension=None, index_id=None):
         """
         初始化向量存储实例
         
         Args:
             db_name (str): 数据库名称，可以是默认名称或知识库ID（格式：kb_YYYYMMDDHHMMSS）
+            embedder (TextEmbedder, optional): 文本嵌入器，默认根据配置创建TextEmbedder
+            dimension (int, optional): 向量维度，默认沿用已有索引的维度，没有索引时使用配置文件
+                model.embedding.dimension；创建不同维度的新索引时指定
+            index_id (str, optional): 索引ID，指定时加载和保存都固定使用该索引；
+                默认使用活跃索引，保存时写入默认索引，不修改被激活的其他索引。
+                增量更新和删除文件内容等写操作应指定默认索引ID，确保加载和修改的都是默认索引
         """
         self.db_name = db_name
+
+        # 设置索引文件路径
+        self.pinned = index_id is not None
+        self.index_id = index_id or get_active_index_id(db_name) or get_default_index_id(db_name)
+        self.index_path = self._get_exact_index_path()
+
+        # 向量维度是索引的属性：已有索引按构建时的维度生成查询向量和新增向量，
+        # 配置文件中的维度只作用于新建的索引
+        index_info = read_index_info(self.index_path)
+        dimension = dimension or index_info.get("dimension")
         # 初始化文本嵌入器，用于将文本转换为向量
-        self.embedder = TextEmbedder()
+        self.embedder = embedder or TextEmbedder(dimension=dimension)
 
-        # 动态获取向量维度（默认1024维）
-        test_embedding = self.embedder.embed_text("测试文本")
-        self.dimension = len(test_embedding[0]) if test_embedding else 1024
-        logger.info(f"向量维度: {self.dimension}")
+        # 确定向量维度：优先使用指定或索引信息文件中记录的维度，其次使用嵌入器的输出维度或已知模型的维度，
+        # 都不可用时推迟到构建索引时由嵌入结果确定，构造实例时不再调用嵌入接口
+        self.embedding_model = index_info.get("embedding_model") or self.embedder.model_name
+        self.dimension = (dimension or getattr(self.embedder, "dimension", None)
+                          or KNOWN_EMBEDDING_DIMENSIONS.get(self.embedding_model))
+        logger.info(f"向量维度: {self.dimension or '待定'}")
 
         # 初始化FAISS索引，使用L2距离度量
         # L2距离适合计算欧氏距离，适用于文本嵌入向量的相似度计算
-        self.index = faiss.IndexFlatL2(self.dimension)
+        # 构建索引时按配置选择索引类型（flat / ivf_flat / ivf_pq / hnsw）
+        self.index = faiss.IndexFlatL2(self.dimension) if self.dimension else None
+        self.index_type = index_info.get("index_type", "flat")
+        # 向量存储编码：none / fp16 / sq8（ivf_pq索引为pq）
+        self.quantization = index_info.get("quantization", "none")
+        # 索引是否以只读内存映射方式加载，映射的索引不能添加或删除向量
+        self.index_mmapped = False
 
         # 初始化事件数据存储结构
         # events: 按类别存储事件数据
         # event_texts: 存储用于生成向量的文本
         # event_metadata: 存储文本与类别的对应关系
+        # 从列式元数据加载时三者都是只读的惰性序列，访问时才解码，修改前会转换为列表
         self.events = {
             "rainfall": [],        # 降雨相关事件
             "water_condition": [], # 水情相关事件
@@ -70,17 +635,35 @@ class VectorStore:
             "measures": []         # 应对措施事件
         }
         self.event_texts = []      # 所有事件的文本表示
-        self.event_metadata = []   # 事件元数据，包括类别和索引
+        self.event_metadata = []   # 事件元数据，包括类别、索引和类别内位置
 
-        # 设置索引文件路径
-        self.index_path = self._get_exact_index_path()
+        # 事件行号 -> (类别编码, 类别内位置) 查找表，搜索时以O(1)定位事件
+        self.event_category_codes = np.zeros(0, dtype=np.int8)
+        self.event_positions = np.zeros(0, dtype=np.int32)
+
+        # 向量ID与事件行号的映射：events/event_texts等按行号紧凑存放，FAISS中保存稳定的向量ID。
+        # 全量构建时两者相同；增量更新删除文件后行号会重新压缩，而向量ID不复用
+        self.event_ids = np.zeros(0, dtype=np.int64)    # 行号 -> 向量ID
+        self.id_to_row = np.zeros(0, dtype=np.int64)    # 向量ID -> 行号，已删除的ID为-1
+        self.next_id = 0
+
+        # 原始文本文件名 -> 内容哈希、大小、修改时间和向量ID区间，None表示没有清单（不能增量更新）
+        self.source_files = None
+
+        # 类别 -> 该类别全部向量ID（升序），用于按类别过滤的向量检索
+        self.category_ids = {category: np.zeros(0, dtype=np.int64) for category in EVENT_CATEGORIES}
+        # 类别 -> FAISS ID选择器缓存，选择器会复制ID集合，每个类别只需创建一次
+        self._category_selectors = {}
+
+        # 预分词的文档词频矩阵，构建索引时生成，查询时只需对查询文本分词
+        self.term_matrix = TermMatrix()
+
+        # 基于词频矩阵构建的BM25倒排索引，用于在全部语料上进行词法检索
+        self.bm25_index = BM25Index()
 
-        # 初始化jieba分词的停用词列表
+        # jieba分词的停用词列表
         # 停用词是在搜索中不具有区分性的常用词
-        self.stopwords = set(['的', '了', '在', '是', '我', '有', '和', '就',
-                            '不', '人', '都', '一', '一个', '上', '也', '很',
-                            '到', '说', '要', '去', '你', '会', '着', '没有',
-                            '看', '好', '自己', '这'])
+        self.stopwords = STOPWORDS
 
     def _get_exact_index_path(self):
         """
@@ -91,227 +674,652 @@ class VectorStore:
         Returns:
             str: 索引文件的完整路径
         """
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        
-        # 根据数据库名称确定存储路径
+        return get_index_path(self.db_name, self.index_id)
+
+    def _get_text_directory(self):
+        """
+        获取原始文本数据的默认目录
+
+        Returns:
+            str: 知识库为 data/knowledge_bases/<kb_id>/raw_texts，旧版数据库为 data/raw/link_texts/<db_name>
+        """
+        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
         if self.db_name.startswith("kb_"):
-            # 知识库索引存储在知识库目录下
-            target_dir = os.path.join(project_root, "data", "knowledge_bases", self.db_name, "vectors")
-        else:
-            # 兼容旧代码的存储路径
-            target_dir = os.path.join(project_root, config['vector_store']['path'], self.db_name)
-        
-        # 确保目录存在
-        os.makedirs(target_dir, exist_ok=True)
-        return os.path.join(target_dir, f"vector_index_{self.db_name}.faiss")
+            return os.path.join(base_dir, "data", "knowledge_bases", self.db_name, "raw_texts")
+        return os.path.join(base_dir, "data", "raw", "link_texts", self.db_name)
+
+    def _reset_events(self):
+        """清空事件数据和向量ID映射"""
+        self.events = {category: [] for category in EVENT_CATEGORIES}
+        self.event_texts = []
+        self.event_metadata = []
+        self.event_ids = np.zeros(0, dtype=np.int64)
+        self.next_id = 0
+
+    def _append_event(self, category, event, event_text, source=None):
+        """
+        添加一条事件及其向量化文本
+
+        同时记录事件在所属类别列表中的位置，供搜索时直接定位事件。
+
+        Args:
+            category (str): 事件类别
+            event (dict): 事件数据
+            event_text (str): 用于生成向量的文本
+            source (str, optional): 事件所在的原始文本文件名
+        """
+        if not isinstance(self.event_texts, list):
+            self._materialize_events()
+        self.events[category].append(event)
+        self.event_texts.append(event_text)
+        metadata = {
+            "category": category,
+            "index": len(self.event_texts) - 1,
+            "position": len(self.events[category]) - 1
+        }
+        if source is not None:
+            metadata["source"] = source
+        self.event_metadata.append(metadata)
+
+    def _materialize_events(self):
+        """将从列式元数据加载的惰性序列解码为列表，以便追加事件"""
+        self.events = {category: list(events) for category, events in self.events.items()}
+        self.event_texts = list(self.event_texts)
+        self.event_metadata = list(self.event_metadata)
+
+    def _append_records(self, records, source=None):
+        """
+        追加一组事件并为其分配连续的新向量ID
+
+        Args:
+            records (List[tuple]): (类别, 事件, 向量化文本) 列表
+            source (str, optional): 事件所在的原始文本文件名
+
+        Returns:
+            List[int]: 分配的向量ID区间 [start, end)
+        """
+        start = self.next_id
+        for category, event, event_text in records:
+            self._append_event(category, event, event_text, source)
+        self.next_id = start + len(records)
+        self.event_ids = np.concatenate([self.event_ids, np.arange(start, self.next_id, dtype=np.int64)])
+        return [start, self.next_id]
+
+    def _remove_rows(self, rows):
+        """
+        删除指定行的事件，并压缩事件列表、词频矩阵和查找表
+
+        只处理内存中的事件数据，向量需要调用方从FAISS索引中删除。
+
+        Args:
+            rows (np.ndarray): 待删除事件的行号
+        """
+        keep_mask = np.ones(len(self.event_texts), dtype=bool)
+        keep_mask[np.asarray(rows, dtype=np.int64)] = False
+        keep = np.flatnonzero(keep_mask)
+        kept = [(self.event_metadata[i],
+                 self.events[self.event_metadata[i]["category"]][self.event_positions[i]],
+                 self.event_texts[i]) for i in keep]
+        event_ids, next_id = self.event_ids[keep], self.next_id
+
+        self._reset_events()
+        for metadata, event, event_text in kept:
+            self._append_event(metadata["category"], event, event_text, metadata.get("source"))
+        self.event_ids, self.next_id = event_ids, next_id
+        self.term_matrix = self.term_matrix.select_rows(keep)
+        self._build_lookup()
 
-    def load_texts(self, directory=None):
+    def _build_lookup(self):
+        """
+        根据事件元数据构建事件行号查找表
+
+        兼容没有记录类别内位置的旧版元数据：按行号顺序统计每个类别的位置。
+        """
+        count = len(self.event_metadata)
+        codes = np.zeros(count, dtype=np.int8)
+        positions = np.zeros(count, dtype=np.int32)
+        next_positions = dict.fromkeys(EVENT_CATEGORIES, 0)
+        for i, metadata in enumerate(self.event_metadata):
+            category = metadata["category"]
+            position = metadata.get("position")
+            if position is None:
+                position = next_positions[category]
+                metadata["position"] = position
+            next_positions[category] = position + 1
+            codes[i] = CATEGORY_CODES[category]
+            positions[i] = position
+        self.event_category_codes = codes
+        self.event_positions = positions
+        self._build_id_maps()
+
+    def _build_id_maps(self, category_ids=None):
+        """
+        生成向量ID与行号的双向映射和每个类别的向量ID列表，并清空选择器缓存
+
+        没有记录向量ID的旧版元数据中，向量ID等于行号。
+
+        Args:
+            category_ids (dict, optional): 元数据中保存的类别向量ID列表，提供时直接使用
+        """
+        count = len(self.event_metadata)
+        if len(self.event_ids) != count:
+            self.event_ids = np.arange(count, dtype=np.int64)
+        self.next_id = max(self.next_id, int(self.event_ids.max()) + 1 if count else 0)
+        self.id_to_row = np.full(self.next_id, -1, dtype=np.int64)
+        self.id_to_row[self.event_ids] = np.arange(count, dtype=np.int64)
+        self.category_ids = category_ids or {
+            category: self.event_ids[self.event_category_codes == code]
+            for category, code in CATEGORY_CODES.items()
+        }
+        self._category_selectors = {}
+
+    def load_texts(self, directory=None, filenames=None):
         """
         加载并解析文本数据，构建事件数据结构
         
         从指定目录读取文本文件，解析其中的结构化数据，
         并按类别组织为事件数据，为后续的向量化做准备。
+        同时记录每个文件的内容哈希和对应的向量ID区间，供之后增量更新索引。
         
         Args:
             directory (str, optional): 文本数据目录路径，如果为None则使用默认路径
+            filenames (List[str], optional): 只加载目录中的这些文本文件，默认加载全部txt文件
             
         Raises:
-            FileNotFoundError: 如果数据目录不存在
+            FileNotFoundError: 如果数据目录或指定的文本文件不存在
             
         处理流程：
         1. 确定数据目录路径
         2. 遍历目录中的所有txt文件
-        3. 解析每个文件中的结构化数据
+        3. 并行解析每个文件中的结构化数据（已缓存且未变化的文件跳过解析）
         4. 按类别存储事件信息
         5. 生成用于向量化的文本描述
         """
-        if directory is None:
-            base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-            
-            # 根据数据库名称确定数据目录
-            if self.db_name.startswith("kb_"):
-                directory = os.path.join(base_dir, "data", "knowledge_bases", self.db_name, "raw_texts")
-            else:
-                directory = os.path.join(base_dir, "data", "raw", "link_texts", self.db_name)
+        directory = directory or self._get_text_directory()
 
+        txt_files, selected = self._list_text_files(directory, filenames)
+
+        # 重置数据存储
+        self._reset_events()
+        self.source_files = {}
+
+        # 并行解析文本文件，未变化的文件直接使用解析缓存
+        parsed = load_text_files(directory, selected, all_files=txt_files)
+        for filename, (signature, records) in parsed.items():
+            signature["id_range"] = self._append_records(records, filename)
+            self.source_files[filename] = signature
+        self._build_lookup()
+        logger.info(f"加载完成，共处理 {len(self.event_texts)} 个事件")
+
+    def _list_text_files(self, directory, filenames=None):
+        """
+        列出文本目录中的txt文件
+
+        Args:
+            directory (str): 文本数据目录路径
+            filenames (List[str], optional): 只选择这些文件
+
+        Returns:
+            Tuple[List[str], List[str]]: 目录中的全部txt文件和选择的文件，均已排序
+
+        Raises:
+            FileNotFoundError: 如果数据目录或指定的文本文件不存在
+        """
         logger.info(f"加载文本目录: {directory}")
         if not os.path.exists(directory):
             logger.error(f"路径不存在: {directory}")
             raise FileNotFoundError(f"数据目录不存在: {directory}")
 
-        # 重置数据存储
-        self.events = {"rainfall": [], "water_condition": [], "disaster_impact": [], "measures": []}
-        self.event_texts = []
-        self.event_metadata = []
-
-        # 获取所有txt文件
-        txt_files = [f for f in os.listdir(directory) if f.endswith(".txt")]
+        txt_files = sorted(f for f in os.listdir(directory) if f.endswith(".txt"))
         if not txt_files:
             logger.warning(f"目录 {directory} 中没有 .txt 文件")
-            return
+        if filenames is None:
+            return txt_files, txt_files
+        missing = sorted(set(filenames) - set(txt_files))
+        if missing:
+            raise FileNotFoundError(f"文本文件不存在: {', '.join(missing)}")
+        return txt_files, sorted(set(filenames))
+
+    def build_from_texts(self, directory=None, filenames=None, index_type=None, quantization=None):
+        """
+        以流水线方式加载文本并构建向量索引
+
+        文件解析、分批嵌入和向量插入作为并发阶段运行：解析线程按文件顺序读取和解析原始文本文件并凑成批次，
+        嵌入线程为每批事件生成向量（向量记录库中已有的文件直接读取记录的向量），
+        调用线程为每批事件分配向量ID后添加到FAISS索引和词频矩阵；每批事件文本在持久的分词进程池中
+        多核并行分词（见 TokenizerPool），与向量生成重叠执行。
+        阶段之间通过有界队列传递批次，总耗时接近最慢的阶段（通常是嵌入接口）而不是各阶段耗时之和。
+        事件、向量ID和词频矩阵与先调用 load_texts 再调用 build_index 相同；需要训练的索引（IVF类、sq8编码）
+        只用按ID顺序的前若干个向量训练（见 IndexBuilder），结果与一次性构建略有差异，但不受批次和线程时序影响。
+
+        内存限制：只有向量是流式处理的，同一时刻内存中只有有限几批向量
+        （IVF类和auto索引在全部文件解析完成、向量总数确定之前到达的向量需要缓冲）；
+        事件内容、向量化文本和词频矩阵仍全部保存在内存中，保存索引时需要写入元数据，
+        因此峰值内存仍随语料规模增长。
+
+        Args:
+            directory (str, optional): 文本数据目录路径，如果为None则使用默认路径
+            filenames (List[str], optional): 只加载目录中的这些文本文件，默认加载全部txt文件
+            index_type (str, optional): 索引类型（flat / ivf_flat / ivf_pq / hnsw / auto），
+                默认使用配置文件 vector_store.index_type
+            quantization (str, optional): 向量编码（none / fp16 / sq8），默认使用配置文件 vector_store.quantization
+
+        Returns:
+            int: 从向量记录库读取向量的事件数量
+
+        Raises:
+            FileNotFoundError: 如果数据目录或指定的文本文件不存在
+            RuntimeError: 如果向量生成失败
+        """
+        directory = directory or self._get_text_directory()
+        txt_files, selected = self._list_text_files(directory, filenames)
+        settings = {**DEFAULT_PIPELINE_SETTINGS, **(config.get("vector_store", {}).get("pipeline") or {})}
+        batch_size = max(1, int(settings["batch_size"]))
+        queue_size = max(1, int(settings["queue_size"]))
+
+        self._reset_events()
+        self.source_files = {}
+        self.term_matrix = TermMatrix()
+        builder = IndexBuilder(index_type, quantization=quantization)
+        parsed_queue = queue.Queue(maxsize=queue_size)
+        embedded_queue = queue.Queue(maxsize=queue_size)
+        tokenizer = TokenizerPool()
+        stop = threading.Event()
+        parsed_all = threading.Event()
+        parsed_total = []
+        errors = []
+
+        def put(q, item):
+            # 下游阶段已停止时放弃写入，避免在满队列上永久阻塞
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return None
+
+        def emit(batch):
+            # 分词提交到持久进程池，在多个核心上与嵌入接口调用重叠执行，插入阶段收集结果后追加词频
+            tokens = tokenizer.submit([event_text for _, _, records in batch for _, _, event_text in records])
+            return put(parsed_queue, (batch, tokens))
 
-        # 处理每个文本文件
-        for filename in txt_files:
-            file_path = os.path.join(directory, filename)
-            logger.debug(f"处理文件: {file_path}")
+        def parse_stage():
+            # 按文件顺序解析，凑满 batch_size 个事件后交给嵌入阶段
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if not content.strip():
-                        logger.warning(f"文件 {filename} 为空，跳过")
-                        continue
-
-                    # 解析结构化数据
-                    structured_data_str = None
-                    if "结构化数据:" in content:
-                        parts = content.split("结构化数据:")
-                        if len(parts) > 1:
-                            # 提取结构化数据部分
-                            if "原始内容摘要:" in parts[1]:
-                                structured_data_str = parts[1].split("原始内容摘要:")[0].strip()
-                            elif "原始标题:" in parts[1]:
-                                structured_data_str = parts[1].split("原始标题:")[0].strip()
-                            else:
-                                structured_data_str = parts[1].strip()
-                    
-                    if not structured_data_str:
-                        logger.warning(f"文件 {filename} 中结构化数据为空或格式异常，跳过")
-                        continue
-
-                    # 解析结构化数据为Python对象
-                    try:
-                        structured_data = eval(structured_data_str)
-                        if not isinstance(structured_data, dict):
-                            logger.error(f"文件 {filename} 的结构化数据格式错误，期望字典，得到: {type(structured_data)}")
-                            continue
-                    except Exception as parse_error:
-                        logger.error(f"无法解析文件 {filename} 中的结构化数据: {str(parse_error)}")
-                        continue
-
-                    # 处理原始文本
-                    if 'raw_text' in structured_data:
-                        raw_text = structured_data['raw_text']
-                        # 将原始文本作为灾害影响事件存储
-                        event = {
-                            'time': '未知',
-                            'location': '未知',
-                            'description': raw_text
-                        }
-                        self.events['disaster_impact'].append(event)
-                        self.event_texts.append(raw_text)
-                        self.event_metadata.append({"category": "disaster_impact", "index": len(self.event_texts) - 1})
-                        logger.debug(f"添加原始文本事件: {raw_text[:100]}...")
-
-                    # 按类别处理事件数据
-                    for category in ["rainfall", "water_condition", "disaster_impact", "measures"]:
-                        if category not in structured_data:
-                            continue
-                            
-                        events = structured_data[category]
-                        if not isinstance(events, list):
-                            logger.warning(f"文件 {filename} 中 {category} 不是列表类型，跳过")
-                            continue
-                            
-                        # 处理每个事件
-                        for event in events:
-                            if not isinstance(event, dict):
-                                logger.warning(f"文件 {filename} 中 {category} 的事件不是字典类型，跳过")
-                                continue
-                                
-                            # 存储事件数据
-                            self.events[category].append(event)
-                            # 生成用于向量化的文本描述
-                            event_text = f"{event.get('time', '未知')} {event.get('location', '未知')} {event.get('description', '')}"
-                            for key in event:
-                                if key not in ["time", "location", "description"]:
-                                    event_text += f" {key}: {event[key]}"
-                            self.event_texts.append(event_text)
-                            self.event_metadata.append({"category": category, "index": len(self.event_texts) - 1})
-                            logger.debug(f"添加事件: {event_text}")
+                batch, count, total = [], 0, 0
+                with contextlib.closing(iter_text_files(directory, selected, all_files=txt_files)) as parsed:
+                    for item in parsed:
+                        batch.append(item)
+                        count += len(item[2])
+                        total += len(item[2])
+                        if count >= batch_size:
+                            if not emit(batch):
+                                return
+                            batch, count = [], 0
+                if batch and not emit(batch):
+                    return
+                # 全部文件解析完成后向量总数已知，由插入阶段交给索引构建器确定索引类型和聚类中心数
+                parsed_total.append(total)
+                parsed_all.set()
+                put(parsed_queue, PIPELINE_END)
             except Exception as e:
-                logger.error(f"解析文件 {filename} 失败: {str(e)}", exc_info=True)
-                continue
+                errors.append(e)
+                stop.set()
+
+        def embed_stage():
+            try:
+                while True:
+                    item = get(parsed_queue)
+                    if item is None or item is PIPELINE_END:
+                        put(embedded_queue, PIPELINE_END)
+                        return
+                    batch, tokens = item
+                    embeddings, reused = self._embed_sources(
+                        [(filename, signature["sha1"], [event_text for _, _, event_text in records])
+                         for filename, signature, records in batch])
+                    if embeddings is None:
+                        raise RuntimeError("向量生成失败")
+                    if not put(embedded_queue, (batch, tokens, embeddings, reused)):
+                        return
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+
+        threads = [threading.Thread(target=parse_stage, name="index-parse", daemon=True),
+                   threading.Thread(target=embed_stage, name="index-embed", daemon=True)]
+        for thread in threads:
+            thread.start()
+        reused_total = 0
+        try:
+            while True:
+                item = get(embedded_queue)
+                if item is None or item is PIPELINE_END:
+                    break
+                batch, tokens, embeddings, reused = item
+                # 索引构建器只在调用线程中使用
+                if builder.expected_count is None and parsed_all.is_set():
+                    builder.set_expected_count(parsed_total[0])
+                first_id = self.next_id
+                for filename, signature, records in batch:
+                    signature["id_range"] = self._append_records(records, filename)
+                    self.source_files[filename] = signature
+                builder.add(embeddings, np.arange(first_id, self.next_id, dtype=np.int64))
+                self.term_matrix.append_tokens(tokenizer.gather(tokens))
+                reused_total += reused
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            tokenizer.close()
+        if errors:
+            logger.error(f"流水线构建索引失败: {str(errors[0])}")
+            raise errors[0]
+
+        self._build_lookup()
         logger.info(f"加载完成，共处理 {len(self.event_texts)} 个事件")
+        if not self.event_texts:
+            logger.error("无法构建索引：无事件数据")
+            return 0
+        self.index, self.index_type = builder.finish()
+        self.index_mmapped = False
+        self.quantization = detect_quantization(self.index)
+        self.dimension = self.index.d
+        self.embedding_model = self.embedder.model_name
+        logger.info(f"索引构建完成，类型 {self.index_type}，向量编码 {self.quantization}，包含 {self.index.ntotal} 个向量")
+        self.bm25_index = BM25Index.from_term_matrix(self.term_matrix)
+        logger.info(f"BM25倒排索引构建完成，共 {len(self.bm25_index.doc_ids)} 个倒排项")
+        return reused_total
 
-    def build_index(self):
+    def build_index(self, index_type=None, quantization=None):
         """
         构建向量索引
         
         将事件文本转换为向量，并构建FAISS索引用于高效检索。
         这是RAG系统中关键的预处理步骤，将语义信息编码到向量空间。
         
+        Args:
+            index_type (str, optional): 索引类型（flat / ivf_flat / ivf_pq / hnsw / auto），
+                默认使用配置文件 vector_store.index_type
+            quantization (str, optional): 向量编码（none / fp16 / sq8），默认使用配置文件 vector_store.quantization
+
+        Returns:
+            int: 从向量记录库读取向量的事件数量
+            
         Raises:
             Exception: 如果向量生成或索引构建失败
             
         处理流程：
         1. 检查是否有事件数据
-        2. 使用文本嵌入模型生成向量
-        3. 将向量添加到FAISS索引
+        2. 从向量记录库读取原始文本文件未变化的向量，其余事件使用文本嵌入模型生成向量
+        3. 按索引类型创建FAISS索引，需要时先训练，再添加向量
         4. 记录索引构建状态
         """
         if not self.event_texts:
             logger.error("无法构建索引：无事件数据")
-            return
+            return 0
 
         try:
-            # 生成文本向量
-            embeddings = self.embedder.embed_text(self.event_texts)
-            if not embeddings:
-                logger.error("嵌入生成失败，嵌入结果为空")
-                return
-
-            # 转换为numpy数组
-            embeddings_array = np.array(embeddings, dtype='float32')
-            if embeddings_array.shape[0] != len(self.event_texts):
-                logger.error(f"嵌入数量不匹配，期望 {len(self.event_texts)}，实际 {embeddings_array.shape[0]}")
-                return
-
-            # 重置并构建FAISS索引
-            self.index = faiss.IndexFlatL2(self.dimension)
-            self.index.add(embeddings_array)
-            logger.info(f"索引构建完成，包含 {self.index.ntotal} 个向量")
+            # 按来源文件分组生成文本向量，向量记录库中已有的文件直接使用记录的向量
+            sources = []
+            for source, rows in itertools.groupby(range(len(self.event_texts)),
+                                                  key=lambda i: self.event_metadata[i].get("source")):
+                sha1 = (self.source_files or {}).get(source, {}).get("sha1")
+                sources.append((source, sha1, [self.event_texts[i] for i in rows]))
+            embeddings_array, reused = self._embed_sources(sources)
+            if embeddings_array is None:
+                return 0
+
+            # 向量维度以实际嵌入结果为准
+            self.dimension = embeddings_array.shape[1]
+            self.embedding_model = self.embedder.model_name
+
+            # 重置并按配置的索引类型构建FAISS索引
+            self.index, self.index_type = build_faiss_index(embeddings_array, index_type, quantization=quantization,
+                                                            ids=self.event_ids)
+            self.index_mmapped = False
+            self.quantization = detect_quantization(self.index)
+            logger.info(f"索引构建完成，类型 {self.index_type}，向量编码 {self.quantization}，包含 {self.index.ntotal} 个向量")
+
+            # 一次性完成全部文档的分词，查询时不再对候选文档分词
+            self.term_matrix = TermMatrix.from_texts(self.event_texts)
+            logger.info(f"词频矩阵构建完成，词表大小 {len(self.term_matrix.vocabulary)}")
+            self.bm25_index = BM25Index.from_term_matrix(self.term_matrix)
+            logger.info(f"BM25倒排索引构建完成，共 {len(self.bm25_index.doc_ids)} 个倒排项")
+            return reused
         except Exception as e:
             logger.error(f"构建索引失败: {str(e)}", exc_info=True)
             raise
 
-    def save_index(self):
+    def _embed_texts(self, texts):
+        """
+        生成文档向量
+
+        全部文本一次交给嵌入器，由嵌入器按接口批大小拆分、并发调用并按顺序返回结果。
+
+        Args:
+            texts (List[str]): 文档文本列表
+
+        Returns:
+            np.ndarray or None: 形状为 (n, d) 的float32向量矩阵，生成失败时返回None
+        """
+        if not texts:
+            return np.zeros((0, self.dimension or 0), dtype='float32')
+        embeddings = self.embedder.embed_text(list(texts))
+        if not embeddings:
+            logger.error("嵌入生成失败，嵌入结果为空")
+            return None
+        if len(embeddings) != len(texts):
+            logger.error(f"嵌入数量不匹配，期望 {len(texts)}，实际 {len(embeddings)}")
+            return None
+        embeddings = np.array(embeddings, dtype='float32')
+        expected = getattr(self.embedder, "dimension", None)
+        if expected and embeddings.shape[1] != expected:
+            logger.error(f"嵌入维度不匹配，期望 {expected}，实际 {embeddings.shape[1]}")
+            return None
+        return embeddings
+
+    def _get_vector_records(self):
+        """获取当前嵌入模型和维度下的知识库向量记录库，未启用时返回None"""
+        return get_vector_records(get_vectors_dir(self.db_name), self.embedder.model_name,
+                                  getattr(self.embedder, "dimension", None))
+
+    def _embed_sources(self, sources):
+        """
+        按原始文本文件生成文档向量
+
+        向量记录库中文件内容和事件文本都未变化的文件直接使用记录的原始向量，
+        其余文件的事件一次交给嵌入器生成向量，并写入记录库供之后组装其他索引。
+
+        Args:
+            sources (List[tuple]): (文件名, 文件内容哈希, 事件文本列表) 列表，
+                文件名或哈希为None的事件总是重新生成向量且不写入记录库
+
+        Returns:
+            Tuple[np.ndarray or None, int]: 按事件顺序排列的向量矩阵（生成失败时为None），以及从记录库读取的事件数
+        """
+        records = self._get_vector_records()
+        vectors = [None] * len(sources)
+        if records is not None:
+            for i, (filename, sha1, texts) in enumerate(sources):
+                if filename is not None and sha1 is not None and texts:
+                    vectors[i] = records.get(filename, sha1, texts)
+        reused = sum(len(v) for v in vectors if v is not None)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if reused:
+            logger.info(f"从向量记录库读取 {reused} 个事件的向量，需要生成 {sum(len(sources[i][2]) for i in missing)} 个")
+
+        embeddings = self._embed_texts([text for i in missing for text in sources[i][2]])
+        if embeddings is None:
+            return None, reused
+        offset = 0
+        for i in missing:
+            filename, sha1, texts = sources[i]
+            vectors[i] = embeddings[offset:offset + len(texts)]
+            offset += len(texts)
+            if records is not None and filename is not None and sha1 is not None and texts:
+                try:
+                    records.put(filename, sha1, texts, vectors[i])
+                except Exception as e:
+                    logger.warning(f"写入文件 {filename} 的向量记录失败: {str(e)}")
+
+        dimensions = {v.shape[1] for v in vectors if len(v)}
+        if len(dimensions) > 1:
+            logger.error(f"向量记录与新生成向量的维度不一致: {sorted(dimensions)}")
+            return None, reused
+        if not dimensions:
+            return np.zeros((0, self.dimension or 0), dtype='float32'), reused
+        dimension = dimensions.pop()
+        return np.concatenate([v.reshape(-1, dimension) for v in vectors]).astype('float32', copy=False), reused
+
+    def _forget_vector_records(self, filenames):
+        """删除知识库文本目录中已不存在的文件的向量记录"""
+        directory = self._get_text_directory()
+        removed = [filename for filename in filenames if not os.path.exists(os.path.join(directory, filename))]
+        if removed:
+            remove_vector_records(get_vectors_dir(self.db_name), removed)
+
+    def save_index(self, index_path=None, info=None, index_id=None, activate=False):
         """
-        保存向量索引和元数据
+        保存向量索引、元数据和索引信息
         
         将构建好的FAISS索引和相关元数据持久化到磁盘，
         便于后续加载使用，避免重复构建索引。
+        索引信息文件中会记录向量维度和嵌入模型，加载索引时无需再调用嵌入接口。
         
+        Args:
+            index_path (str, optional): 索引文件路径，默认为实例创建时指定的索引；
+                未指定索引时写入知识库的默认索引
+            info (dict, optional): 额外写入索引信息文件的字段（如名称、描述）
+            index_id (str, optional): 另存为指定ID的索引，之后实例固定使用该索引
+            activate (bool): 发布后将保存的索引设为活跃索引，默认不修改活跃索引指针
+            
         Raises:
             Exception: 如果保存过程中发生错误
             
         处理流程：
-        1. 创建索引目录
-        2. 保存FAISS索引文件
-        3. 保存元数据（事件数据、文本、类别映射）
+        1. 在索引目录的暂存目录中写入FAISS索引文件
+        2. 写入元数据（事件数据、文本、类别映射）、词频矩阵、BM25倒排索引和原始文本清单
+        3. 写入索引信息文件（维度、嵌入模型、向量数量）
+        4. 未指定路径时将暂存目录整体发布为索引的新版本；指定路径时依次替换正式文件
+        5. 调用方要求时切换活跃索引指针
         """
+        if index_id is not None:
+            self.index_id, self.pinned = index_id, True
+        # 未固定索引的实例写入默认索引，被激活的其他索引保持不变
+        publish = index_path is None
+        activate = activate and publish
+        if publish and not self.pinned:
+            self.index_id = get_default_index_id(self.db_name)
+        if publish:
+            # 重新解析索引位置，其他进程可能已经发布了新版本
+            self.index_path = self._get_exact_index_path()
+        index_path = index_path or self.index_path
+        # 所有文件先完整写入暂存目录，中途失败不会留下新旧混合的索引文件，
+        # 并发读取方也不会加载到写了一半的索引和元数据
+        staging_root = os.path.join(get_vectors_dir(self.db_name) if publish else os.path.dirname(index_path),
+                                    INDEX_STAGING_DIR)
+        os.makedirs(staging_root, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(dir=staging_root)
+        staged_path = os.path.join(staging_dir, f"{self.index_id}.faiss" if publish else os.path.basename(index_path))
+
         try:
-            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
             # 保存FAISS索引
-            faiss.write_index(self.index, self.index_path)
-            logger.info(f"索引已保存到: {self.index_path}")
+            faiss.write_index(self.index, staged_path)
             
-            # 保存元数据
-            metadata_path = self.index_path.replace(".faiss", "_metadata.pkl")
-            import pickle
-            with open(metadata_path, 'wb') as f:
-                pickle.dump(
-                    {"events": self.events, "event_texts": self.event_texts, "event_metadata": self.event_metadata}, f)
-            logger.info(f"元数据已保存到: {metadata_path}")
+            # 保存列式元数据：向量ID、类别、类别内位置、来源文件、向量化文本和事件内容
+            write_event_columns(get_metadata_path(staged_path), self._iter_rows(), self.event_ids,
+                                self.next_id, EVENT_CATEGORIES)
+
+            # 保存预分词词频矩阵、BM25倒排索引和原始文本清单
+            self.term_matrix.save(get_terms_path(staged_path))
+            self.bm25_index.save(get_bm25_path(staged_path))
+            if self.source_files is not None:
+                self._write_manifest(get_manifest_path(staged_path))
+
+            # 更新索引信息，保留已有的名称、描述等字段
+            index_info = read_index_info(index_path)
+            index_info.update(info or {})
+            now = datetime.now().isoformat()
+            index_info.setdefault("created_at", now)
+            if not info or "updated_at" not in info:
+                index_info["updated_at"] = now
+            index_info["dimension"] = int(self.index.d)
+            index_info["embedding_model"] = self.embedding_model
+            index_info["index_type"] = self.index_type
+            index_info["quantization"] = self.quantization
+            index_info["vector_count"] = int(self.index.ntotal)
+            with open(get_info_path(staged_path), 'w', encoding='utf-8') as f:
+                json.dump(index_info, f, ensure_ascii=False, indent=2)
+
+            if publish:
+                self.index_path = index_path = publish_index_version(self.db_name, self.index_id, staging_dir)
+            else:
+                os.makedirs(os.path.dirname(index_path), exist_ok=True)
+                for staged, path in zip(get_index_files(staged_path), get_index_files(index_path)):
+                    if os.path.exists(staged):
+                        os.replace(staged, path)
+                    elif os.path.exists(path):
+                        # 没有清单信息时删除旧清单，旧版pickle元数据已被列式元数据取代
+                        os.remove(path)
+                shutil.rmtree(staging_dir, ignore_errors=True)
+            logger.info(f"索引已保存到: {index_path}")
+            if activate and get_active_index_id(self.db_name) != self.index_id:
+                set_active_index(self.db_name, self.index_id)
         except Exception as e:
+            shutil.rmtree(staging_dir, ignore_errors=True)
             logger.error(f"保存失败: {str(e)}", exc_info=True)
             raise
 
-    def load_index(self):
+    def _iter_rows(self):
+        """按行号依次生成 (类别, 类别内位置, 事件, 向量化文本, 来源文件名或None)"""
+        for i in range(len(self.event_texts)):
+            category = EVENT_CATEGORIES[self.event_category_codes[i]]
+            position = int(self.event_positions[i])
+            yield (category, position, self.events[category][position], self.event_texts[i],
+                   self.event_metadata[i].get("source"))
+
+    def _save_manifest(self, index_path=None):
+        """
+        保存原始文本清单
+
+        先写入临时文件再替换，避免读取到不完整的清单。
+        没有清单信息（例如由旧版元数据加载）时删除已有的清单文件，防止与新的元数据不一致。
+
+        Args:
+            index_path (str, optional): 索引文件路径，默认为当前实例加载的索引路径
+        """
+        manifest_path = get_manifest_path(index_path or self.index_path)
+        if self.source_files is None:
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
+            return
+        self._write_manifest(manifest_path + ".tmp")
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def _write_manifest(self, path):
+        """将原始文本清单写入指定文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"files": self.source_files, "next_id": self.next_id}, f, ensure_ascii=False, indent=2)
+
+    def load_index(self, mmap=None):
         """
         加载向量索引和元数据
         
         从磁盘读取预先构建的FAISS索引和元数据，
         避免重复构建索引，提高系统启动效率。
+
+        Args:
+            mmap (bool, optional): 是否以只读内存映射方式加载FAISS索引，默认使用配置文件 vector_store.mmap；
+                需要增量更新索引时必须为False
         
         处理流程：
         1. 检查索引文件是否存在
@@ -320,26 +1328,150 @@ class VectorStore:
         4. 如果元数据不存在，重新加载文本数据
         """
         if os.path.exists(self.index_path):
-            # 加载FAISS索引
-            self.index = faiss.read_index(self.index_path)
-            logger.info(f"加载索引: {self.index.ntotal} 个向量")
+            # 加载FAISS索引，启用内存映射时多个进程共享页缓存中的向量数据
+            if mmap is None:
+                mmap = get_index_settings()["mmap"]
+            index, mmapped = read_faiss_index(self.index_path, mmap)
+            index_info = read_index_info(self.index_path)
+            self._check_embedder(index.d, index_info.get("embedding_model"))
+            self.index, self.index_mmapped = index, mmapped
+            logger.info(f"加载索引: {self.index.ntotal} 个向量{'（内存映射）' if mmapped else ''}")
+
+            # 维度以索引文件为准，嵌入模型使用索引信息中记录的模型
+            self.dimension = self.index.d
+            self.embedding_model = index_info.get("embedding_model", self.embedding_model)
+            self.index_type = index_info.get("index_type") or detect_index_type(self.index)
+            self.quantization = index_info.get("quantization") or detect_quantization(self.index)
             
-            # 加载元数据
-            metadata_path = self.index_path.replace(".faiss", "_metadata.pkl")
-            if os.path.exists(metadata_path):
-                import pickle
-                with open(metadata_path, 'rb') as f:
-                    data = pickle.load(f)
-                    self.events = data["events"]
-                    self.event_texts = data["event_texts"]
-                    self.event_metadata = data["event_metadata"]
+            # 加载元数据：列式元数据以内存映射方式加载，事件在访问时才解码；旧版pickle元数据整体读入
+            metadata_path = find_metadata_path(self.index_path)
+            if metadata_path is not None:
+                if metadata_path == get_metadata_path(self.index_path):
+                    columns = read_event_columns(metadata_path)
+                    self.events = columns.events
+                    self.event_texts = columns.texts
+                    self.event_metadata = columns.metadata
+                    self.event_category_codes = columns.category_codes
+                    self.event_positions = columns.positions
+                    self.event_ids = columns.event_ids
+                    self.next_id = columns.next_id
+                    self._build_id_maps()
+                else:
+                    import pickle
+                    with open(metadata_path, 'rb') as f:
+                        data = pickle.load(f)
+                    rows, event_ids, next_id = rows_from_pickle(data, EVENT_CATEGORIES)
+                    self._reset_events()
+                    for category, _, event, event_text, source in rows:
+                        self._append_event(category, event, event_text, source)
+                    self.event_ids, self.next_id = event_ids, next_id
+                    self._build_lookup()
                 logger.info(f"加载元数据: {len(self.event_texts)} 个事件")
+
+                # 原始文本清单只在与元数据一致时使用，否则增量更新会退回完整重建
+                manifest = read_manifest(self.index_path)
+                self.source_files = None
+                if manifest is not None and manifest.get("next_id") == self.next_id:
+                    self.source_files = manifest["files"]
             else:
                 logger.warning("元数据文件不存在，重新加载文本")
                 self.load_texts()
+                # 重新加载的文本与索引中的向量不一定对应，不能作为增量更新的依据
+                self.source_files = None
+
+            # 加载预分词词频矩阵，旧版索引没有该文件时补建
+            terms_path = get_terms_path(self.index_path)
+            self.term_matrix = None
+            if os.path.exists(terms_path):
+                try:
+                    self.term_matrix = TermMatrix.load(terms_path)
+                except Exception as e:
+                    logger.warning(f"加载词频矩阵失败: {str(e)}")
+            if self.term_matrix is None or self.term_matrix.num_docs != len(self.event_texts):
+                logger.info("词频矩阵不存在或与元数据不一致，重新分词")
+                self.term_matrix = TermMatrix.from_texts(self.event_texts)
+
+            # 以内存映射方式加载BM25倒排索引，旧版索引没有该文件时由词频矩阵补建
+            bm25_path = get_bm25_path(self.index_path)
+            self.bm25_index = None
+            if os.path.exists(bm25_path):
+                try:
+                    self.bm25_index = BM25Index.load(bm25_path)
+                except Exception as e:
+                    logger.warning(f"加载BM25倒排索引失败: {str(e)}")
+            if (self.bm25_index is None or self.bm25_index.num_docs != self.term_matrix.num_docs
+                    or self.bm25_index.num_terms != len(self.term_matrix.vocabulary)):
+                logger.info("BM25倒排索引不存在或与词频矩阵不一致，重新构建")
+                self.bm25_index = BM25Index.from_term_matrix(self.term_matrix)
         else:
             logger.warning(f"索引文件 {self.index_path} 不存在")
 
+    def _check_embedder(self, dimension, embedding_model):
+        """
+        检查嵌入器能否为已有索引生成查询向量和新增向量
+
+        Args:
+            dimension (int): 索引的向量维度
+            embedding_model (str or None): 索引信息中记录的嵌入模型
+
+        Raises:
+            ValueError: 如果嵌入器的输出维度与索引不一致（不同维度的向量不能混用）
+        """
+        embedder_dimension = getattr(self.embedder, "dimension", None)
+        if embedder_dimension and embedder_dimension != dimension:
+            raise ValueError(f"索引 {self.index_path} 的向量维度为 {dimension}，"
+                             f"与嵌入器的输出维度 {embedder_dimension} 不一致")
+        if embedding_model and embedding_model != self.embedder.model_name:
+            logger.warning(f"索引使用嵌入模型 {embedding_model} 构建，当前嵌入模型为 {self.embedder.model_name}，"
+                           f"检索结果可能不准确，请重建索引")
+
+    def _check_writable(self):
+        """
+        检查FAISS索引能否修改
+
+        Raises:
+            RuntimeError: 如果索引以只读内存映射方式加载（修改映射的向量存储会使进程异常退出）
+        """
+        if self.index_mmapped:
+            raise RuntimeError("索引以只读内存映射方式加载，不能修改，请使用 load_index(mmap=False) 重新加载")
+
+    def _add_embedded(self, records_by_source, embeddings):
+        """
+        将已生成向量的事件追加到索引、事件列表、词频矩阵和BM25倒排索引
+
+        Args:
+            records_by_source (List[tuple]): (文件名, 文件签名, 事件列表) 列表，文件名为None表示不属于任何原始文本文件
+            embeddings (np.ndarray): 按事件顺序排列的向量矩阵
+        """
+        if len(embeddings) and self.index is not None:
+            self._check_writable()
+        if len(embeddings) and self.index is not None and self.index.ntotal and embeddings.shape[1] != self.index.d:
+            raise ValueError(f"新增向量维度 {embeddings.shape[1]} 与索引维度 {self.index.d} 不一致")
+        first_row = len(self.event_texts)
+        first_id = self.next_id
+        for source, signature, records in records_by_source:
+            id_range = self._append_records(records, source)
+            if source is not None and self.source_files is not None:
+                self.source_files[source] = {**signature, "id_range": id_range}
+        self._build_lookup()
+
+        if len(embeddings):
+            ids = np.arange(first_id, self.next_id, dtype=np.int64)
+            if self.index is None or (self.index.ntotal == 0 and not supports_ids(self.index)):
+                self.index, self.index_type = build_faiss_index(embeddings, "flat", ids=ids)
+                self.quantization = detect_quantization(self.index)
+                self.dimension = self.index.d
+                self.embedding_model = self.embedder.model_name
+            elif supports_ids(self.index):
+                self.index.add_with_ids(embeddings, ids)
+            else:
+                # 旧版索引的向量ID等于添加顺序，只要没有删除过向量就与行号一致
+                self.index.add(embeddings)
+
+        self.term_matrix.append_tokens([tokenize(text) for text in self.event_texts[first_row:]])
+        # 新文档会改变文档频率和平均文档长度，由词频矩阵重新计算倒排索引
+        self.bm25_index = BM25Index.from_term_matrix(self.term_matrix)
+
     def add_data(self, structured_data):
         """
         增量添加新数据到向量数据库
@@ -351,26 +1483,219 @@ class VectorStore:
             structured_data (dict): 包含新事件数据的结构化数据
             
         处理流程：
-        1. 按类别添加新事件
-        2. 生成事件文本描述
-        3. 生成文本向量
-        4. 将向量添加到FAISS索引
-        """
-        for category in ["rainfall", "water_condition", "disaster_impact", "measures"]:
-            for event in structured_data.get(category, []):
-                self.events[category].append(event)
-                event_text = f"{event.get('time', '未知')} {event.get('location', '未知')} {event.get('description', '')}"
-                for key in event:
-                    if key not in ["time", "location", "description"]:
-                        event_text += f" {key}: {event[key]}"
-                self.event_texts.append(event_text)
-                self.event_metadata.append({"category": category, "index": len(self.event_texts) - 1})
-
-        # 生成并添加新向量
-        embedding = self.embedder.embed_text([event_text])
-        if embedding:
-            self.index.add(np.array(embedding, dtype='float32'))
-            logger.info(f"增量添加数据，当前索引大小: {self.index.ntotal}")
+        1. 按类别整理新事件并生成事件文本描述
+        2. 分块生成全部新事件的文本向量
+        3. 将事件和向量以新的向量ID添加到索引
+        """
+        records = [(category, event, make_event_text(event))
+                   for category in EVENT_CATEGORIES for event in structured_data.get(category, [])]
+        if not records:
+            return
+        embeddings = self._embed_texts([event_text for _, _, event_text in records])
+        if embeddings is None:
+            return
+        self._add_embedded([(None, None, records)], embeddings)
+        logger.info(f"增量添加数据，当前索引大小: {self.index.ntotal}")
+
+    def _rebuild_from_texts(self, directory, reason):
+        """
+        完整重建索引并保存（增量更新不可用时使用）
+
+        Args:
+            directory (str): 文本数据目录
+            reason (str): 需要完整重建的原因，用于日志
+
+        Returns:
+            dict: 更新统计信息
+        """
+        logger.info(f"知识库 {self.db_name} 执行完整重建: {reason}")
+        reused = self.build_from_texts(directory)
+        if self.event_texts and (self.index is None or self.index.ntotal != len(self.event_texts)):
+            raise RuntimeError("向量索引构建失败")
+        if self.index is not None:
+            self.save_index()
+        return {"full_rebuild": True, "added_files": len(self.source_files), "changed_files": 0,
+                "removed_files": 0, "embedded_events": len(self.event_texts) - reused, "reused_events": reused,
+                "removed_events": 0}
+
+    def _delete_vectors(self, ids):
+        """
+        从FAISS索引中删除指定ID的向量
+
+        不支持删除的索引类型（hnsw）从索引中重建其余向量后重新构建图结构，
+        不需要重新调用嵌入接口（sq8编码的向量会在解码后重新量化，存在少量额外误差）。
+
+        Args:
+            ids (np.ndarray): 待删除的向量ID
+        """
+        self._check_writable()
+        if supports_remove(self.index):
+            remove_vectors(self.index, ids)
+            return
+        keep_ids = self.event_ids[~np.isin(self.event_ids, ids)]
+        logger.info(f"{self.index_type} 索引不支持删除向量，由剩余的 {len(keep_ids)} 个向量重建索引")
+        vectors = self.index.reconstruct_batch(keep_ids) if len(keep_ids) else np.zeros((0, self.index.d), dtype='float32')
+        self.index, self.index_type = build_faiss_index(vectors, self.index_type, quantization=self.quantization,
+                                                        ids=keep_ids)
+
+    def _remove_source_events(self, filenames):
+        """
+        按原始文本清单中记录的向量ID区间删除文件对应的向量和事件
+
+        Args:
+            filenames (List[str]): 原始文本文件名，必须在清单中
+
+        Returns:
+            int: 删除的事件数量
+        """
+        stale_ids = [np.arange(*self.source_files[filename]["id_range"], dtype=np.int64) for filename in filenames]
+        if not stale_ids:
+            return 0
+        stale_ids = np.concatenate(stale_ids)
+        stale_ids = stale_ids[stale_ids < len(self.id_to_row)]
+        stale_ids = stale_ids[self.id_to_row[stale_ids] >= 0]
+        if len(stale_ids):
+            self._delete_vectors(stale_ids)
+            self._remove_rows(self.id_to_row[stale_ids])
+        for filename in filenames:
+            del self.source_files[filename]
+        return len(stale_ids)
+
+    def _use_default_index(self):
+        """
+        未固定索引的实例改为加载和更新默认索引
+
+        增量更新和删除文件内容都作用于由全部原始文本构建的默认索引，
+        不能把被激活的子集索引的内容写入默认索引。
+        """
+        if not self.pinned and self.index_id != get_default_index_id(self.db_name):
+            self.index_id = get_default_index_id(self.db_name)
+            self.index_path = self._get_exact_index_path()
+
+    def remove_sources(self, filenames, directory=None):
+        """
+        从索引中删除指定原始文本文件的向量和事件并保存
+
+        只按清单中记录的向量ID区间修改索引，不扫描其他文件、不调用嵌入接口，
+        耗时与知识库规模基本无关（加载和保存索引文件除外）。
+        没有清单或旧版索引时退回为update_index（完整重建）。
+
+        Args:
+            filenames (List[str]): 被删除的原始文本文件名
+            directory (str, optional): 文本数据目录路径，退回完整重建时使用
+
+        Returns:
+            dict: 更新统计信息，字段与update_index相同
+        """
+        self._use_default_index()
+        if not os.path.exists(self.index_path):
+            return self.update_index(directory)
+        self.load_index(mmap=False)
+        if self.source_files is None or not supports_ids(self.index):
+            return self.update_index(directory)
+
+        filenames = [filename for filename in filenames if filename in self.source_files]
+        stats = {"full_rebuild": False, "added_files": 0, "changed_files": 0, "removed_files": len(filenames),
+                 "embedded_events": 0, "reused_events": 0, "removed_events": 0}
+        if not filenames:
+            logger.info(f"知识库 {self.db_name} 的索引中没有这些文件的数据，无需更新")
+            return stats
+        stats["removed_events"] = self._remove_source_events(filenames)
+        self.bm25_index = BM25Index.from_term_matrix(self.term_matrix)
+        self._forget_vector_records(filenames)
+        self.save_index()
+        logger.info(f"已从知识库 {self.db_name} 的索引中删除 {stats['removed_events']} 个事件，"
+                    f"当前索引大小 {self.index.ntotal}")
+        return stats
+
+    def update_index(self, directory=None):
+        """
+        按原始文本文件增量更新索引并保存
+
+        根据原始文本清单比较目录中的txt文件：大小和修改时间都未变化的文件直接跳过，
+        否则比较内容哈希。只解析和嵌入新增或内容变化的文件，
+        并按清单中记录的向量ID区间从索引中删除已修改或已删除文件的旧向量。
+        没有清单或旧版索引（向量没有稳定ID）时退回完整重建。
+        被删除的向量ID不会复用，索引中的空洞在下一次完整重建时消除。
+        未固定索引的实例总是加载和更新默认索引，不修改活跃索引指针。
+
+        Args:
+            directory (str, optional): 文本数据目录路径，如果为None则使用默认路径
+
+        Returns:
+            dict: 更新统计信息，包括 full_rebuild、added_files、changed_files、removed_files、
+                embedded_events、reused_events（从向量记录库读取的事件数）、removed_events
+
+        Raises:
+            FileNotFoundError: 如果数据目录不存在
+            RuntimeError: 如果向量生成失败
+        """
+        directory = directory or self._get_text_directory()
+        if not os.path.exists(directory):
+            raise FileNotFoundError(f"数据目录不存在: {directory}")
+
+        self._use_default_index()
+        if not os.path.exists(self.index_path):
+            return self._rebuild_from_texts(directory, "索引不存在")
+        self.load_index(mmap=False)
+        if self.source_files is None:
+            return self._rebuild_from_texts(directory, "没有原始文本清单")
+        if not supports_ids(self.index):
+            return self._rebuild_from_texts(directory, "旧版索引不支持按ID更新")
+
+        # 1. 比较文件签名，找出新增、修改和删除的文件
+        txt_files = sorted(f for f in os.listdir(directory) if f.endswith(".txt"))
+        pending = []        # (文件名, 文件签名, 事件列表)
+        changed_files = []
+        manifest_touched = False
+        candidates = []
+        for filename in txt_files:
+            known = self.source_files.get(filename)
+            st = os.stat(os.path.join(directory, filename))
+            if not (known and known["size"] == st.st_size and known["mtime"] == st.st_mtime_ns):
+                candidates.append(filename)
+        parsed = load_text_files(directory, candidates, all_files=txt_files) if candidates else {}
+        for filename, (signature, records) in parsed.items():
+            known = self.source_files.get(filename)
+            if known and known["sha1"] == signature["sha1"]:
+                # 只有修改时间变化，内容未变
+                known["mtime"] = signature["mtime"]
+                manifest_touched = True
+                continue
+            if known:
+                changed_files.append(filename)
+            pending.append((filename, signature, records))
+        present = set(txt_files)
+        removed_files = [filename for filename in self.source_files if filename not in present]
+        stats = {"full_rebuild": False, "added_files": len(pending) - len(changed_files),
+                 "changed_files": len(changed_files), "removed_files": len(removed_files),
+                 "embedded_events": 0, "reused_events": 0, "removed_events": 0}
+
+        if not pending and not removed_files:
+            # 只有修改时间变化的文件更新清单中的签名，下次不再比较内容哈希
+            if manifest_touched:
+                self._save_manifest()
+            logger.info(f"知识库 {self.db_name} 的原始文本没有变化，无需更新索引")
+            return stats
+
+        # 2. 先生成新向量（向量记录库中已有的直接读取），失败时不修改索引
+        embeddings, reused = self._embed_sources(
+            [(filename, signature["sha1"], [event_text for _, _, event_text in records])
+             for filename, signature, records in pending])
+        if embeddings is None:
+            raise RuntimeError("向量生成失败，索引未更新")
+
+        # 3. 删除已修改和已删除文件的旧向量
+        stats["removed_events"] = self._remove_source_events(changed_files + removed_files)
+
+        # 4. 追加新增和修改文件的事件及向量
+        self._add_embedded(pending, embeddings)
+        stats["embedded_events"] = len(embeddings) - reused
+        stats["reused_events"] = reused
+        self._forget_vector_records(removed_files)
+        self.save_index()
+        logger.info(f"知识库 {self.db_name} 增量更新完成: {stats}，当前索引大小 {self.index.ntotal}")
+        return stats
 
     def _tokenize(self, text: str) -> List[str]:
         """
@@ -385,8 +1710,7 @@ class VectorStore:
         Returns:
             List[str]: 分词结果列表，已去除停用词
         """
-        words = jieba.cut(text)
-        return [w for w in words if w not in self.stopwords and len(w.strip()) > 1]
+        return tokenize(text)
 
     def _calculate_keyword_score(self, query_tokens: List[str], doc_tokens: List[str]) -> float:
         """
@@ -414,19 +1738,263 @@ class VectorStore:
             
         return matches / total_query_terms
 
-    def search(self, query: str, category: str = None, k: int = 5, alpha: float = 0.7) -> List[Dict[str, Any]]:
+    def _vector_search(self, query_vector, n, category=None, nprobe=None, ef_search=None):
+        """
+        向量检索，可限定类别
+
+        Args:
+            query_vector (np.ndarray): 形状为 (1, d) 的查询向量
+            n (int): 返回结果数量
+            category (str, optional): 类别过滤
+            nprobe (int, optional): IVF索引检索的聚类数，默认使用索引的设置
+            ef_search (int, optional): HNSW索引的检索候选队列长度，默认使用索引的设置
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 按距离升序排列的事件行号和距离
+        """
+        return self._vector_search_batch(query_vector, n, category, nprobe, ef_search)[0]
+
+    def _vector_search_batch(self, query_vectors, n, category=None, nprobe=None, ef_search=None):
+        """
+        批量向量检索，可限定类别
+
+        全部查询向量在一次index.search调用中完成检索，nprobe/efSearch通过搜索参数按请求传入。
+        指定类别时通过ID选择器只在该类别的向量中检索，稀疏类别也能返回足够的结果
+        （IVF索引在探测的聚类中结果不足时逐步增大nprobe）；
+        FAISS版本不支持搜索参数时，退回为逐步扩大候选数量再按类别过滤。
+
+        Args:
+            query_vectors (np.ndarray): 形状为 (m, d) 的查询向量矩阵
+            n (int): 每个查询返回的结果数量
+            category (str, optional): 类别过滤
+            nprobe (int, optional): IVF索引检索的聚类数
+            ef_search (int, optional): HNSW索引的检索候选队列长度
+
+        Returns:
+            List[Tuple[np.ndarray, np.ndarray]]: 每个查询按距离升序排列的事件行号和距离
+        """
+        if category is not None:
+            n = min(n, len(self.category_ids[category]))
+        n = min(n, self.index.ntotal)
+        if n <= 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))] * len(query_vectors)
+
+        def valid_hits(distances, indices):
+            # FAISS返回稳定的向量ID，转换为事件行号
+            hits = []
+            for row_distances, row_indices in zip(distances, indices):
+                in_range = (row_indices >= 0) & (row_indices < len(self.id_to_row))
+                rows = np.full(len(row_indices), -1, dtype=np.int64)
+                rows[in_range] = self.id_to_row[row_indices[in_range]]
+                valid = rows >= 0
+                hits.append((rows[valid], row_distances[valid]))
+            return hits
+
+        def run_search(count, selector=None, probe=nprobe):
+            params = make_search_params(self.index, selector, probe, ef_search, count)
+            if params is None:
+                return valid_hits(*self.index.search(query_vectors, count))
+            return valid_hits(*self.index.search(query_vectors, count, params=params))
+
+        if category is None:
+            return run_search(n)
+
+        try:
+            selector = self._category_selectors.get(category)
+            if selector is None:
+                selector = self._category_selectors[category] = faiss.IDSelectorBatch(self.category_ids[category])
+            hits = run_search(n, selector)
+            base = unwrap_index(self.index)
+            probe = nprobe or getattr(base, "nprobe", 0)
+            while isinstance(base, faiss.IndexIVF) and probe < base.nlist and any(len(ids) < n for ids, _ in hits):
+                probe = min(probe * 4, base.nlist)
+                hits = run_search(n, selector, probe)
+            return hits
+        except (AttributeError, TypeError, RuntimeError) as e:
+            logger.debug(f"按类别过滤的向量检索不可用，改为扩大候选数量: {str(e)}")
+
+        code = CATEGORY_CODES[category]
+        fetch = n * 2
+        while True:
+            fetch = min(fetch, self.index.ntotal)
+            hits = []
+            for ids, distances in run_search(fetch):
+                in_category = self.event_category_codes[ids] == code
+                hits.append((ids[in_category][:n], distances[in_category][:n]))
+            if all(len(ids) >= n for ids, _ in hits) or fetch >= self.index.ntotal:
+                return hits
+            fetch *= 4
+
+    def _vector_distances(self, query_vector, ids) -> np.ndarray:
+        """
+        计算查询向量与指定文档向量的L2距离
+
+        用于只被词法检索召回的文档，使其结果同样带有向量距离。
+        索引类型不支持重建向量时返回None。
+
+        Args:
+            query_vector (np.ndarray): 形状为 (1, d) 的查询向量
+            ids (np.ndarray): 文档的事件行号
+
+        Returns:
+            np.ndarray or None: 与ids顺序一致的平方L2距离（与IndexFlatL2的距离一致）
+        """
+        try:
+            vectors = self.index.reconstruct_batch(self.event_ids[np.asarray(ids, dtype=np.int64)])
+            return ((vectors - query_vector[0]) ** 2).sum(axis=1)
+        except RuntimeError:
+            return None
+
+    def _embed_query(self, query: str):
+        """
+        生成查询向量
+
+        Args:
+            query (str): 查询文本
+
+        Returns:
+            np.ndarray or None: 形状为 (1, d) 的查询向量，生成失败时返回None
+        """
+        # 支持查询微批处理的嵌入器会把并发请求的查询合并为一次接口调用
+        embed_query = getattr(self.embedder, "embed_query", None)
+        query_vector = [embed_query(query)] if embed_query else self.embedder.embed_text([query])
+        if not query_vector or query_vector[0] is None:
+            logger.error("查询向量生成失败")
+            return None
+        return np.array(query_vector, dtype='float32')
+
+    def _embed_queries(self, queries: List[str]):
+        """
+        分块批量生成查询向量
+
+        按嵌入器的批大小拆分为多次接口调用，某一块调用失败只影响该块中的查询。
+
+        Args:
+            queries (List[str]): 查询文本列表
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 形状为 (m, d) 的查询向量矩阵，以及标记向量是否生成成功的布尔数组
+        """
+        batch_size = max(1, getattr(self.embedder, "batch_size", 10))
+        vectors = np.zeros((len(queries), self.index.d), dtype='float32')
+        valid = np.zeros(len(queries), dtype=bool)
+        for start in range(0, len(queries), batch_size):
+            chunk = queries[start:start + batch_size]
+            embeddings = self.embedder.embed_text(list(chunk))
+            if not embeddings or len(embeddings) != len(chunk):
+                logger.error(f"第 {start + 1}-{start + len(chunk)} 条查询的向量生成失败")
+                continue
+            vectors[start:start + len(chunk)] = np.array(embeddings, dtype='float32')
+            valid[start:start + len(chunk)] = True
+        return vectors, valid
+
+    def _rank_fusion(self, query_vector, vector_ids, vector_distances, lexical_ids, bm25_scores, alpha):
+        """
+        对向量检索和BM25检索的候选结果进行倒数排名融合
+
+        Args:
+            query_vector (np.ndarray): 查询向量，用于计算只被词法检索召回的文档的向量距离
+            vector_ids, vector_distances: 按距离升序排列的向量检索结果
+            lexical_ids, bm25_scores: 按得分降序排列的BM25检索结果
+            alpha (float): 向量检索的权重（0-1之间），BM25检索的权重为 1-alpha；
+                取1时只使用向量检索，取0时只使用BM25检索
+
+        Returns:
+            Dict[int, dict]: 事件行号 -> 候选信息（distance、bm25_score、final_score）
+        """
+        vector_weight = float(alpha)
+        lexical_weight = 1.0 - vector_weight
+        # 权重为0的一路不参与融合，其候选也不会进入结果
+        if not vector_weight:
+            vector_ids, vector_distances = vector_ids[:0], vector_distances[:0]
+        if not lexical_weight:
+            lexical_ids, bm25_scores = lexical_ids[:0], bm25_scores[:0]
+
+        candidates = {}
+        for rank, (i, distance) in enumerate(zip(vector_ids, vector_distances), start=1):
+            candidates[int(i)] = {"distance": float(distance), "bm25_score": 0.0,
+                                  "final_score": vector_weight / (RRF_K + rank)}
+        lexical_only = [int(i) for i in lexical_ids if int(i) not in candidates]
+        if lexical_only:
+            lexical_distances = self._vector_distances(query_vector, lexical_only)
+            if lexical_distances is None:
+                fallback = float(vector_distances.max()) if len(vector_distances) else 1.0
+                lexical_distances = np.full(len(lexical_only), fallback)
+            for i, distance in zip(lexical_only, lexical_distances):
+                candidates[i] = {"distance": float(distance), "bm25_score": 0.0, "final_score": 0.0}
+        for rank, (i, bm25_score) in enumerate(zip(lexical_ids, bm25_scores), start=1):
+            candidate = candidates[int(i)]
+            candidate["bm25_score"] = float(bm25_score)
+            candidate["final_score"] += lexical_weight / (RRF_K + rank)
+        return candidates
+
+    def _build_results(self, candidates, keyword_scores, k) -> List[Dict[str, Any]]:
+        """
+        将融合后的候选转换为搜索结果并排序
+
+        Args:
+            candidates (Dict[int, dict]): _rank_fusion 返回的候选信息
+            keyword_scores: 与candidates迭代顺序一致的关键词匹配得分
+            k (int): 返回结果数量
+
+        Returns:
+            List[Dict[str, Any]]: 按融合得分降序排列的前k个结果
+        """
+        results = []
+        for (i, candidate), keyword_score in zip(candidates.items(), keyword_scores):
+            # 通过查找表以O(1)确定事件类别和类别内位置
+            event_category = EVENT_CATEGORIES[self.event_category_codes[i]]
+            results.append({
+                "category": event_category,
+                "event": self.events[event_category][self.event_positions[i]],
+                "distance": candidate["distance"],
+                "keyword_score": float(keyword_score),
+                "bm25_score": candidate["bm25_score"],
+                "final_score": candidate["final_score"]
+            })
+
+        # 按综合得分排序
+        return sorted(results, key=lambda x: x["final_score"], reverse=True)[:k]
+
+    def _fuse_results(self, query_vector, query_tokens, vector_ids, vector_distances,
+                      lexical_ids, bm25_scores, k, alpha) -> List[Dict[str, Any]]:
+        """
+        融合单个查询的两路检索结果
+
+        Args:
+            query_vector (np.ndarray): 查询向量
+            query_tokens (List[str]): 查询分词结果
+            vector_ids, vector_distances: 按距离升序排列的向量检索结果
+            lexical_ids, bm25_scores: 按得分降序排列的BM25检索结果
+            k (int): 返回结果数量
+            alpha (float): 向量检索的权重
+
+        Returns:
+            List[Dict[str, Any]]: 按融合得分降序排列的前k个结果
+        """
+        candidates = self._rank_fusion(query_vector, vector_ids, vector_distances, lexical_ids, bm25_scores, alpha)
+        # 关键词匹配得分通过预分词的词频矩阵向量化计算
+        keyword_scores = self.term_matrix.keyword_scores(query_tokens, list(candidates.keys()))
+        return self._build_results(candidates, keyword_scores, k)
+
+    def search(self, query: str, category: str = None, k: int = 5, alpha: float = 0.7,
+               nprobe: int = None, ef_search: int = None) -> List[Dict[str, Any]]:
         """
-        混合搜索：结合向量相似度和关键词匹配
+        混合搜索：结合向量检索和BM25全文检索
         
-        这是RAG系统的核心检索功能，采用双重策略提高检索质量：
-        1. 向量相似度：捕获语义层面的相似性
-        2. 关键词匹配：确保关键术语的精确匹配
+        这是RAG系统的核心检索功能，采用双路召回提高检索质量：
+        1. 向量检索：捕获语义层面的相似性
+        2. BM25检索：在全部语料上进行词法检索，确保站点名、河流名等关键术语即使被向量检索遗漏也能召回
+        两路结果通过倒数排名融合（RRF）合并排序。
         
         Args:
             query (str): 搜索查询文本
             category (str, optional): 可选的类别过滤，限定搜索范围
             k (int): 返回结果数量，默认为5
-            alpha (float): 向量相似度的权重(0-1之间)，默认为0.7
+            alpha (float): 向量检索的权重(0-1之间)，默认为0.7，BM25检索的权重为 1-alpha。
+                取1时只使用向量检索，取0时只使用BM25检索
+            nprobe (int, optional): IVF类索引检索的聚类数，越大召回越高、速度越慢，默认使用配置值
+            ef_search (int, optional): HNSW索引的检索候选队列长度，默认使用配置值
             
         Returns:
             List[Dict[str, Any]]: 按综合得分排序的搜索结果列表，每个结果包含：
@@ -434,63 +2002,162 @@ class VectorStore:
                 - event: 事件数据
                 - distance: 向量距离
                 - keyword_score: 关键词匹配得分
-                - final_score: 综合得分
+                - bm25_score: BM25得分（未被词法检索召回时为0）
+                - final_score: 排名融合得分
             
         处理流程：
-        1. 生成查询向量
-        2. 使用FAISS进行向量相似度搜索
-        3. 对候选结果进行关键词匹配
-        4. 计算综合得分
-        5. 按得分排序返回结果
-        """
-        # 1. 向量相似度搜索
-        query_vector = self.embedder.embed_text([query])
-        if not query_vector:
-            logger.error("查询向量生成失败")
+        1. 生成查询向量并使用FAISS进行向量检索（指定类别时只检索该类别的向量）
+        2. 对查询分词并在倒排索引上进行BM25检索
+        3. 合并两路候选，按 alpha/(RRF_K+向量排名) + (1-alpha)/(RRF_K+词法排名) 计算融合得分
+        4. 按得分排序返回结果
+        """
+        if self.index is None or self.index.ntotal == 0:
+            logger.warning("索引为空，无法搜索")
             return []
 
-        query_vector_array = np.array(query_vector, dtype='float32')
-        distances, indices = self.index.search(query_vector_array, k * 2)  # 获取更多候选结果
-        
-        # 2. 关键词匹配
+        # 1. 向量检索
+        query_vector_array = self._embed_query(query)
+        if query_vector_array is None:
+            return []
+        # 获取更多候选结果；指定类别时只在该类别的向量中检索
+        vector_ids, vector_distances = self._vector_search(query_vector_array, k * 2, category, nprobe, ef_search)
+
+        # 2. BM25检索：只对查询文本分词，在倒排索引上对全部文档打分
         query_tokens = self._tokenize(query)
-        
-        results = []
-        for j, i in enumerate(indices[0]):
-            if i != -1 and i < len(self.event_texts):
-                metadata = self.event_metadata[i]
-                if category is None or metadata["category"] == category:
-                    # 获取文档内容
-                    event = self.events[metadata["category"]][
-                        [e["index"] for e in self.event_metadata if e["category"] == metadata["category"]].index(i)]
-                    
-                    # 计算关键词匹配得分
-                    doc_tokens = self._tokenize(self.event_texts[i])
-                    keyword_score = self._calculate_keyword_score(query_tokens, doc_tokens)
-                    
-                    # 归一化向量距离得分
-                    vector_score = 1.0 / (1.0 + float(distances[0][j]))
-                    
-                    # 计算综合得分
-                    final_score = alpha * vector_score + (1 - alpha) * keyword_score
-                    
-                    results.append({
-                        "category": metadata["category"],
-                        "event": event,
-                        "distance": float(distances[0][j]),
-                        "keyword_score": keyword_score,
-                        "final_score": final_score
-                    })
+        doc_mask = None
+        if category is not None:
+            doc_mask = self.event_category_codes == CATEGORY_CODES[category]
+        lexical_ids, bm25_scores = self.bm25_index.search(
+            self.term_matrix.lookup(query_tokens), k * 2, doc_mask)
 
-        # 按综合得分排序
-        sorted_results = sorted(results, key=lambda x: x["final_score"], reverse=True)
+        # 3. 倒数排名融合
+        sorted_results = self._fuse_results(query_vector_array, query_tokens, vector_ids, vector_distances,
+                                            lexical_ids, bm25_scores, k, alpha)
         
         # 记录日志
         logger.info(f"搜索查询: {query}")
         logger.info(f"查询分词: {query_tokens}")
-        logger.info(f"找到 {len(sorted_results)} 个匹配项")
+        logger.info(f"找到 {len(sorted_results)} 个匹配项（向量 {len(vector_ids)}，BM25 {len(lexical_ids)}）")
         
-        return sorted_results[:k]
+        return sorted_results
+
+    def search_multi(self, query: str, categories: List[str] = None, k: int = 5, alpha: float = 0.7,
+                     nprobe: int = None, ef_search: int = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        多类别混合搜索
+
+        与对每个类别分别调用search的结果一致，但查询只生成一次向量、只分词一次：
+        先执行一次不限类别的向量检索（候选数量为 k*2*类别数）并按类别分组，
+        只有候选不足的类别才追加一次按类别过滤的检索；BM25得分也只对全部文档计算一次。
+
+        Args:
+            query (str): 搜索查询文本
+            categories (List[str], optional): 需要检索的类别，默认为全部类别
+            k (int): 每个类别返回的结果数量，默认为5
+            alpha (float): 向量检索的权重，含义与search相同
+            nprobe (int, optional): IVF类索引检索的聚类数
+            ef_search (int, optional): HNSW索引的检索候选队列长度
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: 类别 -> 按综合得分排序的搜索结果列表
+        """
+        categories = list(categories or EVENT_CATEGORIES)
+        if self.index is None or self.index.ntotal == 0:
+            logger.warning("索引为空，无法搜索")
+            return {category: [] for category in categories}
+
+        query_vector_array = self._embed_query(query)
+        if query_vector_array is None:
+            return {category: [] for category in categories}
+
+        n = k * 2
+        all_ids, all_distances = self._vector_search(query_vector_array, n * len(categories),
+                                                     nprobe=nprobe, ef_search=ef_search)
+        all_codes = self.event_category_codes[all_ids]
+
+        query_tokens = self._tokenize(query)
+        bm25_scores_all = self.bm25_index.score(self.term_matrix.lookup(query_tokens))
+
+        related_events = {}
+        for category in categories:
+            code = CATEGORY_CODES[category]
+            in_category = all_codes == code
+            vector_ids = all_ids[in_category][:n]
+            vector_distances = all_distances[in_category][:n]
+            # 不限类别的候选中该类别结果不足时，单独执行一次按类别过滤的检索
+            if len(vector_ids) < min(n, len(self.category_ids[category])):
+                vector_ids, vector_distances = self._vector_search(query_vector_array, n, category, nprobe, ef_search)
+
+            lexical_ids, bm25_scores = BM25Index.top(
+                bm25_scores_all, n, self.event_category_codes == code)
+            related_events[category] = self._fuse_results(
+                query_vector_array, query_tokens, vector_ids, vector_distances,
+                lexical_ids, bm25_scores, k, alpha)
+
+        logger.info(f"多类别搜索查询: {query}")
+        logger.info(f"查询分词: {query_tokens}")
+        logger.info("各类别匹配数: " + ", ".join(f"{c}={len(r)}" for c, r in related_events.items()))
+        return related_events
+
+    def search_batch(self, queries: List[str], category: str = None, k: int = 5, alpha: float = 0.7,
+                     nprobe: int = None, ef_search: int = None) -> List[List[Dict[str, Any]]]:
+        """
+        批量混合搜索
+
+        用于批量任务一次性查询大量地区/主题：查询向量按嵌入器批大小分块生成，
+        全部查询向量堆叠后只调用一次index.search，所有候选的关键词匹配得分一次性向量化计算。
+        每个查询的结果与单独调用search一致。
+
+        Args:
+            queries (List[str]): 查询文本列表
+            category (str, optional): 可选的类别过滤
+            k (int): 每个查询返回的结果数量，默认为5
+            alpha (float): 向量检索的权重，含义与search相同
+            nprobe (int, optional): IVF类索引检索的聚类数
+            ef_search (int, optional): HNSW索引的检索候选队列长度
+
+        Returns:
+            List[List[Dict[str, Any]]]: 与queries顺序一致的搜索结果，向量生成失败的查询结果为空列表
+        """
+        if not queries:
+            return []
+        if self.index is None or self.index.ntotal == 0:
+            logger.warning("索引为空，无法搜索")
+            return [[] for _ in queries]
+
+        # 1. 分块生成查询向量，堆叠后一次完成向量检索
+        query_vectors, valid = self._embed_queries(queries)
+        valid_rows = np.flatnonzero(valid)
+        vector_hits = dict(zip(valid_rows, self._vector_search_batch(
+            query_vectors[valid_rows], k * 2, category, nprobe, ef_search)))
+
+        # 2. 对每个查询分词并执行BM25检索
+        doc_mask = None
+        if category is not None:
+            doc_mask = self.event_category_codes == CATEGORY_CODES[category]
+        query_token_lists = [self._tokenize(query) for query in queries]
+
+        # 3. 排名融合，随后一次性计算全部候选的关键词匹配得分
+        fused = {}
+        for row in valid_rows:
+            vector_ids, vector_distances = vector_hits[row]
+            lexical_ids, bm25_scores = self.bm25_index.search(
+                self.term_matrix.lookup(query_token_lists[row]), k * 2, doc_mask)
+            fused[row] = self._rank_fusion(query_vectors[row:row + 1], vector_ids, vector_distances,
+                                           lexical_ids, bm25_scores, alpha)
+        pair_queries = np.repeat(valid_rows, [len(fused[row]) for row in valid_rows])
+        pair_docs = np.fromiter((i for row in valid_rows for i in fused[row]), dtype=np.int64, count=len(pair_queries))
+        keyword_scores = self.term_matrix.keyword_scores_batch(query_token_lists, pair_queries, pair_docs)
+
+        results = [[] for _ in queries]
+        offset = 0
+        for row in valid_rows:
+            count = len(fused[row])
+            results[row] = self._build_results(fused[row], keyword_scores[offset:offset + count], k)
+            offset += count
+
+        logger.info(f"批量搜索 {len(queries)} 个查询，成功 {len(valid_rows)} 个")
+        return results
 
     def get_all_contents(self, limit: int = 20) -> List[Dict[str, Any]]:
         """
@@ -551,9 +2218,8 @@ class VectorStore:
 if __name__ == "__main__":
     # 测试代码
     store = VectorStore(db_name="test_db")
-    store.load_texts()
-    store.build_index()
-    store.save_index()
+    store.build_from_texts()
+    store.save_index(activate=True)
     store.load_index()
     results = store.search("洪水救援", category="measures")
     for result in results:
@@ -0,0 +1,157 @@
+"""
+向量存储注册表
+
+在进程内共享已加载的VectorStore实例，避免搜索、聊天和报告生成在每次请求时
+重新读取FAISS索引文件并反序列化全部元数据。
+主要功能：
+1. 按 (知识库ID, 索引ID) 缓存已加载的向量存储，首次使用时延迟加载
+2. 未指定索引ID时按活跃索引指针解析，激活其他索引后下一次获取即使用新索引
+3. 根据索引位置和索引文件标识（修改时间/大小/inode）判断索引是否被重建或发布了新版本，自动重新加载
+4. 同一索引的并发加载只执行一次，线程安全
+"""
+
+import os
+import threading
+from loguru import logger
+from src.knowledge_management.vector_store import VectorStore, get_active_index_id, get_index_path, get_index_files
+
+
+class VectorStoreRegistry:
+    """
+    向量存储注册表类
+
+    以 (知识库ID, 索引ID) 为键缓存已加载的VectorStore，并记录加载时索引文件的标识。
+    每次获取时读取活跃索引指针并对索引相关文件执行一次stat，文件未变化则直接复用内存中的实例；
+    索引被重建后，下一次获取会自动重新加载。每个知识库只保留活跃索引和最近一次按ID获取的索引，
+    切换活跃索引后旧索引的实例随之释放。
+
+    注意：注册表返回的实例由多个请求共享，调用方只能进行搜索等只读操作，
+    构建或修改索引时应自行创建新的VectorStore实例。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (db_name, index_id) -> (索引标识, VectorStore实例)
+        self._entries = {}
+        # (db_name, index_id) -> 加载锁，保证同一索引的并发加载只执行一次
+        self._load_locks = {}
+
+    @staticmethod
+    def _index_identity(index_path):
+        """
+        计算索引文件的标识
+
+        由索引文件及其附属文件（元数据、词频矩阵、索引信息）的 (inode, 大小, 修改时间, 状态变更时间) 组成。
+        复制文件时shutil.copy2会保留修改时间，因此同时使用ctime判断文件是否被替换。
+
+        Args:
+            index_path (str): FAISS索引文件路径
+
+        Returns:
+            tuple or None: 索引标识，索引文件不存在时返回None
+        """
+        identity = []
+        for path in get_index_files(index_path):
+            try:
+                st = os.stat(path)
+                identity.append((st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns))
+            except FileNotFoundError:
+                if path == index_path:
+                    return None
+                identity.append(None)
+        return tuple(identity)
+
+    def _get_load_lock(self, key):
+        with self._lock:
+            lock = self._load_locks.get(key)
+            if lock is None:
+                lock = self._load_locks[key] = threading.Lock()
+            return lock
+
+    def get(self, db_name, index_id=None):
+        """
+        获取已加载索引的向量存储实例
+
+        Args:
+            db_name (str): 数据库名称或知识库ID
+            index_id (str, optional): 索引ID，默认使用活跃索引
+
+        Returns:
+            VectorStore: 已加载索引的共享实例
+
+        Raises:
+            FileNotFoundError: 如果没有活跃索引或索引文件不存在
+        """
+        active_id = get_active_index_id(db_name)
+        index_id = index_id or active_id
+        if index_id is None:
+            self.invalidate(db_name)
+            raise FileNotFoundError(f"数据库 {db_name} 没有活跃索引")
+        key = (db_name, index_id)
+        index_path = get_index_path(db_name, index_id)
+        identity = self._index_identity(index_path)
+        if identity is None:
+            self._discard(key)
+            raise FileNotFoundError(f"索引文件 {index_path} 不存在")
+
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry[0] == identity:
+            return entry[1]
+
+        with self._get_load_lock(key):
+            # 等待锁期间其他线程可能已完成加载
+            with self._lock:
+                entry = self._entries.get(key)
+            identity = self._index_identity(index_path)
+            if identity is None:
+                self._discard(key)
+                raise FileNotFoundError(f"索引文件 {index_path} 不存在")
+            if entry and entry[0] == identity:
+                return entry[1]
+
+            logger.info(f"加载知识库 {db_name} 的向量索引 {index_id} 到注册表")
+            store = VectorStore(db_name=db_name, index_id=index_id)
+            store.load_index()
+            with self._lock:
+                # 同一知识库只保留活跃索引和本次获取的索引
+                for other in [k for k in self._entries if k[0] == db_name and k[1] not in (index_id, active_id)]:
+                    del self._entries[other]
+                self._entries[key] = (identity, store)
+            return store
+
+    def _discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, db_name=None):
+        """
+        移除缓存的向量存储实例
+
+        Args:
+            db_name (str, optional): 数据库名称，为None时清空全部缓存
+        """
+        with self._lock:
+            if db_name is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == db_name]:
+                    del self._entries[key]
+
+
+# 进程内共享的注册表实例
+vector_store_registry = VectorStoreRegistry()
+
+
+def get_vector_store(db_name, index_id=None):
+    """
+    从进程内注册表获取已加载索引的向量存储实例
+
+    Args:
+        db_name (str): 数据库名称或知识库ID
+        index_id (str, optional): 索引ID，默认使用活跃索引
+
+    Returns:
+        VectorStore: 已加载索引的共享实例
+    """
+    return vector_store_registry.get(db_name, index_id)
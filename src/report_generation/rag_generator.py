@@ -1,7 +1,7 @@
 import os
 import yaml
 from loguru import logger
-from src.knowledge_management.vector_store import VectorStore
+from src.knowledge_management.vector_store_registry import get_vector_store
 from src.model_interaction.llm_client import LLMClient
 from datetime import datetime
 # 导入可视化生成器
@@ -93,16 +93,17 @@ class RAGGenerator:
             kb_reports_dir = os.path.join(project_root, "data", "knowledge_bases", db_name, "reports")
             os.makedirs(kb_reports_dir, exist_ok=True)
             
-        # 从向量数据库检索相关内容，使用指定的知识库ID
-        self.vector_store = VectorStore(db_name=db_name)  # 重新初始化向量存储，使用正确的知识库ID
-        self.vector_store.load_index()
+        # 从向量数据库检索相关内容，使用指定的知识库ID（通过注册表复用已加载的索引）
+        try:
+            self.vector_store = get_vector_store(db_name)
+        except FileNotFoundError as e:
+            logger.warning(f"知识库 {db_name} 尚未构建索引: {str(e)}")
+            return None
         categories = ["rainfall", "water_condition", "disaster_impact", "measures"]
-        related_events = {}
         
-        # 分类别检索事件信息
-        for category in categories:
-            events = self.vector_store.search(query, category=category, k=k)
-            related_events[category] = events
+        # 分类别检索事件信息，查询向量只生成一次
+        related_events = self.vector_store.search_multi(query, categories=categories, k=k)
+        for category, events in related_events.items():
             logger.debug(f"检索到{category}类别事件{len(events)}条")
         
         # 检查是否检索到相关事件
@@ -301,7 +302,8 @@ class RAGGenerator:
                 logger.error(f"保存报告失败: {str(e)}")
                 # 失败时不应抛出异常，只是记录错误
 
-    def generate_report_from_all_contents(self, topic, issuing_unit=None, report_date=None, db_name="reports", limit_per_category=20):
+    def generate_report_from_all_contents(self, topic, issuing_unit=None, report_date=None, db_name="reports", limit_per_category=20,
+                                          index_id=None):
         """
         直接使用索引中的所有内容生成报告，不进行查询筛选
         
@@ -314,11 +316,12 @@ class RAGGenerator:
             report_date (str, optional): 报告发布日期，默认为None，将使用当前日期
             db_name (str, optional): 知识库ID或存储报告的目录名称，默认为"reports"
             limit_per_category (int, optional): 每个类别最多使用的事件数量，默认为20
+            index_id (str, optional): 使用的索引ID，默认为知识库的活跃索引
             
         Returns:
             str or None: 生成的报告文本，如果生成失败则返回None
         """
-        logger.info(f"开始从索引所有内容生成报告，主题：{topic}，使用知识库：{db_name}")
+        logger.info(f"开始从索引所有内容生成报告，主题：{topic}，使用知识库：{db_name}，索引：{index_id or '活跃索引'}")
         
         # 如果是知识库ID，则设置可视化输出到对应知识库目录
         if db_name.startswith("kb_"):
@@ -329,9 +332,12 @@ class RAGGenerator:
             kb_reports_dir = os.path.join(project_root, "data", "knowledge_bases", db_name, "reports")
             os.makedirs(kb_reports_dir, exist_ok=True)
             
-        # 初始化向量存储，使用指定的知识库ID
-        self.vector_store = VectorStore(db_name=db_name)
-        self.vector_store.load_index()
+        # 获取向量存储，使用指定的知识库ID和索引ID（通过注册表复用已加载的索引）
+        try:
+            self.vector_store = get_vector_store(db_name, index_id)
+        except FileNotFoundError as e:
+            logger.warning(f"知识库 {db_name} 尚未构建索引: {str(e)}")
+            return None
         
         # 直接获取索引中的所有内容
         if not hasattr(self.vector_store, 'events') or not self.vector_store.events:
@@ -657,8 +657,8 @@ class RAGGenerator:
         self.vector_store.load_index()
         # 定义检索的事件类别：降雨、水情、灾害影响、应对措施
         categories = ["rainfall", "water_condition", "disaster_impact", "measures"]
-        # 对每个类别执行检索，返回相关事件字典
-        related_events = {cat: self.vector_store.search(query, category=cat, k=k) for cat in categories}
+        # 一次性检索全部类别，返回相关事件字典
+        related_events = self.vector_store.search_multi(query, categories=categories, k=k)
         if not any(related_events.values()):
             logger.warning(f"未检索到与 '{query}' 相关的内容")
             return None
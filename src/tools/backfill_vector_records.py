@@ -0,0 +1,91 @@
+"""
+向量记录库回填工具
+
+由知识库已有的FAISS索引为原始文本文件生成向量记录，之后完整重建、更换索引类型或按文件子集创建索引时
+直接使用记录的向量，不再调用嵌入接口。
+只使用未量化（quantization为none）的索引：量化编码（fp16 / sq8 / pq）的向量无法还原为嵌入接口返回的原始向量。
+只回填文本内容与索引清单一致的文件，已有有效记录的文件默认跳过。
+
+用法:
+    python src/tools/backfill_vector_records.py --kb kb_20250401134516
+    python src/tools/backfill_vector_records.py --kb kb_20250401134516 --index-id index_20250410120000 --force
+"""
+
+import os
+import sys
+import argparse
+import itertools
+import faiss
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from src.knowledge_management.vector_store import VectorStore, get_vectors_dir
+from src.knowledge_management.vector_records import get_vector_records
+from src.knowledge_management.index_factory import unwrap_index
+
+
+def reconstruct(index, ids):
+    """按向量ID还原向量，IVF索引需要先建立直接映射"""
+    try:
+        return index.reconstruct_batch(ids)
+    except RuntimeError:
+        faiss.extract_index_ivf(unwrap_index(index)).make_direct_map()
+        return index.reconstruct_batch(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="由已有索引回填知识库的向量记录库")
+    parser.add_argument("--kb", required=True, help="知识库ID")
+    parser.add_argument("--index-id", help="使用的索引ID，默认为活跃索引")
+    parser.add_argument("--force", action="store_true", help="覆盖已有的有效记录")
+    args = parser.parse_args()
+
+    store = VectorStore(db_name=args.kb, index_id=args.index_id)
+    store.load_index(mmap=False)
+    if store.index is None or not store.event_texts:
+        print(f"知识库 {args.kb} 没有可用的索引")
+        return
+    if store.source_files is None:
+        print("索引没有原始文本清单，无法确定向量对应的文件")
+        return
+    if store.quantization != "none":
+        print(f"索引的向量编码为 {store.quantization}，无法还原原始向量")
+        return
+
+    records = get_vector_records(get_vectors_dir(args.kb), store.embedder.model_name,
+                                 getattr(store.embedder, "dimension", None))
+    if records is None:
+        print("向量记录库未启用（vector_store.vector_records.enabled）")
+        return
+
+    text_dir = os.path.join(project_root, "data", "knowledge_bases", args.kb, "raw_texts")
+    written = skipped = 0
+    for source, rows in itertools.groupby(range(len(store.event_texts)),
+                                          key=lambda i: store.event_metadata[i].get("source")):
+        rows = list(rows)
+        signature = store.source_files.get(source) if source else None
+        if signature is None:
+            continue
+        texts = [store.event_texts[i] for i in rows]
+        text_path = os.path.join(text_dir, source)
+        if not os.path.exists(text_path):
+            skipped += 1
+            continue
+        # 只回填内容与清单一致的文件（先比较大小和修改时间，变化时由记录库校验失败后重新嵌入）
+        st = os.stat(text_path)
+        if st.st_size != signature["size"] or st.st_mtime_ns != signature["mtime"]:
+            print(f"跳过: {source}，文件已修改")
+            skipped += 1
+            continue
+        if not args.force and records.get(source, signature["sha1"], texts) is not None:
+            skipped += 1
+            continue
+        records.put(source, signature["sha1"], texts, reconstruct(store.index, store.event_ids[rows]))
+        written += 1
+    print(f"完成，写入 {written} 个文件的向量记录，跳过 {skipped} 个")
+
+
+if __name__ == "__main__":
+    main()
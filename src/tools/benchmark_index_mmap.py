@@ -0,0 +1,118 @@
+"""
+多进程索引内存占用基准测试
+
+模拟多个API工作进程同时加载同一个FAISS索引并执行检索，比较普通加载（每个进程一份堆内存副本）
+与只读内存映射加载（共享操作系统页缓存）时的内存占用。
+- RSS: 单个进程的常驻内存，包含共享的文件页，内存映射时各进程的RSS会重复计算同一份数据
+- PSS: 按共享进程数分摊后的内存，所有进程的PSS之和接近实际占用的物理内存
+- USS: 进程独占的内存，即关闭该进程能释放的内存
+
+指标读取自 /proc/<pid>/smaps_rollup，只能在Linux上运行。
+默认使用合成向量构建索引；指定 --kb 时使用该知识库当前的索引文件。
+
+用法:
+    python src/tools/benchmark_index_mmap.py --workers 4 --size 200000 --dimension 1024
+    python src/tools/benchmark_index_mmap.py --kb kb_20250401134516 --workers 8
+"""
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+import multiprocessing
+import numpy as np
+import faiss
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from src.knowledge_management.index_factory import build_faiss_index, read_faiss_index
+from src.knowledge_management.vector_store import get_index_path
+
+
+def read_memory():
+    """读取当前进程的RSS、PSS和USS（MB）"""
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1]) / 1024
+    return values["Rss"], values["Pss"], values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+
+
+def worker(index_path, mmap, queries, k, barrier, results):
+    """工作进程：加载索引并检索，所有进程加载完成后同时读取内存占用"""
+    start = time.perf_counter()
+    index, mmapped = read_faiss_index(index_path, mmap)
+    load_seconds = time.perf_counter() - start
+    index.search(queries, k)
+    # 等待所有进程完成加载和检索，保证读取PSS时共享页已被全部进程映射
+    barrier.wait()
+    rss, pss, uss = read_memory()
+    results.put((rss, pss, uss, load_seconds, mmapped))
+    barrier.wait()
+
+
+def run(index_path, mmap, workers, queries, k):
+    """启动一组工作进程，返回每个进程的测量结果"""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(index_path, mmap, queries, k, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    measurements = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return measurements
+
+
+def main():
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("该基准测试需要Linux的 /proc/<pid>/smaps_rollup")
+        return
+
+    parser = argparse.ArgumentParser(description="多进程索引内存占用基准测试")
+    parser.add_argument("--kb", help="使用指定知识库的当前索引")
+    parser.add_argument("--size", type=int, default=200000, help="合成向量数量")
+    parser.add_argument("--dimension", type=int, default=1024, help="合成向量维度")
+    parser.add_argument("--index-type", default="flat", help="合成索引类型（flat / ivf_flat / ivf_pq / hnsw）")
+    parser.add_argument("--workers", type=int, default=4, help="工作进程数")
+    parser.add_argument("--queries", type=int, default=20, help="每个进程执行的查询数")
+    parser.add_argument("--k", type=int, default=10, help="每个查询返回的结果数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if args.kb:
+            index_path = get_index_path(args.kb)
+        else:
+            rng = np.random.default_rng(0)
+            vectors = rng.random((args.size, args.dimension), dtype=np.float32)
+            index, _ = build_faiss_index(vectors, args.index_type, ids=np.arange(args.size, dtype=np.int64))
+            index_path = os.path.join(temp_dir, "benchmark.faiss")
+            faiss.write_index(index, index_path)
+            del index, vectors
+
+        header_index, _ = read_faiss_index(index_path, mmap=True)
+        queries = np.random.default_rng(1).random((args.queries, header_index.d), dtype=np.float32)
+        print(f"索引文件 {os.path.getsize(index_path) / 1024 / 1024:.1f} MB，{header_index.ntotal} 个向量，"
+              f"{args.workers} 个工作进程")
+        del header_index
+
+        print(f"{'加载方式':>8} {'单进程RSS':>10} {'PSS合计':>9} {'USS合计':>9} {'加载(s)':>8}")
+        for mmap in (False, True):
+            measurements = run(index_path, mmap, args.workers, queries, args.k)
+            rss = np.mean([m[0] for m in measurements])
+            pss = sum(m[1] for m in measurements)
+            uss = sum(m[2] for m in measurements)
+            load_seconds = np.mean([m[3] for m in measurements])
+            label = "mmap" if all(m[4] for m in measurements) else ("heap" if not mmap else "mmap失败")
+            print(f"{label:>8} {rss:>9.1f}M {pss:>8.1f}M {uss:>8.1f}M {load_seconds:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
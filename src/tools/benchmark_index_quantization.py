@@ -0,0 +1,123 @@
+"""
+向量索引压缩基准测试
+
+比较不同索引类型与向量编码（float32 / float16 / SQ8）组合的召回率、查询延迟和内存占用，
+用于在创建索引时选择合适的 quantization 选项。
+- 召回率: 以精确检索（IndexFlatL2）的前k个结果为基准，计算 recall@k
+- 延迟:   逐条查询的中位数耗时（毫秒）
+- 内存:   序列化后的索引大小，与加载后常驻内存基本一致
+
+默认使用合成的聚类向量；指定 --kb 时使用该知识库当前索引中的真实向量
+（需要索引支持重建向量，例如flat索引）。
+
+用法:
+    python src/tools/benchmark_index_quantization.py --size 50000 --dimension 1024
+    python src/tools/benchmark_index_quantization.py --kb kb_20250401134516
+"""
+
+import os
+import sys
+import time
+import copy
+import argparse
+import numpy as np
+import faiss
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from src.knowledge_management.index_factory import build_faiss_index, get_index_settings, detect_quantization
+from src.knowledge_management.vector_store import get_index_path
+
+
+def synthetic_vectors(size, dimension, clusters=64, seed=0):
+    """生成归一化的聚类向量，分布上接近文本嵌入"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(clusters, size=size)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((size, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load_kb_vectors(kb_id):
+    """从知识库当前索引中重建全部向量"""
+    index = faiss.read_index(get_index_path(kb_id))
+    if index.ntotal == 0:
+        raise ValueError(f"知识库 {kb_id} 的索引为空")
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexIDMap2):
+        # 增量更新后的向量ID不一定连续，按ID映射表重建
+        return index.reconstruct_batch(faiss.vector_to_array(base.id_map))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def make_queries(vectors, count, seed=1):
+    """在已有向量上加入扰动作为查询，模拟与语料相近但不完全相同的查询"""
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.integers(len(vectors), size=count)]
+    queries = picked + 0.1 * rng.standard_normal(picked.shape).astype(np.float32)
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def recall_at_k(result_ids, truth_ids):
+    """计算 recall@k"""
+    k = truth_ids.shape[1]
+    hits = sum(len(set(found) & set(expected)) for found, expected in zip(result_ids, truth_ids))
+    return hits / (len(truth_ids) * k)
+
+
+def median_latency_ms(index, queries, k):
+    """逐条查询，返回中位数耗时（毫秒）"""
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query[None, :], k)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量索引压缩基准测试")
+    parser.add_argument("--kb", help="使用指定知识库索引中的向量，不指定则使用合成数据")
+    parser.add_argument("--size", type=int, default=20000, help="合成向量数量")
+    parser.add_argument("--dimension", type=int, default=1024, help="合成向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="查询数量")
+    parser.add_argument("--k", type=int, default=10, help="recall@k 中的k")
+    parser.add_argument("--index-types", nargs="+", default=["flat", "hnsw"],
+                        help="参与比较的索引类型（flat / ivf_flat / hnsw）")
+    parser.add_argument("--quantizations", nargs="+", default=["none", "fp16", "sq8"], help="参与比较的向量编码")
+    args = parser.parse_args()
+
+    vectors = load_kb_vectors(args.kb) if args.kb else synthetic_vectors(args.size, args.dimension)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = make_queries(vectors, args.queries)
+    k = min(args.k, len(vectors))
+    print(f"向量数 {len(vectors)}，维度 {vectors.shape[1]}，查询数 {len(queries)}，k={k}")
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    settings = get_index_settings()
+    baseline_bytes = None
+    print(f"{'索引类型':>10} {'编码':>6} {'recall@k':>9} {'延迟(ms)':>9} {'内存(MB)':>9} {'压缩比':>7} {'构建(s)':>8}")
+    for index_type in args.index_types:
+        for quantization in args.quantizations:
+            run_settings = copy.deepcopy(settings)
+            start = time.perf_counter()
+            index, actual_type = build_faiss_index(vectors, index_type, run_settings, quantization=quantization)
+            build_seconds = time.perf_counter() - start
+
+            _, found = index.search(queries, k)
+            recall = recall_at_k(found, truth)
+            latency = median_latency_ms(index, queries, k)
+            size_bytes = faiss.serialize_index(index).nbytes
+            if baseline_bytes is None:
+                baseline_bytes = size_bytes
+            print(f"{actual_type:>10} {detect_quantization(index):>6} {recall:>9.4f} {latency:>9.3f} "
+                  f"{size_bytes / 1024 / 1024:>9.1f} {baseline_bytes / size_bytes:>6.1f}x {build_seconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
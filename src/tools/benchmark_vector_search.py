@@ -0,0 +1,113 @@
+"""
+向量搜索性能基准测试
+
+使用合成数据比较 VectorStore.search 在不同语料规模下的延迟：
+- before: 旧实现，每个候选结果线性扫描 event_metadata 定位事件（O(k·N)）
+- after:  当前实现，通过向量ID查找表以O(1)定位事件
+
+查询向量由随机嵌入器生成，不调用任何嵌入接口，测得的是检索本身的耗时。
+
+用法:
+    python src/tools/benchmark_vector_search.py --sizes 1000 5000 20000 50000
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import faiss
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from src.knowledge_management.vector_store import VectorStore, EVENT_CATEGORIES
+from src.knowledge_management.lexical_index import TermMatrix, BM25Index
+
+
+class RandomEmbedder:
+    """生成固定维度随机向量的嵌入器，用于排除网络调用对基准测试的影响"""
+
+    def __init__(self, dimension, seed=0):
+        self.dimension = dimension
+        self.model_name = "random"
+        self.rng = np.random.default_rng(seed)
+
+    def embed_text(self, texts):
+        if not isinstance(texts, list):
+            texts = [texts]
+        return self.rng.random((len(texts), self.dimension), dtype=np.float32).tolist()
+
+
+def build_store(size, dimension, seed=0):
+    """构建包含 size 条合成事件的向量存储"""
+    rng = np.random.default_rng(seed)
+    store = VectorStore(db_name="benchmark", embedder=RandomEmbedder(dimension, seed))
+    for i in range(size):
+        category = EVENT_CATEGORIES[rng.integers(len(EVENT_CATEGORIES))]
+        event = {"time": "7月8日", "location": f"站点{i}", "description": f"{category} 测试事件 {i}"}
+        store._append_event(category, event, f"7月8日 站点{i} {category} 测试事件 {i}")
+    store._build_lookup()
+    store.term_matrix = TermMatrix.from_texts(store.event_texts)
+    store.bm25_index = BM25Index.from_term_matrix(store.term_matrix)
+    store.dimension = dimension
+    store.index = faiss.IndexFlatL2(dimension)
+    store.index.add(rng.random((size, dimension), dtype=np.float32))
+    return store
+
+
+def legacy_search(store, query, category=None, k=5, alpha=0.7):
+    """旧版搜索实现：每个候选结果都重建类别索引列表并线性查找位置"""
+    query_vector = np.array(store.embedder.embed_text([query]), dtype='float32')
+    distances, indices = store.index.search(query_vector, k * 2)
+    query_tokens = store._tokenize(query)
+    results = []
+    for j, i in enumerate(indices[0]):
+        if i != -1 and i < len(store.event_texts):
+            metadata = store.event_metadata[i]
+            if category is None or metadata["category"] == category:
+                event = store.events[metadata["category"]][
+                    [e["index"] for e in store.event_metadata if e["category"] == metadata["category"]].index(i)]
+                doc_tokens = store._tokenize(store.event_texts[i])
+                keyword_score = store._calculate_keyword_score(query_tokens, doc_tokens)
+                vector_score = 1.0 / (1.0 + float(distances[0][j]))
+                results.append({
+                    "category": metadata["category"],
+                    "event": event,
+                    "final_score": alpha * vector_score + (1 - alpha) * keyword_score
+                })
+    return sorted(results, key=lambda x: x["final_score"], reverse=True)[:k]
+
+
+def measure(func, repeats):
+    """返回多次调用的中位数耗时（毫秒）"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量搜索性能基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 50000], help="语料规模列表")
+    parser.add_argument("--dimension", type=int, default=256, help="向量维度")
+    parser.add_argument("--k", type=int, default=10, help="返回结果数量")
+    parser.add_argument("--repeats", type=int, default=20, help="每个规模的重复次数")
+    args = parser.parse_args()
+
+    query = "鄱阳湖 水位 上涨"
+    print(f"{'语料规模':>10} {'before(ms)':>12} {'after(ms)':>12} {'加速比':>8}")
+    for size in args.sizes:
+        store = build_store(size, args.dimension)
+        # 预热分词器
+        store.search(query, k=args.k)
+        before = measure(lambda: legacy_search(store, query, k=args.k), args.repeats)
+        after = measure(lambda: store.search(query, k=args.k), args.repeats)
+        print(f"{size:>10} {before:>12.2f} {after:>12.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+旧版pickle元数据转换工具
+
+将索引旁的 _metadata.pkl 一次性转换为列式元数据 _meta.bin。转换后加载索引时元数据以内存映射方式打开，
+不再需要反序列化全部事件和文本；未转换的索引仍可加载，会在下次保存时自动转换。
+默认转换 data/knowledge_bases/*/vectors 和旧版向量库目录下的全部索引，写入并校验新文件后删除pickle文件。
+
+用法:
+    python src/tools/convert_metadata_pkl.py
+    python src/tools/convert_metadata_pkl.py --kb kb_20250401134516 --keep-pkl
+    python src/tools/convert_metadata_pkl.py --dry-run
+"""
+
+import os
+import sys
+import glob
+import json
+import pickle
+import argparse
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from src.config import config
+from src.knowledge_management.event_columns import write_event_columns, read_event_columns, rows_from_pickle
+from src.knowledge_management.vector_store import EVENT_CATEGORIES, get_metadata_path
+
+
+def find_pickle_files(kb_ids=None):
+    """查找需要转换的pickle元数据文件"""
+    if kb_ids:
+        patterns = [os.path.join(project_root, "data", "knowledge_bases", kb_id, "vectors", "*_metadata.pkl")
+                    for kb_id in kb_ids]
+    else:
+        patterns = [os.path.join(project_root, "data", "knowledge_bases", "*", "vectors", "*_metadata.pkl"),
+                    os.path.join(project_root, config['vector_store']['path'], "*", "*_metadata.pkl")]
+    return sorted(path for pattern in patterns for path in glob.glob(pattern))
+
+
+def convert(pkl_path, keep_pkl=False):
+    """
+    转换单个pickle元数据文件
+
+    Args:
+        pkl_path (str): _metadata.pkl 文件路径
+        keep_pkl (bool): 转换后是否保留pickle文件
+
+    Returns:
+        int: 转换的事件数量
+    """
+    with open(pkl_path, "rb") as f:
+        data = pickle.load(f)
+    rows, event_ids, next_id = rows_from_pickle(data, EVENT_CATEGORIES)
+
+    meta_path = get_metadata_path(pkl_path.replace("_metadata.pkl", ".faiss"))
+    write_event_columns(meta_path, rows, event_ids, next_id, EVENT_CATEGORIES)
+
+    # 逐行校验写入的文本和事件与pickle一致后再删除pickle文件，事件按JSON表示比较（元组会保存为列表）
+    columns = read_event_columns(meta_path)
+    mismatch = next((i for i, (category, position, event, text, _) in enumerate(rows)
+                     if columns.texts[i] != text or columns.events[category][position]
+                     != json.loads(json.dumps(event, ensure_ascii=False, default=str))), None)
+    # 释放内存映射后才能在Windows下删除文件
+    del columns
+    if mismatch is not None:
+        os.remove(meta_path)
+        raise ValueError(f"第 {mismatch} 行转换后内容不一致")
+    if not keep_pkl:
+        os.remove(pkl_path)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将索引的pickle元数据转换为列式元数据")
+    parser.add_argument("--kb", nargs="+", help="只转换指定知识库的索引，默认转换全部")
+    parser.add_argument("--keep-pkl", action="store_true", help="转换后保留原pickle文件")
+    parser.add_argument("--dry-run", action="store_true", help="只列出需要转换的文件")
+    args = parser.parse_args()
+
+    pkl_files = find_pickle_files(args.kb)
+    if not pkl_files:
+        print("没有需要转换的pickle元数据文件")
+        return
+
+    failed = 0
+    for pkl_path in pkl_files:
+        name = os.path.relpath(pkl_path, project_root)
+        if args.dry_run:
+            print(f"待转换: {name} ({os.path.getsize(pkl_path) / 1024 / 1024:.1f} MB)")
+            continue
+        try:
+            count = convert(pkl_path, args.keep_pkl)
+            print(f"已转换: {name}，{count} 个事件")
+        except Exception as e:
+            failed += 1
+            print(f"转换失败: {name}: {str(e)}")
+    if not args.dry_run:
+        print(f"完成，成功 {len(pkl_files) - failed} 个，失败 {failed} 个")
+
+
+if __name__ == "__main__":
+    main()
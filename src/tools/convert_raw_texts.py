@@ -0,0 +1,105 @@
+"""
+原始文本JSON记录转换工具
+
+为 raw_texts 目录中没有JSON记录的旧文本文件生成同名的 .json 记录文件。文本文件保持不变，
+记录文件保存文本内容的哈希，因此转换不会改变原始文本清单，也不会触发索引的增量更新。
+转换后构建索引和获取知识库内容时直接读取记录，不再从文本中查找标记和解析字面量。
+默认转换 data/knowledge_bases/*/raw_texts 和旧版 data/raw/link_texts/* 下的全部文本文件，
+写入后校验记录展开的事件与解析文本得到的事件一致，不一致时删除记录。
+
+用法:
+    python src/tools/convert_raw_texts.py
+    python src/tools/convert_raw_texts.py --kb kb_20250401134516 --force
+    python src/tools/convert_raw_texts.py --dry-run
+"""
+
+import os
+import sys
+import glob
+import json
+import argparse
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from src.knowledge_management.raw_text_parser import (extract_events, get_record_path, load_record,
+                                                      parse_article_text, write_record)
+
+
+def find_text_files(kb_ids=None):
+    """查找需要转换的文本文件"""
+    if kb_ids:
+        patterns = [os.path.join(project_root, "data", "knowledge_bases", kb_id, "raw_texts", "*.txt")
+                    for kb_id in kb_ids]
+    else:
+        patterns = [os.path.join(project_root, "data", "knowledge_bases", "*", "raw_texts", "*.txt"),
+                    os.path.join(project_root, "data", "raw", "link_texts", "*", "*.txt")]
+    return sorted(path for pattern in patterns for path in glob.glob(pattern))
+
+
+def normalize(value):
+    """转换为JSON表示，用于比较"""
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+def convert(text_path, dry_run=False):
+    """
+    为单个文本文件生成JSON记录
+
+    Args:
+        text_path (str): 文本文件路径
+        dry_run (bool): 只检查不写入
+
+    Returns:
+        int: 记录中的事件数量
+
+    Raises:
+        ValueError: 如果文本中的结构化数据无法解析或写入的记录校验不一致
+    """
+    with open(text_path, "rb") as f:
+        text_bytes = f.read()
+    article, warnings = parse_article_text(text_bytes.decode("utf-8"))
+    if article["structured_data"] is None:
+        raise ValueError("; ".join(warnings))
+    records, _ = extract_events(article["structured_data"])
+    if dry_run:
+        return len(records)
+
+    write_record(text_path, article, text_bytes)
+    # 校验记录展开的事件与文本一致，事件按JSON表示比较（元组会保存为列表）
+    record, warnings = load_record(text_path, text_bytes)
+    if record is None or normalize(extract_events(record["structured_data"])[0]) != normalize(records):
+        os.remove(get_record_path(text_path))
+        raise ValueError("记录校验不一致" + (f": {'; '.join(warnings)}" if warnings else ""))
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为旧的原始文本文件生成JSON记录")
+    parser.add_argument("--kb", nargs="+", help="只转换指定知识库，默认转换全部")
+    parser.add_argument("--force", action="store_true", help="重新生成已有的记录文件")
+    parser.add_argument("--dry-run", action="store_true", help="只检查需要转换的文件，不写入")
+    args = parser.parse_args()
+
+    text_files = find_text_files(args.kb)
+    if not args.force:
+        text_files = [path for path in text_files if not os.path.exists(get_record_path(path))]
+    if not text_files:
+        print("没有需要转换的文本文件")
+        return
+
+    failed = 0
+    for text_path in text_files:
+        name = os.path.relpath(text_path, project_root)
+        try:
+            count = convert(text_path, args.dry_run)
+            print(f"{'待转换' if args.dry_run else '已转换'}: {name}，{count} 个事件")
+        except Exception as e:
+            failed += 1
+            print(f"转换失败: {name}: {str(e)}")
+    print(f"完成，{'可转换' if args.dry_run else '成功'} {len(text_files) - failed} 个，失败 {failed} 个")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,7 +17,8 @@ from pathlib import Path
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(project_root)
 
-from src.knowledge_management.vector_store import VectorStore
+from src.knowledge_management.vector_store import VectorStore, get_active_index_id
+from src.knowledge_management.index_factory import supports_ids
 
 def load_vector_store(kb_id: str) -> VectorStore:
     """
@@ -35,7 +36,12 @@ def get_vector_data(vector_store: VectorStore) -> tuple:
     index = vector_store.index
     
     # 检查索引类型并适当地提取向量
-    if isinstance(index, faiss.IndexFlatL2):
+    if supports_ids(index):
+        # 以稳定ID保存向量的索引按事件行号对应的向量ID重建，保证向量与元数据一一对应
+        if index.ntotal == 0:
+            raise ValueError("索引为空，没有向量数据")
+        vectors = index.reconstruct_batch(vector_store.event_ids)
+    elif isinstance(index, faiss.IndexFlatL2):
         # 检查索引是否为空
         if index.ntotal == 0:
             raise ValueError("索引为空，没有向量数据")
@@ -184,8 +190,7 @@ def list_knowledge_bases():
                 with open(info_file, 'r', encoding='utf-8') as f:
                     info = json.load(f)
                     # 获取向量索引文件
-                    vector_index = os.path.join(kb_path, "vectors", f"vector_index_{kb_id}.faiss")
-                    has_vectors = os.path.exists(vector_index)
+                    has_vectors = get_active_index_id(kb_id) is not None
                     
                     available_kbs.append({
                         "id": kb_id,
@@ -1,5 +1,6 @@
 from src.ui.api.models.base import (
     QueryInput, 
+    BatchQueryInput,
     Message, 
     ChatInput, 
     ChatHistoryEntry, 
@@ -24,6 +25,7 @@ __all__ = [
     "PasswordUpdate",
     "TokenResponse",
     "QueryInput",
+    "BatchQueryInput",
     "Message",
     "ChatInput",
     "ChatHistoryEntry",
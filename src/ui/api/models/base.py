@@ -7,6 +7,8 @@ class QueryInput(BaseModel):
     k: int = 5
     category: Optional[str] = None
     alpha: Optional[float] = 0.7  # 向量相似度权重
+    nprobe: Optional[int] = None  # IVF索引检索的聚类数，为空则使用配置值
+    ef_search: Optional[int] = None  # HNSW索引检索候选队列长度，为空则使用配置值
     issuing_unit: Optional[str] = None  # 添加发布单位字段
     report_date: Optional[str] = None   # 添加报告日期字段
     save_history: Optional[bool] = False # 是否保存到历史记录
@@ -44,6 +46,48 @@ class QueryInput(BaseModel):
             raise ValueError("alpha必须在0到1之间")
         return alpha
 
+    @validator('nprobe', 'ef_search')
+    def validate_search_tuning(cls, value):
+        if value is not None and value <= 0:
+            raise ValueError("nprobe和ef_search必须大于0")
+        return value
+
+
+class BatchQueryInput(BaseModel):
+    """批量搜索输入模型"""
+    queries: List[str]
+    k: int = 5
+    category: Optional[str] = None
+    alpha: Optional[float] = 0.7  # 向量相似度权重
+    nprobe: Optional[int] = None  # IVF索引检索的聚类数，为空则使用配置值
+    ef_search: Optional[int] = None  # HNSW索引检索候选队列长度，为空则使用配置值
+
+    @validator('queries')
+    def validate_queries(cls, queries):
+        if not queries:
+            raise ValueError("queries不能为空")
+        if len(queries) > 1000:
+            raise ValueError("单次批量搜索最多1000个查询")
+        return queries
+
+    @validator('k')
+    def validate_k(cls, k):
+        if k <= 0:
+            raise ValueError("k必须大于0")
+        return k
+
+    @validator('alpha')
+    def validate_alpha(cls, alpha):
+        if alpha is not None and (alpha < 0 or alpha > 1):
+            raise ValueError("alpha必须在0到1之间")
+        return alpha
+
+    @validator('nprobe', 'ef_search')
+    def validate_search_tuning(cls, value):
+        if value is not None and value <= 0:
+            raise ValueError("nprobe和ef_search必须大于0")
+        return value
+
 
 class Message(BaseModel):
     role: str  # "user" 或 "assistant"
@@ -83,6 +127,10 @@ class BuildIndexInput(BaseModel):
     """构建索引输入模型"""
     kb_id: str
     index_id: Optional[str] = None
+    # 默认只处理新增、修改或删除的原始文本文件；为True时重新解析并嵌入全部文件
+    full_rebuild: Optional[bool] = False
+    # 以指定的向量维度完整重建索引（如512、256），为空则沿用当前索引的维度
+    dimension: Optional[int] = None
 
 
 class ReportInput(BaseModel):
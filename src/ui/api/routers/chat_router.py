@@ -1,12 +1,13 @@
 from fastapi import APIRouter, HTTPException
 import os
+import asyncio
 import json
 import uuid
 from loguru import logger
 from datetime import datetime
 from fastapi import Depends
 
-from src.knowledge_management.vector_store import VectorStore
+from src.knowledge_management.vector_store_registry import get_vector_store
 from src.model_interaction.llm_client import LLMClient
 from src.report_generation.rag_generator import RAGGenerator
 from src.ui.api.models import ChatInput, ChatHistoryEntry
@@ -114,12 +115,9 @@ async def chat_with_kb(
                     "is_report": False
                 }
         
-        # 常规聊天回答
-        vector_store = VectorStore(db_name=kb_id)
-        
-        # 加载索引
+        # 常规聊天回答，从进程内注册表获取已加载的索引
         try:
-            vector_store.load_index()
+            vector_store = get_vector_store(kb_id)
             if not vector_store.index:
                 raise ValueError("索引加载失败")
         except Exception as e:
@@ -127,7 +125,9 @@ async def chat_with_kb(
             raise HTTPException(status_code=500, detail=f"加载索引失败，请先构建索引: {str(e)}")
         
         # 搜索相关内容
-        results = vector_store.search(chat_input.query, k=chat_input.k)
+        # 在线程池中执行搜索，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(None, lambda: vector_store.search(chat_input.query, k=chat_input.k))
         
         # 如果找不到相关内容，仍然进行回答但提供提示
         context_text = ""
@@ -2,15 +2,19 @@ from fastapi import APIRouter, HTTPException, Body, Depends
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 import os
-import glob
-import shutil
 import pickle
-import faiss
 from datetime import datetime
 import json
 from loguru import logger
 from src.ui.api.utils import kb_manager
-from src.knowledge_management.vector_store import VectorStore
+from src.knowledge_management.vector_store import (VectorStore, delete_index_files, find_metadata_path,
+                                                   get_active_index_id, get_index_path, get_info_path,
+                                                   get_metadata_path, list_index_paths, read_index_info,
+                                                   set_active_index, write_json_atomic)
+from src.knowledge_management.index_build_coordinator import index_build_coordinator
+from src.knowledge_management.event_columns import read_event_count
+from src.knowledge_management.index_factory import (detect_index_type, detect_quantization, read_faiss_index,
+                                                    resolve_index_type, resolve_quantization)
 import asyncio
 
 router = APIRouter()
@@ -25,6 +29,11 @@ class IndexInfo(BaseModel):
     vector_count: int = 0
     file_size: int = 0
     text_files: List[str] = []
+    dimension: Optional[int] = None
+    embedding_model: Optional[str] = None
+    index_type: Optional[str] = None
+    quantization: Optional[str] = None
+    is_active: bool = False
 
 class CreateIndexInput(BaseModel):
     """创建索引的输入参数"""
@@ -32,6 +41,9 @@ class CreateIndexInput(BaseModel):
     name: str
     description: Optional[str] = None
     text_files: List[str] = []  # 用于构建索引的文本文件列表，为空则使用全部文件
+    index_type: Optional[str] = None  # 索引类型：flat / ivf_flat / ivf_pq / hnsw / auto，为空则使用配置文件中的设置
+    quantization: Optional[str] = None  # 向量编码：none / fp16 / sq8，为空则使用配置文件中的设置
+    dimension: Optional[int] = None  # 向量维度（如512、256），为空则沿用当前索引的维度
 
 class UpdateIndexInput(BaseModel):
     """更新索引信息的输入参数"""
@@ -47,49 +59,49 @@ async def list_indices(kb_id: str):
         if not kb_info:
             raise HTTPException(status_code=404, detail="知识库不存在")
             
-        kb_path = kb_manager.get_kb_path(kb_id)
-        vectors_dir = os.path.join(kb_path, "vectors")
-        
-        if not os.path.exists(vectors_dir):
-            logger.info(f"知识库 {kb_id} 的vectors目录不存在")
-            os.makedirs(vectors_dir, exist_ok=True)
-            return {"status": "success", "data": []}
-        
-        # 获取所有索引文件
-        index_files = glob.glob(os.path.join(vectors_dir, "*.faiss"))
-        if not index_files:
+        # 获取所有索引的当前版本
+        index_paths = list_index_paths(kb_id)
+        if not index_paths:
             logger.info(f"知识库 {kb_id} 没有索引文件")
             return {"status": "success", "data": []}
             
+        active_index_id = get_active_index_id(kb_id)
         indices = []
-        for index_file in index_files:
+        for index_id, index_file in index_paths.items():
             try:
-                # 提取索引文件名
                 filename = os.path.basename(index_file)
-                index_id = os.path.splitext(filename)[0]
                 
                 # 获取元数据文件
-                metadata_file = index_file.replace(".faiss", "_metadata.pkl")
-                info_file = index_file.replace(".faiss", "_info.json")
+                metadata_file = find_metadata_path(index_file)
+                info_file = get_info_path(index_file)
                 
                 vector_count = 0
                 file_size = os.path.getsize(index_file)
                 text_files = []
+                dimension = None
+                embedding_model = None
+                index_type = None
+                quantization = None
                 
-                # 尝试加载FAISS索引获取向量数量
+                # 尝试加载FAISS索引获取向量数量，以内存映射方式加载，不读入全部向量
                 try:
-                    index = faiss.read_index(index_file)
+                    index, _ = read_faiss_index(index_file, mmap=True)
                     vector_count = index.ntotal
+                    index_type = detect_index_type(index)
+                    quantization = detect_quantization(index)
                 except Exception as e:
                     logger.warning(f"无法加载索引文件 {filename}: {str(e)}")
                 
-                # 尝试加载元数据获取文本文件列表
-                if os.path.exists(metadata_file):
+                # 尝试读取元数据中的事件数量，列式元数据只需读取文件头部
+                if metadata_file is not None:
                     try:
-                        with open(metadata_file, 'rb') as f:
-                            metadata = pickle.load(f)
-                            if "event_texts" in metadata:
-                                vector_count = len(metadata["event_texts"])
+                        if metadata_file == get_metadata_path(index_file):
+                            vector_count = read_event_count(metadata_file)
+                        else:
+                            with open(metadata_file, 'rb') as f:
+                                metadata = pickle.load(f)
+                                if "event_texts" in metadata:
+                                    vector_count = len(metadata["event_texts"])
                     except Exception as e:
                         logger.warning(f"无法加载元数据文件 {os.path.basename(metadata_file)}: {str(e)}")
                 
@@ -108,6 +120,10 @@ async def list_indices(kb_id: str):
                             created_at = info.get("created_at", created_at)
                             updated_at = info.get("updated_at", updated_at)
                             text_files = info.get("text_files", [])
+                            dimension = info.get("dimension")
+                            embedding_model = info.get("embedding_model")
+                            index_type = info.get("index_type", index_type)
+                            quantization = info.get("quantization", quantization)
                     except Exception as e:
                         logger.warning(f"无法加载索引信息文件 {os.path.basename(info_file)}: {str(e)}")
                 
@@ -119,7 +135,12 @@ async def list_indices(kb_id: str):
                     "updated_at": updated_at,
                     "vector_count": vector_count,
                     "file_size": file_size,
-                    "text_files": text_files
+                    "text_files": text_files,
+                    "dimension": dimension,
+                    "embedding_model": embedding_model,
+                    "index_type": index_type,
+                    "quantization": quantization,
+                    "is_active": index_id == active_index_id
                 })
             except Exception as e:
                 logger.error(f"获取索引信息失败 {os.path.basename(index_file)}: {str(e)}")
@@ -210,12 +231,20 @@ async def create_index(kb_id: str, input: CreateIndexInput):
         if not input.name or len(input.name) < 2:
             raise HTTPException(status_code=400, detail="索引名称至少需要2个字符")
         
-        # 生成索引ID
-        now = datetime.now()
-        index_id = f"index_{now.strftime('%Y%m%d%H%M%S')}"
-        
-        # 创建向量存储实例
-        vector_store = VectorStore(db_name=kb_id)
+        # 验证索引类型和向量编码
+        try:
+            if input.index_type:
+                resolve_index_type(input.index_type, 0)
+            if input.quantization:
+                resolve_quantization(input.quantization)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # 创建向量存储实例，指定维度时按该维度生成向量
+        try:
+            vector_store = VectorStore(db_name=kb_id, dimension=input.dimension)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         # 确定源文本文件
         kb_path = kb_manager.get_kb_path(kb_id)
@@ -224,94 +253,87 @@ async def create_index(kb_id: str, input: CreateIndexInput):
         if not os.path.exists(raw_texts_dir):
             raise HTTPException(status_code=404, detail="文本目录不存在")
         
-        if input.text_files:
-            # 验证指定的文本文件是否都存在
-            for filename in input.text_files:
-                if not os.path.exists(os.path.join(raw_texts_dir, filename)):
-                    raise HTTPException(status_code=404, detail=f"文本文件 {filename} 不存在")
-            
-            # 创建临时目录存放选定的文件
-            temp_dir = os.path.join(kb_path, "temp_build")
-            os.makedirs(temp_dir, exist_ok=True)
-            
-            # 复制选定的文件到临时目录
-            for filename in input.text_files:
-                shutil.copy2(
-                    os.path.join(raw_texts_dir, filename),
-                    os.path.join(temp_dir, filename)
-                )
-            
-            # 从临时目录加载文本
-            logger.info(f"从临时目录加载选定的 {len(input.text_files)} 个文本文件")
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, lambda: vector_store.load_texts(directory=temp_dir))
-            
-            # 处理完成后删除临时目录
-            shutil.rmtree(temp_dir, ignore_errors=True)
-        else:
-            # 加载所有文本
-            logger.info("加载所有文本文件")
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, vector_store.load_texts)
-        
-        if not vector_store.event_texts:
-            raise HTTPException(status_code=400, detail="未加载到任何文本，无法构建索引")
-        
-        # 构建索引
-        logger.info("构建索引")
-        await loop.run_in_executor(None, vector_store.build_index)
-        
-        # 自定义保存路径
-        vectors_dir = os.path.join(kb_path, "vectors")
-        os.makedirs(vectors_dir, exist_ok=True)
-        
-        # 索引文件路径
-        index_path = os.path.join(vectors_dir, f"{index_id}.faiss")
-        metadata_path = os.path.join(vectors_dir, f"{index_id}_metadata.pkl")
-        info_path = os.path.join(vectors_dir, f"{index_id}_info.json")
-        
-        # 保存FAISS索引
-        faiss.write_index(vector_store.index, index_path)
-        
-        # 保存元数据
-        with open(metadata_path, 'wb') as f:
-            pickle.dump({
-                "events": vector_store.events,
-                "event_texts": vector_store.event_texts,
-                "event_metadata": vector_store.event_metadata
-            }, f)
-        
-        # 保存索引信息
-        with open(info_path, 'w', encoding='utf-8') as f:
-            json.dump({
-                "name": input.name,
-                "description": input.description or "",
-                "created_at": now.isoformat(),
-                "updated_at": now.isoformat(),
-                "text_files": input.text_files,
-                "vector_count": len(vector_store.event_texts)
-            }, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"索引 {index_id} 创建成功，包含 {len(vector_store.event_texts)} 个向量")
-        
-        return {
-            "status": "success",
-            "data": {
-                "id": index_id,
-                "name": input.name,
-                "description": input.description,
-                "created_at": now.isoformat(),
-                "vector_count": len(vector_store.event_texts),
-                "file_size": os.path.getsize(index_path),
-                "text_files": input.text_files
-            }
-        }
+        # 验证指定的文本文件是否都存在
+        for filename in input.text_files:
+            if not os.path.exists(os.path.join(raw_texts_dir, filename)):
+                raise HTTPException(status_code=404, detail=f"文本文件 {filename} 不存在")
+        
+        # 排队中的相同参数创建请求（例如重复提交）合并为一次执行，与同一知识库的其他构建任务串行执行
+        key = ("create-index", input.name, input.description, tuple(input.text_files),
+               input.index_type, input.quantization, input.dimension)
+        future, joined = index_build_coordinator.submit(
+            kb_id, lambda: _create_index(kb_id, vector_store, raw_texts_dir, input), key=key)
+        if joined:
+            logger.info(f"知识库 {kb_id} 已有相同的索引创建任务在排队，等待其完成")
+        return await asyncio.wrap_future(future)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"创建索引失败: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"创建索引失败: {str(e)}")
 
+
+def _create_index(kb_id, vector_store, raw_texts_dir, input):
+    """
+    加载文本、构建并保存新索引，在构建线程中执行
+
+    只解析选定的文本文件，解析、向量生成和索引插入以流水线方式并发执行。
+    向量由知识库的向量记录库组装，记录库中没有的文件才调用嵌入接口。
+    同一知识库的创建任务串行执行，在此生成索引ID可以保证ID不与已有索引重复。
+
+    Returns:
+        dict: 接口返回内容
+
+    Raises:
+        HTTPException: 如果没有加载到任何文本
+    """
+    if input.text_files:
+        logger.info(f"加载选定的 {len(input.text_files)} 个文本文件并构建索引")
+    else:
+        # 加载所有文本
+        logger.info("加载所有文本文件并构建索引")
+    reused = vector_store.build_from_texts(directory=raw_texts_dir, filenames=input.text_files or None,
+                                           index_type=input.index_type, quantization=input.quantization)
+    
+    if not vector_store.event_texts:
+        raise HTTPException(status_code=400, detail="未加载到任何文本，无法构建索引")
+    
+    logger.info(f"由向量记录库组装 {reused} 个向量，新生成 {len(vector_store.event_texts) - reused} 个")
+    
+    # 生成索引ID
+    now = datetime.now()
+    index_id = f"index_{now.strftime('%Y%m%d%H%M%S')}"
+    suffix = 1
+    while os.path.exists(get_index_path(kb_id, index_id)):
+        suffix += 1
+        index_id = f"index_{now.strftime('%Y%m%d%H%M%S')}_{suffix}"
+    
+    # 保存FAISS索引、元数据和索引信息（包含向量维度和嵌入模型），写入暂存目录后整体发布
+    vector_store.save_index(index_id=index_id, info={
+        "name": input.name,
+        "description": input.description or "",
+        "created_at": now.isoformat(),
+        "updated_at": now.isoformat(),
+        "text_files": input.text_files
+    })
+    
+    logger.info(f"索引 {index_id} 创建成功，包含 {len(vector_store.event_texts)} 个向量")
+    
+    return {
+        "status": "success",
+        "data": {
+            "id": index_id,
+            "name": input.name,
+            "description": input.description,
+            "created_at": now.isoformat(),
+            "vector_count": len(vector_store.event_texts),
+            "file_size": os.path.getsize(vector_store.index_path),
+            "text_files": input.text_files,
+            "index_type": vector_store.index_type,
+            "quantization": vector_store.quantization
+        }
+    }
+
 @router.put("/{kb_id}/indices/{index_id}")
 async def update_index(kb_id: str, index_id: str, input: UpdateIndexInput):
     """更新索引信息"""
@@ -321,12 +343,9 @@ async def update_index(kb_id: str, index_id: str, input: UpdateIndexInput):
         if not kb_info:
             raise HTTPException(status_code=404, detail="知识库不存在")
         
-        kb_path = kb_manager.get_kb_path(kb_id)
-        vectors_dir = os.path.join(kb_path, "vectors")
-        
         # 检查索引文件是否存在
-        index_path = os.path.join(vectors_dir, f"{index_id}.faiss")
-        info_path = os.path.join(vectors_dir, f"{index_id}_info.json")
+        index_path = get_index_path(kb_id, index_id)
+        info_path = get_info_path(index_path)
         
         if not os.path.exists(index_path):
             raise HTTPException(status_code=404, detail="索引文件不存在")
@@ -348,9 +367,8 @@ async def update_index(kb_id: str, index_id: str, input: UpdateIndexInput):
         
         info["updated_at"] = datetime.now().isoformat()
         
-        # 保存更新后的信息
-        with open(info_path, 'w', encoding='utf-8') as f:
-            json.dump(info, f, ensure_ascii=False, indent=2)
+        # 原子地保存更新后的信息
+        write_json_atomic(info_path, info)
         
         return {
             "status": "success",
@@ -371,52 +389,21 @@ async def delete_index(kb_id: str, index_id: str):
         if not kb_info:
             raise HTTPException(status_code=404, detail="知识库不存在")
             
-        kb_path = kb_manager.get_kb_path(kb_id)
-        vectors_dir = os.path.join(kb_path, "vectors")
-        
-        # 构建索引文件路径
-        index_file = os.path.join(vectors_dir, f"{index_id}.faiss")
-        metadata_file = os.path.join(vectors_dir, f"{index_id}_metadata.pkl")
-        info_file = os.path.join(vectors_dir, f"{index_id}_info.json")
-        
         # 检查文件是否存在
-        if not os.path.exists(index_file):
+        if not os.path.exists(get_index_path(kb_id, index_id)):
             raise HTTPException(status_code=404, detail=f"索引文件 {index_id} 不存在")
         
         # 检查是否为当前活跃索引
-        active_index_id = f"vector_index_{kb_id}"
-        if index_id == active_index_id:
+        if index_id == get_active_index_id(kb_id):
             raise HTTPException(status_code=400, detail="不能删除当前活跃索引，请先激活其他索引")
         
-        # 删除文件
-        files_deleted = 0
-        
-        if os.path.exists(index_file):
-            try:
-                os.remove(index_file)
-                files_deleted += 1
-                logger.info(f"已删除索引文件: {index_file}")
-            except Exception as e:
-                logger.error(f"删除索引文件失败: {str(e)}")
-                raise HTTPException(status_code=500, detail=f"删除索引文件失败: {str(e)}")
-        
-        if os.path.exists(metadata_file):
-            try:
-                os.remove(metadata_file)
-                files_deleted += 1
-                logger.info(f"已删除元数据文件: {metadata_file}")
-            except Exception as e:
-                logger.error(f"删除元数据文件失败: {str(e)}")
-                # 继续执行，不中断流程
-        
-        if os.path.exists(info_file):
-            try:
-                os.remove(info_file)
-                files_deleted += 1
-                logger.info(f"已删除信息文件: {info_file}")
-            except Exception as e:
-                logger.error(f"删除信息文件失败: {str(e)}")
-                # 继续执行，不中断流程
+        # 删除索引的全部版本及元数据、词频矩阵、索引信息等附属文件
+        try:
+            files_deleted = delete_index_files(kb_id, index_id)
+            logger.info(f"已删除索引 {index_id} 的 {files_deleted} 个文件")
+        except Exception as e:
+            logger.error(f"删除索引文件失败: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"删除索引文件失败: {str(e)}")
                 
         return {
             "status": "success", 
@@ -437,107 +424,27 @@ async def activate_index(kb_id: str, index_id: str):
         if not kb_info:
             raise HTTPException(status_code=404, detail="知识库不存在")
             
-        kb_path = kb_manager.get_kb_path(kb_id)
-        vectors_dir = os.path.join(kb_path, "vectors")
-        
         # 检查源索引文件是否存在
-        source_index_file = os.path.join(vectors_dir, f"{index_id}.faiss")
-        source_metadata_file = os.path.join(vectors_dir, f"{index_id}_metadata.pkl")
-        source_info_file = os.path.join(vectors_dir, f"{index_id}_info.json")
+        source_index_file = get_index_path(kb_id, index_id)
         
         if not os.path.exists(source_index_file):
             raise HTTPException(status_code=404, detail=f"索引文件 {index_id} 不存在")
         
-        if not os.path.exists(source_metadata_file):
+        if find_metadata_path(source_index_file) is None:
             raise HTTPException(status_code=404, detail=f"索引的元数据文件不存在")
             
-        # 目标文件路径（系统使用的索引命名格式）
-        target_index_id = f"vector_index_{kb_id}"
-        target_index_file = os.path.join(vectors_dir, f"{target_index_id}.faiss")
-        target_metadata_file = os.path.join(vectors_dir, f"{target_index_id}_metadata.pkl")
-        target_info_file = os.path.join(vectors_dir, f"{target_index_id}_info.json")
-        
         # 如果已经是当前活跃索引，则无需操作
-        if os.path.exists(target_index_file) and os.path.samefile(source_index_file, target_index_file):
+        if get_active_index_id(kb_id) == index_id:
             return {"status": "success", "message": "该索引已经是活跃索引"}
             
-        # 备份当前活跃索引文件（如果存在）
-        current_files = []
-        if os.path.exists(target_index_file):
-            try:
-                backup_timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-                backup_index_file = os.path.join(vectors_dir, f"backup_{backup_timestamp}.faiss")
-                shutil.copy2(target_index_file, backup_index_file)
-                current_files.append(backup_index_file)
-                
-                if os.path.exists(target_metadata_file):
-                    backup_metadata_file = os.path.join(vectors_dir, f"backup_{backup_timestamp}_metadata.pkl")
-                    shutil.copy2(target_metadata_file, backup_metadata_file)
-                    current_files.append(backup_metadata_file)
-                    
-                if os.path.exists(target_info_file):
-                    backup_info_file = os.path.join(vectors_dir, f"backup_{backup_timestamp}_info.json")
-                    shutil.copy2(target_info_file, backup_info_file)
-                    current_files.append(backup_info_file)
-                    
-                logger.info(f"已备份当前活跃索引文件，共 {len(current_files)} 个文件")
-            except Exception as e:
-                logger.warning(f"备份当前活跃索引文件失败: {str(e)}")
-                # 继续执行，不影响主流程
-            
-        # 复制新索引文件到系统位置
+        # 原子地更新活跃索引指针，不复制索引文件，下一次搜索即使用新索引
         try:
-            # 先删除旧的目标文件
-            for file_path in [target_index_file, target_metadata_file, target_info_file]:
-                if os.path.exists(file_path) and not os.path.samefile(file_path, source_index_file):
-                    os.remove(file_path)
-                    
-            # 复制新文件（使用硬链接可以节省磁盘空间）
-            try:
-                os.link(source_index_file, target_index_file)
-            except OSError:
-                # 如果硬链接失败，则直接复制
-                shutil.copy2(source_index_file, target_index_file)
-                
-            if os.path.exists(source_metadata_file):
-                try:
-                    os.link(source_metadata_file, target_metadata_file)
-                except OSError:
-                    shutil.copy2(source_metadata_file, target_metadata_file)
-            
-            if os.path.exists(source_info_file):
-                try:
-                    os.link(source_info_file, target_info_file)
-                except OSError:
-                    shutil.copy2(source_info_file, target_info_file)
-                
+            set_active_index(kb_id, index_id)
             logger.info(f"已激活索引 {index_id}")
         except Exception as e:
             logger.error(f"激活索引失败: {str(e)}")
             raise HTTPException(status_code=500, detail=f"激活索引失败: {str(e)}")
         
-        # 更新索引信息文件，标记为活跃索引
-        if os.path.exists(source_info_file):
-            try:
-                # 读取源信息文件
-                with open(source_info_file, 'r', encoding='utf-8') as f:
-                    info = json.load(f)
-                
-                # 更新激活时间
-                info["activated_at"] = datetime.now().isoformat()
-                info["is_active"] = True
-                # 保存原始索引ID，以便前端能识别哪个是活跃索引
-                info["id"] = index_id
-                
-                # 保存到目标信息文件
-                with open(target_info_file, 'w', encoding='utf-8') as f:
-                    json.dump(info, f, ensure_ascii=False, indent=2)
-                    
-                logger.info("已更新索引信息文件")
-            except Exception as e:
-                logger.warning(f"更新索引信息文件失败: {str(e)}")
-                # 不影响主流程
-        
         return {"status": "success", "message": "索引已激活，将用于向量搜索"}
     except HTTPException:
         raise
@@ -553,50 +460,14 @@ async def deactivate_index(kb_id: str, index_id: str):
         kb_info = kb_manager.get(kb_id)
         if not kb_info:
             raise HTTPException(status_code=404, detail="知识库不存在")
-            
-        kb_path = kb_manager.get_kb_path(kb_id)
-        vectors_dir = os.path.join(kb_path, "vectors")
         
-        # 目标文件路径（系统使用的索引命名格式）
-        target_index_id = f"vector_index_{kb_id}"
-        target_index_file = os.path.join(vectors_dir, f"{target_index_id}.faiss")
-        target_metadata_file = os.path.join(vectors_dir, f"{target_index_id}_metadata.pkl")
-        target_info_file = os.path.join(vectors_dir, f"{target_index_id}_info.json")
-        
-        # 检查是否为当前活跃索引
-        if not os.path.exists(target_index_file):
+        # 检查是否有活跃索引
+        if get_active_index_id(kb_id) is None:
             return {"status": "success", "message": "当前没有活跃索引"}
         
-        # 备份当前活跃索引
-        backup_timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        backup_files = []
-        
+        # 清空活跃索引指针，索引文件保留，之后可以重新激活
         try:
-            backup_index_file = os.path.join(vectors_dir, f"backup_{backup_timestamp}.faiss")
-            shutil.copy2(target_index_file, backup_index_file)
-            backup_files.append(backup_index_file)
-            
-            if os.path.exists(target_metadata_file):
-                backup_metadata_file = os.path.join(vectors_dir, f"backup_{backup_timestamp}_metadata.pkl")
-                shutil.copy2(target_metadata_file, backup_metadata_file)
-                backup_files.append(backup_metadata_file)
-                
-            if os.path.exists(target_info_file):
-                backup_info_file = os.path.join(vectors_dir, f"backup_{backup_timestamp}_info.json")
-                shutil.copy2(target_info_file, backup_info_file)
-                backup_files.append(backup_info_file)
-                
-            logger.info(f"已备份当前活跃索引文件，共 {len(backup_files)} 个文件")
-        except Exception as e:
-            logger.warning(f"备份当前活跃索引文件失败: {str(e)}")
-        
-        # 删除当前活跃索引文件
-        try:
-            for file_path in [target_index_file, target_metadata_file, target_info_file]:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    logger.info(f"已删除活跃索引文件: {file_path}")
-            
+            set_active_index(kb_id, None)
             return {"status": "success", "message": "索引已禁用"}
         except Exception as e:
             logger.error(f"禁用索引失败: {str(e)}")
@@ -616,37 +487,26 @@ async def get_active_index_info(kb_id: str):
         if not kb_info:
             raise HTTPException(status_code=404, detail="知识库不存在")
             
-        kb_path = kb_manager.get_kb_path(kb_id)
-        vectors_dir = os.path.join(kb_path, "vectors")
-        
-        # 目标文件路径（系统使用的索引命名格式）
-        target_index_id = f"vector_index_{kb_id}"
-        target_index_file = os.path.join(vectors_dir, f"{target_index_id}.faiss")
-        target_info_file = os.path.join(vectors_dir, f"{target_index_id}_info.json")
+        # 由活跃索引指针确定当前使用的索引
+        active_index_id = get_active_index_id(kb_id)
         
         # 检查是否有活跃索引
-        if not os.path.exists(target_index_file):
+        if active_index_id is None:
+            return {"status": "success", "data": None, "message": "当前没有活跃索引"}
+        active_index_file = get_index_path(kb_id, active_index_id)
+        if not os.path.exists(active_index_file):
             return {"status": "success", "data": None, "message": "当前没有活跃索引"}
         
-        # 尝试从信息文件中获取原始索引ID
-        original_index_id = None
-        original_index_info = {}
-        
-        if os.path.exists(target_info_file):
-            try:
-                with open(target_info_file, 'r', encoding='utf-8') as f:
-                    info = json.load(f)
-                    original_index_id = info.get("id")  # 原始索引ID
-                    original_index_info = info
-            except Exception as e:
-                logger.warning(f"读取活跃索引信息文件失败: {str(e)}")
+        info = read_index_info(active_index_file)
+        info["id"] = active_index_id
+        info["is_active"] = True
         
         return {
             "status": "success", 
             "data": {
-                "active_index_id": target_index_id,
-                "original_index_id": original_index_id,
-                "info": original_index_info
+                "active_index_id": active_index_id,
+                "original_index_id": active_index_id,
+                "info": info
             }
         }
     except HTTPException:
@@ -3,6 +3,7 @@ from loguru import logger
 from src.ui.api.models import KnowledgeBaseCreate, KnowledgeBaseUpdate
 from src.ui.api.utils import kb_manager, save_report_history
 from src.report_generation.rag_generator import RAGGenerator
+from src.knowledge_management.vector_store import find_metadata_path, get_index_path
 from pydantic import BaseModel
 from typing import Optional
 import os
@@ -90,75 +91,28 @@ async def generate_report(kb_id: str, request: ReportGenerationRequest):
             
         # 验证索引ID是否存在
         kb_path = kb_manager.get_kb_path(kb_id)
-        vectors_dir = os.path.join(kb_path, "vectors")
-        index_file = os.path.join(vectors_dir, f"{request.index_id}.faiss")
+        index_file = get_index_path(kb_id, request.index_id)
         
         if not os.path.exists(index_file):
             raise HTTPException(status_code=404, detail=f"索引 {request.index_id} 不存在")
         
-        # 准备使用此索引生成报告
+        # 使用此索引生成报告
         try:
-            # 创建临时活跃索引链接
-            target_index_id = f"vector_index_{kb_id}"
-            target_index_file = os.path.join(vectors_dir, f"{target_index_id}.faiss")
-            target_metadata_file = os.path.join(vectors_dir, f"{target_index_id}_metadata.pkl")
-            
-            source_metadata_file = os.path.join(vectors_dir, f"{request.index_id}_metadata.pkl")
-            if not os.path.exists(source_metadata_file):
+            if find_metadata_path(index_file) is None:
                 raise HTTPException(status_code=404, detail=f"索引元数据文件不存在")
             
-            # 备份当前活跃索引（如果有）
-            if os.path.exists(target_index_file):
-                backup_timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-                backup_index_file = os.path.join(vectors_dir, f"backup_{backup_timestamp}.faiss")
-                backup_metadata_file = os.path.join(vectors_dir, f"backup_{backup_timestamp}_metadata.pkl")
-                
-                # 如果当前索引不是请求的索引，进行备份
-                if not os.path.samefile(target_index_file, index_file):
-                    import shutil
-                    if os.path.exists(target_index_file):
-                        shutil.copy2(target_index_file, backup_index_file)
-                    if os.path.exists(target_metadata_file):
-                        shutil.copy2(target_metadata_file, backup_metadata_file)
-                    
-                    # 创建请求索引的链接作为活跃索引
-                    if os.path.exists(target_index_file):
-                        os.remove(target_index_file)
-                    if os.path.exists(target_metadata_file):
-                        os.remove(target_metadata_file)
-                        
-                    import shutil
-                    shutil.copy2(index_file, target_index_file)
-                    shutil.copy2(source_metadata_file, target_metadata_file)
-            else:
-                # 如果没有活跃索引，直接创建链接
-                import shutil
-                shutil.copy2(index_file, target_index_file)
-                shutil.copy2(source_metadata_file, target_metadata_file)
-            
-            # 使用RAG生成器生成报告
+            # 使用RAG生成器生成报告，直接按ID加载请求的索引，不改变当前活跃索引
             rag = RAGGenerator()
             report = rag.generate_report_from_all_contents(
                 topic=request.topic,
                 issuing_unit=request.issuing_unit or "防汛应急指挥部",
                 report_date=request.report_date or datetime.now().strftime("%Y年%m月%d日"),
-                db_name=kb_id  # 使用知识库ID，因为我们已经设置了正确的活跃索引
+                db_name=kb_id,
+                index_id=request.index_id
             )
             
             if not report:
                 raise HTTPException(status_code=500, detail="报告生成失败")
-                
-            # 恢复之前的索引（如果有备份）
-            if 'backup_index_file' in locals() and os.path.exists(backup_index_file):
-                os.remove(target_index_file) 
-                os.remove(target_metadata_file)
-                import shutil
-                shutil.copy2(backup_index_file, target_index_file)
-                shutil.copy2(backup_metadata_file, target_metadata_file)
-                
-                # 清理备份文件
-                os.remove(backup_index_file)
-                os.remove(backup_metadata_file)
             
             # 保存报告到历史记录
             try:
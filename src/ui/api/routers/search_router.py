@@ -1,18 +1,37 @@
 from fastapi import APIRouter, HTTPException
 import asyncio
-import shutil
 import os
 import glob
-import re
 from loguru import logger
 from datetime import datetime
 
-from src.knowledge_management.vector_store import VectorStore
-from src.ui.api.models import QueryInput, DeleteContentInput, BuildIndexInput
+from src.knowledge_management.vector_store import (VectorStore, delete_index_files, find_metadata_path,
+                                                   get_active_index_id, get_default_index_id, get_index_path,
+                                                   get_vectors_dir, set_active_index)
+from src.knowledge_management.vector_records import remove_vector_records
+from src.knowledge_management.index_build_coordinator import index_build_coordinator
+from src.knowledge_management.vector_store_registry import get_vector_store
+from src.knowledge_management.raw_text_parser import read_article, get_record_path, empty_structured_data
+from src.ui.api.models import QueryInput, BatchQueryInput, DeleteContentInput, BuildIndexInput
 from src.ui.api.utils import kb_manager
 
 router = APIRouter()
 
+
+def _format_result(result):
+    """将VectorStore的搜索结果格式化为接口返回格式"""
+    return {
+        "content": result["event"],
+        "category": result["category"],
+        "scores": {
+            "vector_similarity": 1.0 / (1.0 + result["distance"]),  # 转换为相似度分数
+            "keyword_match": result["keyword_score"],
+            "bm25": result["bm25_score"],
+            "final_score": result["final_score"]
+        }
+    }
+
+
 @router.post("/{kb_id}/search")
 async def search_similar(kb_id: str, query_input: QueryInput):
     """搜索知识库内容
@@ -25,37 +44,28 @@ async def search_similar(kb_id: str, query_input: QueryInput):
         搜索结果列表，包含相似度分数和关键词匹配分数
     """
     try:
-        vector_store = VectorStore(db_name=kb_id)
-        
-        # 加载索引
+        # 从进程内注册表获取已加载的索引，索引未变化时不会重复加载
         try:
-            vector_store.load_index()
+            vector_store = get_vector_store(kb_id)
             if not vector_store.index:
                 raise ValueError("索引加载失败")
         except Exception as e:
             logger.error(f"加载索引失败: {str(e)}")
             raise HTTPException(status_code=500, detail=f"加载索引失败，请先构建索引: {str(e)}")
         
-        results = vector_store.search(
+        # 在线程池中执行搜索，不阻塞事件循环，并发请求的查询向量可以合并生成
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(None, lambda: vector_store.search(
             query=query_input.query,
             category=query_input.category,
             k=query_input.k,
-            alpha=query_input.alpha
-        )
+            alpha=query_input.alpha,
+            nprobe=query_input.nprobe,
+            ef_search=query_input.ef_search
+        ))
         
         # 格式化返回结果
-        formatted_results = []
-        for result in results:
-            formatted_result = {
-                "content": result["event"],
-                "category": result["category"],
-                "scores": {
-                    "vector_similarity": 1.0 / (1.0 + result["distance"]),  # 转换为相似度分数
-                    "keyword_match": result["keyword_score"],
-                    "final_score": result["final_score"]
-                }
-            }
-            formatted_results.append(formatted_result)
+        formatted_results = [_format_result(result) for result in results]
             
         return {
             "results": formatted_results,
@@ -67,6 +77,118 @@ async def search_similar(kb_id: str, query_input: QueryInput):
         logger.error(f"搜索失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"搜索失败: {str(e)}")
 
+@router.post("/{kb_id}/search/batch")
+async def search_batch(kb_id: str, batch_input: BatchQueryInput):
+    """批量搜索知识库内容
+    
+    查询向量分块批量生成，全部查询在一次向量检索中完成，适合批量任务一次性查询大量地区或主题。
+    
+    Args:
+        kb_id: 知识库ID
+        batch_input: 包含查询列表和搜索参数的对象
+        
+    Returns:
+        与查询顺序一致的搜索结果列表
+    """
+    try:
+        try:
+            vector_store = get_vector_store(kb_id)
+            if not vector_store.index:
+                raise ValueError("索引加载失败")
+        except Exception as e:
+            logger.error(f"加载索引失败: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"加载索引失败，请先构建索引: {str(e)}")
+        
+        # 批量嵌入需要多次调用嵌入接口，在线程池中执行以免阻塞事件循环
+        loop = asyncio.get_running_loop()
+        batch_results = await loop.run_in_executor(
+            None,
+            lambda: vector_store.search_batch(
+                queries=batch_input.queries,
+                category=batch_input.category,
+                k=batch_input.k,
+                alpha=batch_input.alpha,
+                nprobe=batch_input.nprobe,
+                ef_search=batch_input.ef_search
+            )
+        )
+        
+        return {
+            "results": [
+                {
+                    "query": query,
+                    "results": [_format_result(result) for result in results],
+                    "total": len(results)
+                }
+                for query, results in zip(batch_input.queries, batch_results)
+            ],
+            "total": len(batch_input.queries)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"批量搜索失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"批量搜索失败: {str(e)}")
+
+def _build_index(kb_id, full_rebuild, dimension):
+    """
+    构建或增量更新知识库的默认索引，在构建线程中执行
+
+    始终加载、更新和发布默认索引，构建期间的搜索请求继续使用旧索引。
+    知识库已激活其他索引时保持不变，只有还没有活跃索引时才激活默认索引。
+
+    Returns:
+        dict: 接口返回内容
+
+    Raises:
+        HTTPException: 如果某个构建步骤失败
+    """
+    try:
+        vector_store = VectorStore(db_name=kb_id, dimension=dimension, index_id=get_default_index_id(kb_id))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 更改向量维度时已有向量都不能复用，只能完整重建
+    if not full_rebuild and not dimension:
+        # 增量更新：只解析和嵌入新增或修改的文件，删除已修改或已删除文件的旧向量
+        try:
+            stats = vector_store.update_index()
+        except Exception as e:
+            logger.error(f"更新索引失败: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"更新索引失败: {str(e)}")
+        if not vector_store.event_texts:
+            logger.warning("未加载到任何文本，索引为空")
+            return {"status": "warning", "message": "未加载到任何文本，索引为空", "stats": stats}
+        if get_active_index_id(kb_id) is None:
+            set_active_index(kb_id, get_default_index_id(kb_id))
+        return {"status": "success", "message": f"知识库 {kb_id} 的向量索引更新完成", "stats": stats}
+
+    # 完整重建流程，文本解析、向量生成和索引插入以流水线方式并发执行
+    logger.info("1. 加载文本并构建索引")
+    try:
+        vector_store.build_from_texts()
+    except Exception as e:
+        logger.error(f"构建索引失败: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"构建索引失败: {str(e)}")
+
+    if not vector_store.event_texts:
+        logger.warning("未加载到任何文本，跳过构建索引")
+        return {"status": "warning", "message": "未加载到任何文本，跳过构建索引"}
+    logger.info(f"成功加载 {len(vector_store.event_texts)} 条文本，"
+                f"构建索引包含 {vector_store.index.ntotal if vector_store.index else 0} 个向量")
+
+    logger.info("2. 保存索引")
+    try:
+        vector_store.save_index(activate=get_active_index_id(kb_id) is None)
+        logger.info("索引保存成功")
+    except Exception as e:
+        logger.error(f"保存索引失败: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"保存索引失败: {str(e)}")
+
+    return {"status": "success", "message": f"知识库 {kb_id} 的向量索引构建完成"}
+
+
 @router.post("/{kb_id}/build-index")
 async def build_vector_index(kb_id: str, input: BuildIndexInput):
     """为指定知识库构建向量索引，如果提供index_id则直接使用该索引"""
@@ -86,65 +208,29 @@ async def build_vector_index(kb_id: str, input: BuildIndexInput):
         if input.index_id:
             # 如果提供了索引ID，直接使用该索引作为当前索引
             try:
-                kb_path = kb_manager.get_kb_path(kb_id)
-                vectors_dir = os.path.join(kb_path, "vectors")
-                
-                # 确保向量目录存在
-                os.makedirs(vectors_dir, exist_ok=True)
+                source_index_path = get_index_path(kb_id, input.index_id)
                 
-                source_index_path = os.path.join(vectors_dir, f"{input.index_id}.faiss")
-                source_metadata_path = os.path.join(vectors_dir, f"{input.index_id}_metadata.pkl")
-                
-                if not os.path.exists(source_index_path) or not os.path.exists(source_metadata_path):
+                if not os.path.exists(source_index_path) or find_metadata_path(source_index_path) is None:
                     raise HTTPException(status_code=404, detail="指定的索引文件不存在")
                 
-                target_index_path = os.path.join(vectors_dir, f"vector_index_{kb_id}.faiss")
-                target_metadata_path = os.path.join(vectors_dir, f"vector_index_{kb_id}_metadata.pkl")
-                
-                # 复制索引文件
-                shutil.copy2(source_index_path, target_index_path)
-                shutil.copy2(source_metadata_path, target_metadata_path)
+                # 原子地更新活跃索引指针，不复制索引文件
+                set_active_index(kb_id, input.index_id)
                 logger.info(f"已将索引 {input.index_id} 激活为当前使用的索引")
                 
                 return {"status": "success", "message": f"已将索引 {input.index_id} 设置为当前使用的索引"}
+            except HTTPException:
+                raise
             except Exception as e:
                 logger.error(f"使用指定索引失败: {str(e)}", exc_info=True)
                 raise HTTPException(status_code=500, detail=f"使用指定索引失败: {str(e)}")
         
-        # 常规索引构建流程，先加载文本，再构建索引
-        vector_store = VectorStore(db_name=kb_id)
-
-        logger.info("1. 加载文本数据")
-        try:
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, vector_store.load_texts)
-
-            if not vector_store.event_texts:
-                logger.warning("未加载到任何文本，跳过构建索引")
-                return {"status": "warning", "message": "未加载到任何文本，跳过构建索引"}
-
-            logger.info(f"成功加载 {len(vector_store.event_texts)} 条文本")
-        except Exception as e:
-            logger.error(f"加载文本失败: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"加载文本失败: {str(e)}")
-
-        logger.info("2. 构建索引")
-        try:
-            await loop.run_in_executor(None, vector_store.build_index)
-            logger.info(f"成功构建索引，包含 {vector_store.index.ntotal if vector_store.index else 0} 个向量")
-        except Exception as e:
-            logger.error(f"构建索引失败: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"构建索引失败: {str(e)}")
-
-        logger.info("3. 保存索引")
-        try:
-            await loop.run_in_executor(None, vector_store.save_index)
-            logger.info("索引保存成功")
-        except Exception as e:
-            logger.error(f"保存索引失败: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"保存索引失败: {str(e)}")
-
-        return {"status": "success", "message": f"知识库 {kb_id} 的向量索引构建完成"}
+        # 同一知识库排队中的相同构建请求合并为一次执行，后到的请求等待排队中的构建并返回同一结果
+        future, joined = index_build_coordinator.submit(
+            kb_id, lambda: _build_index(kb_id, input.full_rebuild, input.dimension),
+            key=("build-index", bool(input.full_rebuild), input.dimension))
+        if joined:
+            logger.info(f"知识库 {kb_id} 已有相同的索引构建任务在排队，等待其完成")
+        return await asyncio.wrap_future(future)
     except HTTPException:
         raise
     except Exception as e:
@@ -179,62 +265,19 @@ async def get_knowledge_base_contents(kb_id: str):
         for filename in txt_files:
             file_path = os.path.join(raw_texts_dir, filename)
             try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    
-                # 解析文件内容
-                url = ""
-                title = ""
-                extracted_time = datetime.now().isoformat()
-                structured_data = {"rainfall": [], "water_condition": [], "disaster_impact": [], "measures": [], "raw_text": ""}
-                
-                # 提取基本信息
-                if "URL:" in content:
-                    url_match = re.search(r"URL:\s*(https?://[^\r\n]+)", content)
-                    if url_match:
-                        url = url_match.group(1).strip()
-                
-                if "标题:" in content:
-                    title_match = re.search(r"标题:\s*([^\r\n]+)", content)
-                    if title_match:
-                        title = title_match.group(1).strip()
-                
-                if "提取时间:" in content:
-                    time_match = re.search(r"提取时间:\s*([^\r\n]+)", content)
-                    if time_match:
-                        extracted_time = time_match.group(1).strip()
-                
-                # 尝试提取结构化数据
-                if "结构化数据:" in content:
-                    # 从新格式中提取结构化数据
-                    data_start = content.find("结构化数据:") + len("结构化数据:")
-                    data_end = -1
-                    
-                    # 查找结束标记
-                    for marker in ["原始内容摘要:", "原始标题:"]:
-                        if marker in content[data_start:]:
-                            marker_pos = content.find(marker, data_start)
-                            if data_end == -1 or marker_pos < data_end:
-                                data_end = marker_pos
+                # 优先读取同名的JSON记录文件，旧数据没有记录文件时解析文本
+                article, text_bytes, warnings = read_article(file_path)
+                content = text_bytes.decode("utf-8")
+                for warning in warnings:
+                    logger.warning(f"文件 {filename}: {warning}")
                     
-                    if data_end != -1:
-                        structured_data_str = content[data_start:data_end].strip()
-                    else:
-                        structured_data_str = content[data_start:].strip()
-                    
-                    if structured_data_str:
-                        try:
-                            # 使用更安全的ast.literal_eval替代eval
-                            import ast
-                            parsed_data = ast.literal_eval(structured_data_str)
-                            if isinstance(parsed_data, dict):
-                                structured_data = parsed_data
-                                # 确保所有必需字段存在
-                                for field in ['rainfall', 'water_condition', 'disaster_impact', 'measures', 'raw_text']:
-                                    if field not in structured_data:
-                                        structured_data[field] = [] if field != 'raw_text' else ""
-                        except Exception as parse_error:
-                            logger.warning(f"无法解析文件 {filename} 中的结构化数据: {parse_error}")
+                url = article["url"]
+                title = article["title"]
+                extracted_time = article["extracted_time"]
+                structured_data = empty_structured_data()
+                if article["structured_data"] is not None:
+                    # 确保所有必需字段存在
+                    structured_data.update(article["structured_data"])
                 
                 # 如果没有从文件中提取到URL，从文件名推导
                 if not url:
@@ -278,6 +321,23 @@ async def get_knowledge_base_contents(kb_id: str):
         raise HTTPException(status_code=500, detail=f"获取知识库内容失败: {str(e)}")
 
 
+def _remove_from_index(kb_id, raw_texts_dir, deleted_filename):
+    """从知识库的索引中删除一个原始文本文件的内容，在构建线程中执行"""
+    remaining_files = glob.glob(os.path.join(raw_texts_dir, "*.txt"))
+    if remaining_files:
+        logger.info(f"更新索引，剩余 {len(remaining_files)} 个文本文件")
+        # 删除内容总是修改默认索引，不加载被激活的子集索引，也不切换活跃索引
+        VectorStore(db_name=kb_id, index_id=get_default_index_id(kb_id)).remove_sources(
+            [deleted_filename], raw_texts_dir)
+        logger.info("成功更新并保存索引")
+    else:
+        # 已无文本文件，禁用活跃索引并删除默认索引文件，其他已保存的索引保留
+        set_active_index(kb_id, None)
+        count = delete_index_files(kb_id, get_default_index_id(kb_id))
+        remove_vector_records(get_vectors_dir(kb_id), [deleted_filename])
+        logger.info(f"无需重建索引，已无文本文件，删除了 {count} 个索引文件")
+
+
 @router.delete("/{kb_id}/contents")
 async def delete_knowledge_base_content(kb_id: str, input: DeleteContentInput):
     """删除知识库中的特定内容，同时清理相关索引和向量数据"""
@@ -341,53 +401,32 @@ async def delete_knowledge_base_content(kb_id: str, input: DeleteContentInput):
             logger.warning(f"要删除的文件不存在，尝试查找包含URL的文件: {input.url}")
             raise HTTPException(status_code=404, detail="要删除的内容不存在")
         
-        # 1. 删除原始文本文件
+        # 1. 删除原始文本文件及其JSON记录文件
         try:
             os.remove(target_file_path)
             logger.info(f"已删除文本文件: {target_file_path}")
+            record_path = get_record_path(target_file_path)
+            if os.path.exists(record_path):
+                os.remove(record_path)
         except Exception as e:
             logger.error(f"删除文本文件失败: {str(e)}")
             raise HTTPException(status_code=500, detail=f"删除文本文件失败: {str(e)}")
         
-        # 2. 重建索引
-        # 由于FAISS/Chroma不支持直接删除单条数据，我们需要重新构建索引
+        # 2. 更新索引
+        # 按原始文本清单中记录的向量ID区间只删除该文件对应的向量和事件，不重新嵌入其余内容
         try:
-            # 调用向量数据库管理器重建索引
-            loop = asyncio.get_running_loop()
-            vector_store = VectorStore(db_name=kb_id)
-            
-            # 删除现有索引
-            index_path = os.path.join(kb_path, "vectors")  # 修正索引路径
-            if os.path.exists(index_path):
-                # 不删除整个目录，只删除索引文件
-                index_files = glob.glob(os.path.join(index_path, f"vector_index_{kb_id}*"))
-                for file in index_files:
-                    try:
-                        os.remove(file)
-                        logger.info(f"已删除索引文件: {file}")
-                    except Exception as e:
-                        logger.warning(f"删除索引文件 {file} 失败: {str(e)}")
-            
-            # 如果还有其他文本文件，则重建索引
-            remaining_files = glob.glob(os.path.join(raw_texts_dir, "*.txt"))
-            if remaining_files:
-                logger.info(f"重建索引，剩余 {len(remaining_files)} 个文本文件")
-                # 加载文本
-                await loop.run_in_executor(None, vector_store.load_texts)
-                # 构建索引
-                await loop.run_in_executor(None, vector_store.build_index)
-                # 保存索引
-                await loop.run_in_executor(None, vector_store.save_index)
-                logger.info("成功重建并保存索引")
-            else:
-                logger.info("无需重建索引，已无文本文件")
+            deleted_filename = os.path.basename(target_file_path)
+            # 与同一知识库的构建任务串行执行，避免并发修改同一索引
+            future, _ = index_build_coordinator.submit(
+                kb_id, lambda: _remove_from_index(kb_id, raw_texts_dir, deleted_filename))
+            await asyncio.wrap_future(future)
         except Exception as e:
-            logger.error(f"重建索引失败: {str(e)}")
+            logger.error(f"更新索引失败: {str(e)}")
             # 不抛出异常，因为文本文件已经删除
             # 但在响应中添加警告信息
             return {
                 "status": "warning",
-                "message": f"内容已删除，但重建索引失败: {str(e)}"
+                "message": f"内容已删除，但更新索引失败: {str(e)}"
             }
         
         return {
@@ -2,7 +2,8 @@ import threading
 import asyncio
 from loguru import logger
 from src.data_ingestion.link_fetcher_main import process_links
-from src.knowledge_management.vector_store import VectorStore
+from src.knowledge_management.vector_store import VectorStore, get_default_index_id
+from src.knowledge_management.index_build_coordinator import index_build_coordinator
 from src.ui.api.models.extract import TaskStatus
 
 # 存储任务状态的字典
@@ -46,12 +47,19 @@ def run_extract_task(task, urls, db_name):
         logger.error(f"链接提取任务失败: {str(e)}", exc_info=True)
 
 def build_index_for_task(db_name):
-    """为任务构建索引"""
+    """
+    为任务构建索引，只处理新提取或修改的文本文件
+
+    与构建接口的增量更新使用相同的任务键提交到索引构建协调器，
+    同一知识库的写任务串行执行，排队中的相同更新只执行一次；
+    已经开始执行的更新可能读不到本任务新写入的文件，此时会在其后重新执行一次。
+    """
     try:
-        vector_store = VectorStore(db_name=db_name)
-        vector_store.load_texts()
-        vector_store.build_index()
-        vector_store.save_index()
+        future, _ = index_build_coordinator.submit(
+            db_name,
+            lambda: VectorStore(db_name=db_name, index_id=get_default_index_id(db_name)).update_index(),
+            key=("build-index", False, None))
+        future.result()
         return True
     except Exception as e:
         logger.error(f"构建索引失败: {str(e)}", exc_info=True)